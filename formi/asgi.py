@@ -13,4 +13,9 @@ from django.core.asgi import get_asgi_application
 
 os.environ.setdefault("DJANGO_SETTINGS_MODULE", "formi.settings")
 
-application = get_asgi_application()
+django_application = get_asgi_application()
+
+# Imported once the app registry is ready.
+from forms.uploads import UploadLimitMiddleware  # noqa: E402
+
+application = UploadLimitMiddleware(django_application)
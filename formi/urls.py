@@ -18,10 +18,13 @@ Including another URLconf
 from django.contrib import admin
 from django.urls import include, path
 
+from forms.views import MetricsView
+
 from .views import HomeView
 
 urlpatterns = [
     path("admin/", admin.site.urls),
     path("forms/", include("forms.urls")),
+    path("metrics", MetricsView.as_view(), name="metrics"),
     path("", HomeView.as_view(), name="home"),
 ]
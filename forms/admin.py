@@ -1,6 +1,16 @@
+import json
+
+from django.conf import settings
 from django.contrib import admin
+from django.http import HttpResponse, HttpResponseRedirect
+from django.shortcuts import get_object_or_404
+from django.urls import path, reverse
+from django.utils.html import format_html
+from django.utils.translation import gettext_lazy as _
 
 from .models import (
+    ChoiceSet,
+    ChoiceSetMembership,
     FieldChoice,
     FieldType,
     Form,
@@ -8,8 +18,12 @@ from .models import (
     FormFieldChoiceMembership,
     FormFieldGroup,
     FormFieldResponse,
+    FormFieldSummary,
     FormResponse,
+    QueuedTask,
+    RequestProfile,
 )
+from .profiling import COOKIE, check_profile_token, get_profile_token, to_speedscope
 
 # Register your models here.
 admin.site.register(FieldChoice)
@@ -19,4 +33,150 @@ admin.site.register(FormField)
 admin.site.register(FormFieldChoiceMembership)
 admin.site.register(FormFieldGroup)
 admin.site.register(FormFieldResponse)
+admin.site.register(FormFieldSummary)
 admin.site.register(FormResponse)
+
+
+class ChoiceSetMembershipInline(admin.TabularInline):
+    model = ChoiceSetMembership
+    raw_id_fields = ["choice"]
+    ordering = ["order", "pk"]
+    extra = 0
+
+
+@admin.register(ChoiceSet)
+class ChoiceSetAdmin(admin.ModelAdmin):
+    list_display = ["label", "key", "version"]
+    search_fields = ["label", "key"]
+    prepopulated_fields = {"key": ["label"]}
+    readonly_fields = ["version"]
+    inlines = [ChoiceSetMembershipInline]
+
+
+@admin.register(QueuedTask)
+class QueuedTaskAdmin(admin.ModelAdmin):
+    list_display = ["task_path", "queue_name", "status", "enqueued_at", "finished_at"]
+    list_filter = ["status", "queue_name", "task_path"]
+    readonly_fields = [field.name for field in QueuedTask._meta.fields]
+
+    def has_add_permission(self, request):
+        return False
+
+
+@admin.register(RequestProfile)
+class RequestProfileAdmin(admin.ModelAdmin):
+    """
+    Read-only list of captured profiles, with collapsed-stack and speedscope
+    downloads and a toggle profiling the current admin's own requests.
+    """
+
+    list_display = [
+        "created_at",
+        "method",
+        "path",
+        "view_name",
+        "status_code",
+        "duration",
+        "sample_count",
+        "trigger",
+    ]
+    list_filter = ["view_name", "trigger"]
+    search_fields = ["path"]
+    exclude = ["stacks"]
+    readonly_fields = ["downloads", "top_stacks"]
+    top_stack_count = 50
+
+    def has_add_permission(self, request):
+        return False
+
+    def has_change_permission(self, request, obj=None):
+        return False
+
+    def get_urls(self):
+        return [
+            path(
+                "toggle/",
+                self.admin_site.admin_view(self.toggle_view),
+                name="forms_requestprofile_toggle",
+            ),
+            path(
+                "<int:pk>/collapsed/",
+                self.admin_site.admin_view(self.collapsed_view),
+                name="forms_requestprofile_collapsed",
+            ),
+            path(
+                "<int:pk>/speedscope/",
+                self.admin_site.admin_view(self.speedscope_view),
+                name="forms_requestprofile_speedscope",
+            ),
+        ] + super().get_urls()
+
+    def changelist_view(self, request, extra_context=None):
+        extra_context = {
+            **(extra_context or {}),
+            "profiling_enabled": check_profile_token(request.COOKIES.get(COOKIE, "")),
+        }
+        return super().changelist_view(request, extra_context)
+
+    def toggle_view(self, request):
+        if not self.has_view_permission(request):
+            return HttpResponse(status=403)
+        response = HttpResponseRedirect(
+            reverse("admin:forms_requestprofile_changelist")
+        )
+        if request.method != "POST":
+            return response
+        if check_profile_token(request.COOKIES.get(COOKIE, "")):
+            response.delete_cookie(COOKIE)
+        else:
+            response.set_cookie(
+                COOKIE,
+                get_profile_token(),
+                max_age=getattr(settings, "FORMS_PROFILE_TOKEN_MAX_AGE", 3600),
+                secure=request.is_secure(),
+                httponly=True,
+                samesite="Lax",
+            )
+        return response
+
+    def download(self, request, pk, content, content_type, extension):
+        if not self.has_view_permission(request):
+            return HttpResponse(status=403)
+        profile = get_object_or_404(RequestProfile, pk=pk)
+        response = HttpResponse(content(profile), content_type=content_type)
+        response["Content-Disposition"] = (
+            f'attachment; filename="profile-{profile.pk}.{extension}"'
+        )
+        return response
+
+    def collapsed_view(self, request, pk):
+        return self.download(
+            request, pk, lambda p: p.stacks, "text/plain; charset=utf-8", "txt"
+        )
+
+    def speedscope_view(self, request, pk):
+        return self.download(
+            request,
+            pk,
+            lambda p: json.dumps(to_speedscope(p)),
+            "application/json",
+            "speedscope.json",
+        )
+
+    @admin.display(description=_("Downloads"))
+    def downloads(self, obj):
+        return format_html(
+            '<a href="{}">{}</a> · <a href="{}">{}</a> '
+            '(open at <a href="https://www.speedscope.app">speedscope.app</a>)',
+            reverse("admin:forms_requestprofile_collapsed", args=[obj.pk]),
+            _("Collapsed stacks"),
+            reverse("admin:forms_requestprofile_speedscope", args=[obj.pk]),
+            _("Speedscope JSON"),
+        )
+
+    @admin.display(description=_("Top stacks"))
+    def top_stacks(self, obj):
+        lines = obj.stacks.splitlines()[: self.top_stack_count]
+        return format_html(
+            '<pre style="white-space: pre-wrap">{}</pre>', "\n".join(lines)
+        )
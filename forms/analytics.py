@@ -0,0 +1,245 @@
+"""
+Per-field response analytics computed inside Postgres.
+
+Answers are aggregated straight from ``FormFieldResponse.value``, or the
+``FormResponse.answers`` documents of forms in document storage, with JSONB
+operators and GROUP BY, never loaded into Python. Choice distributions,
+numeric count/total/min/max and monthly date histograms are folded into
+``FormFieldSummary`` rows as responses arrive, so a dashboard reads
+O(fields) rows. Each response is marked summarized in the transaction that
+folds it in, so a roll-up run twice, or after a rebuild, counts it once.
+Percentiles can't be maintained incrementally and are
+computed on demand with ``percentile_cont``.
+
+Summary rows have fixed-size columns: numbers they can't hold are left out
+of numeric summaries, totals saturate, and choice buckets too long to store
+are cut to a prefix plus an MD5 of the whole answer.
+"""
+
+from collections import defaultdict
+from decimal import Decimal
+
+from django.db import connection, transaction
+from django.utils import timezone
+
+from .models import FieldType, FormField, FormFieldSummary, FormResponse
+from .storage import get_answers_sql
+
+CHOICE_FIELD_TYPES = ("select", "multi_select", "yes_no", "rating")
+# Keys as in field_types.json, which capitalizes some.
+NUMERIC_FIELD_TYPES = (
+    "integer",
+    "big_integer",
+    "positive_integer",
+    "float",
+    "decimal",
+    "currency",
+    "Currency Amount",
+    "Percentage",
+    "Quantity",
+)
+DATE_FIELD_TYPES = ("date", "datetime", "date_and_time", "date_of_birth")
+
+
+def _get_summary_limits():
+    """
+    The length of a bucket and the bound on numbers the summary columns
+    hold: values at or past the bound are left out of numeric summaries,
+    totals are clamped to it and longer buckets are shortened.
+    """
+    total = FormFieldSummary._meta.get_field("total")
+    bucket = FormFieldSummary._meta.get_field("bucket")
+    # All nines, built exactly: Decimal arithmetic would round to 28 digits.
+    bound = Decimal((0, (9,) * total.max_digits, -total.decimal_places))
+    return bucket.max_length, bound
+
+
+# Scalar JSON numbers, or strings holding one, as numeric; anything else NULL.
+NUMERIC_VALUE_SQL = r"""
+    CASE
+        WHEN jsonb_typeof(r.value) = 'number' THEN (r.value #>> '{}')::numeric
+        WHEN jsonb_typeof(r.value) = 'string'
+            AND (r.value #>> '{}') ~ '^\s*-?[0-9]+(\.[0-9]+)?\s*$'
+            THEN (r.value #>> '{}')::numeric
+    END
+"""
+
+# ISO dates and datetimes as their month, anything else NULL.
+MONTH_VALUE_SQL = r"""
+    CASE
+        WHEN jsonb_typeof(r.value) = 'string'
+            AND (r.value #>> '{}') ~ '^[0-9]{4}-[0-9]{2}-[0-9]{2}'
+            THEN substr(r.value #>> '{}', 1, 7)
+    END
+"""
+
+UPSERT_SQL = """
+    INSERT INTO {summary} (field_id, kind, bucket, count, total, minimum, maximum)
+    {select}
+    ON CONFLICT (field_id, kind, bucket) DO UPDATE SET
+        count = {summary}.count + EXCLUDED.count,
+        total = LEAST(
+            GREATEST(COALESCE({summary}.total, 0) + EXCLUDED.total, -%(numeric_bound)s),
+            %(numeric_bound)s
+        ),
+        minimum = LEAST({summary}.minimum, EXCLUDED.minimum),
+        maximum = GREATEST({summary}.maximum, EXCLUDED.maximum)
+"""
+
+# Marks the responses not summarized yet, locking them until the roll-up commits.
+CLAIM_SQL = """
+    UPDATE {response} SET summarized_at = %(now)s
+    WHERE form_id = %(form)s AND id = ANY(%(ids)s) AND summarized_at IS NULL
+    RETURNING id
+"""
+
+RESPONSES_SQL = """
+    FROM {answers} r
+    JOIN {field} f ON f.id = r.field_id
+    JOIN {field_type} t ON t.id = f.field_type_id
+    WHERE t.key = ANY(%(field_types)s) AND {where}
+"""
+
+CHOICE_SELECT_SQL = """
+    SELECT r.field_id, 'choice', c.bucket, COUNT(*), NULL::numeric, NULL::numeric,
+        NULL::numeric
+    FROM (SELECT r.field_id, r.value {responses}) r
+    CROSS JOIN LATERAL jsonb_array_elements_text(
+        CASE WHEN jsonb_typeof(r.value) = 'array'
+            THEN r.value ELSE jsonb_build_array(r.value) END
+    ) AS e(value)
+    -- Longer answers keep a prefix and their hash, so they stay distinct.
+    CROSS JOIN LATERAL (
+        SELECT CASE WHEN length(e.value) <= %(bucket_length)s THEN e.value
+            ELSE left(e.value, %(bucket_length)s - 33) || '#' || md5(e.value)
+        END
+    ) AS c(bucket)
+    GROUP BY r.field_id, c.bucket
+    ORDER BY r.field_id, c.bucket
+"""
+
+NUMERIC_SELECT_SQL = """
+    SELECT n.field_id, 'numeric', '', COUNT(*),
+        LEAST(GREATEST(SUM(n.value), -%(numeric_bound)s), %(numeric_bound)s),
+        MIN(n.value), MAX(n.value)
+    FROM (SELECT r.field_id, {value} AS value {responses}) n
+    WHERE abs(n.value) <= %(numeric_bound)s
+    GROUP BY n.field_id
+    ORDER BY n.field_id
+"""
+
+DATE_SELECT_SQL = """
+    SELECT d.field_id, 'date', d.month, COUNT(*), NULL::numeric, NULL::numeric,
+        NULL::numeric
+    FROM (SELECT r.field_id, {value} AS month {responses}) d
+    WHERE d.month IS NOT NULL
+    GROUP BY d.field_id, d.month
+    ORDER BY d.field_id, d.month
+"""
+
+
+def _aggregate(form, where, params):
+    tables = {
+        "summary": FormFieldSummary._meta.db_table,
+        "answers": get_answers_sql(form),
+        "field": FormField._meta.db_table,
+        "field_type": FieldType._meta.db_table,
+    }
+    statements = (
+        (CHOICE_SELECT_SQL, {}, CHOICE_FIELD_TYPES),
+        (NUMERIC_SELECT_SQL, {"value": NUMERIC_VALUE_SQL}, NUMERIC_FIELD_TYPES),
+        (DATE_SELECT_SQL, {"value": MONTH_VALUE_SQL}, DATE_FIELD_TYPES),
+    )
+    bucket_length, numeric_bound = _get_summary_limits()
+    params = {**params, "bucket_length": bucket_length, "numeric_bound": numeric_bound}
+    # Ordered selects keep row lock order stable across concurrent upserts.
+    with connection.cursor() as cursor:
+        for select, extra, field_types in statements:
+            responses = RESPONSES_SQL.format(where=where, **tables)
+            sql = UPSERT_SQL.format(
+                select=select.format(responses=responses, **extra), **tables
+            )
+            cursor.execute(
+                sql, {**params, "form": form.pk, "field_types": list(field_types)}
+            )
+
+
+def update_field_summaries(form, response_ids):
+    """
+    Fold the answers of the given responses of ``form`` into the summaries,
+    skipping those already folded in. Returns how many were.
+    """
+    if not response_ids:
+        return 0
+    sql = CLAIM_SQL.format(response=FormResponse._meta.db_table)
+    params = {"form": form.pk, "ids": list(response_ids), "now": timezone.now()}
+    with transaction.atomic(), connection.cursor() as cursor:
+        cursor.execute(sql, params)
+        ids = [pk for (pk,) in cursor.fetchall()]
+        if ids:
+            _aggregate(form, "r.response_id = ANY(%(ids)s)", {"ids": ids})
+    return len(ids)
+
+
+def rebuild_field_summaries(form):
+    """
+    Recompute every summary row of ``form`` from its stored answers. The
+    summaries of archived forms are kept, as their answers are gone.
+    """
+    if form.archived_at is not None:
+        return
+    with transaction.atomic():
+        # Waits for running roll-ups, and leaves queued ones nothing to fold.
+        FormResponse.objects.filter(form=form, summarized_at=None).update(
+            summarized_at=timezone.now()
+        )
+        FormFieldSummary.objects.filter(field__form=form).delete()
+        _aggregate(form, "f.form_id = %(form)s", {})
+
+
+PERCENTILES_SQL = """
+    SELECT {percentiles}
+    FROM (SELECT {value} AS n FROM {answers} r WHERE r.field_id = %(field)s) v
+    WHERE v.n IS NOT NULL
+"""
+
+
+def get_percentiles(field, percentiles=(0.5, 0.9, 0.99)):
+    """Compute numeric percentiles of ``field``'s answers in one query."""
+    sql = PERCENTILES_SQL.format(
+        percentiles=", ".join(
+            f"percentile_cont(%(p{i})s) WITHIN GROUP (ORDER BY v.n)"
+            for i in range(len(percentiles))
+        ),
+        value=NUMERIC_VALUE_SQL,
+        answers=get_answers_sql(field.form),
+    )
+    params = {f"p{i}": p for i, p in enumerate(percentiles)}
+    with connection.cursor() as cursor:
+        cursor.execute(sql, {**params, "form": field.form_id, "field": field.pk})
+        row = cursor.fetchone()
+    return dict(zip(percentiles, row))
+
+
+def get_form_summary(form):
+    """
+    Return ``{field_pk: {"choices": {...}, "numeric": {...}, "dates": {...}}}``
+    read from the summary table in one query.
+    """
+    summary = defaultdict(dict)
+    rows = FormFieldSummary.objects.filter(field__form=form).order_by(
+        "field_id", "kind", "bucket"
+    )
+    for row in rows:
+        if row.kind == FormFieldSummary.CHOICE:
+            summary[row.field_id].setdefault("choices", {})[row.bucket] = row.count
+        elif row.kind == FormFieldSummary.DATE:
+            summary[row.field_id].setdefault("dates", {})[row.bucket] = row.count
+        else:
+            summary[row.field_id]["numeric"] = {
+                "count": row.count,
+                "min": row.minimum,
+                "max": row.maximum,
+                "avg": row.total / row.count if row.count else None,
+            }
+    return dict(summary)
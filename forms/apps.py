@@ -3,3 +3,11 @@ from django.apps import AppConfig
 
 class FormsConfig(AppConfig):
     name = "forms"
+
+    def ready(self):
+        from django.db.backends.signals import connection_created
+
+        from . import signals  # noqa: F401
+        from .instrumentation import install_query_recorder
+
+        connection_created.connect(install_query_recorder)
@@ -0,0 +1,193 @@
+"""
+Shared choice sets, cached per version.
+
+The ordered ``(value, label)`` pairs of a ``ChoiceSet`` and its rendered
+``<option>`` block are cached under the set's (pk, version), so every field of
+every form using the set shares one copy and a version bump (see
+``forms.signals``) makes the old entries unreachable. Sets longer than
+``FORMS_CHOICE_SET_INLINE_LIMIT`` are not inlined: fields render the first
+``FORMS_CHOICE_SET_PAGE_SIZE`` options and a search box that fetches matches
+from ``ChoiceSetOptionsView``.
+"""
+
+from collections import defaultdict
+from urllib.parse import urlencode
+
+from django.conf import settings
+from django.core.cache import caches
+from django.db import transaction
+from django.urls import reverse
+from django.utils.html import format_html, format_html_join
+from django.utils.safestring import mark_safe
+from django.utils.text import slugify
+
+from .instrumentation import record_cache
+from .models import (
+    ChoiceSet,
+    ChoiceSetMembership,
+    FieldChoice,
+    FormField,
+    FormFieldChoiceMembership,
+)
+
+
+def get_choice_cache():
+    return caches[getattr(settings, "FORMS_FRAGMENT_CACHE", "default")]
+
+
+def get_inline_limit():
+    return getattr(settings, "FORMS_CHOICE_SET_INLINE_LIMIT", 200)
+
+
+def get_page_size():
+    return getattr(settings, "FORMS_CHOICE_SET_PAGE_SIZE", 50)
+
+
+def get_choice_set_choices(pk, version):
+    """The ordered ``(value, label)`` pairs of a choice set, as a tuple."""
+    cache = get_choice_cache()
+    key = f"forms:choiceset:{pk}:{version}"
+    choices = cache.get(key)
+    record_cache("choice_set", hit=choices is not None)
+    if choices is None:
+        choices = tuple(
+            ChoiceSetMembership.objects.filter(choice_set=pk)
+            .order_by("order", "pk")
+            .values_list("choice__value", "choice__label")
+        )
+        cache.set(key, choices, getattr(settings, "FORMS_FRAGMENT_CACHE_TIMEOUT", None))
+    return choices
+
+
+def is_lazy(choice_set_ref):
+    """Whether a field on this choice set renders a typeahead, not every option."""
+    if choice_set_ref is None:
+        return False
+    return len(get_choice_set_choices(*choice_set_ref)) > get_inline_limit()
+
+
+def get_options_url(choice_set_ref):
+    if choice_set_ref is None:
+        return None
+    pk, version = choice_set_ref
+    url = reverse("choice_set_options", kwargs={"pk": pk})
+    return f"{url}?{urlencode({'v': version})}"
+
+
+def render_options(choices, remaining=0):
+    html = format_html_join("\n", '<option value="{}">{}</option>', choices)
+    if remaining:
+        html += format_html(
+            '\n<option value="" disabled>{} more, type to search</option>', remaining
+        )
+    return html
+
+
+def get_option_block(choice_set_ref):
+    """
+    The ``<option>`` elements of a choice set, or of its first page when the
+    set is lazy, rendered once per version.
+    """
+    cache = get_choice_cache()
+    key = "forms:choiceset-options:{}:{}".format(*choice_set_ref)
+    html = cache.get(key)
+    if html is None:
+        choices = get_choice_set_choices(*choice_set_ref)
+        if len(choices) > get_inline_limit():
+            page = choices[: get_page_size()]
+            html = render_options(page, remaining=len(choices) - len(page))
+        else:
+            html = render_options(choices)
+        cache.set(
+            key, str(html), getattr(settings, "FORMS_FRAGMENT_CACHE_TIMEOUT", None)
+        )
+    return mark_safe(html)
+
+
+def search_choices(choices, query, page=1, page_size=None):
+    """
+    Return ``(matches, has_next)`` for one page of the choices whose label or
+    value contains ``query``, ignoring case.
+    """
+    page_size = page_size or get_page_size()
+    query = query.strip().casefold()
+    if query:
+        choices = [
+            choice
+            for choice in choices
+            if query in choice[1].casefold() or query in choice[0].casefold()
+        ]
+    start = (page - 1) * page_size
+    return choices[start : start + page_size], len(choices) > start + page_size
+
+
+def get_unique_key(label, taken):
+    base = slugify(label)[:40] or "choices"
+    key, n = base, 1
+    while key in taken:
+        n += 1
+        key = f"{base}-{n}"
+    taken.add(key)
+    return key
+
+
+def find_duplicate_choice_lists(min_fields=2, min_size=10):
+    """
+    Group the fields owning their choices by identical ordered ``(value,
+    label)`` lists, returning ``(choice pks, field pks)`` for each list of at
+    least ``min_size`` choices shared by at least ``min_fields`` fields.
+    """
+    lists = defaultdict(list)
+    memberships = (
+        FormFieldChoiceMembership.objects.filter(field__choice_set__isnull=True)
+        .order_by("field", "order", "pk")
+        .values_list("field", "choice", "choice__value", "choice__label")
+    )
+    current, items = None, []
+    for field, choice, value, label in [*memberships.iterator(), (None,) * 4]:
+        if field != current:
+            if len(items) >= min_size:
+                lists[tuple((v, lbl) for _, v, lbl in items)].append(
+                    (current, [pk for pk, _, _ in items])
+                )
+            current, items = field, []
+        items.append((choice, value, label))
+    return [
+        (owners[0][1], [field for field, _ in owners])
+        for owners in lists.values()
+        if len(owners) >= min_fields
+    ]
+
+
+@transaction.atomic
+def consolidate_choice_sets(min_fields=2, min_size=10):
+    """
+    Move every choice list repeated across fields into a shared ``ChoiceSet``
+    and drop the per-field copies, returning the created sets.
+    """
+    taken = set(ChoiceSet.objects.values_list("key", flat=True))
+    created = []
+    for choice_pks, field_pks in find_duplicate_choice_lists(min_fields, min_size):
+        label = FormField.objects.filter(pk=field_pks[0]).values_list(
+            "label", flat=True
+        )[0]
+        label = label or f"Choices of field {field_pks[0]}"
+        choice_set = ChoiceSet.objects.create(
+            key=get_unique_key(label, taken), label=label
+        )
+        ChoiceSetMembership.objects.bulk_create(
+            ChoiceSetMembership(choice_set=choice_set, choice_id=pk, order=order)
+            for order, pk in enumerate(choice_pks, start=1)
+        )
+        copies = FormFieldChoiceMembership.objects.filter(field__in=field_pks)
+        orphans = set(copies.values_list("choice", flat=True)) - set(choice_pks)
+        copies.delete()
+        for field in FormField.objects.filter(pk__in=field_pks):
+            field.choice_set = choice_set
+            # Saved one by one so the signal handlers bump each form's schema.
+            field.save(update_fields=["choice_set"])
+        FieldChoice.objects.filter(
+            pk__in=orphans, formfield=None, choice_sets=None
+        ).delete()
+        created.append(choice_set)
+    return created
@@ -0,0 +1,145 @@
+"""
+Duplicate submission detection.
+
+Forms with a ``submission_id`` field render a fresh UUID into every page, so
+a client retrying a POST sends the same ID again. Each response is keyed by
+the user and that ID (``"<user pk>:<uuid>"``) in ``SubmissionKey``, whose
+unique (form, kind, key) index settles concurrent retries; another user
+sending the same ID gets a response of their own, never the first one.
+Ingestion looks keys up in a per-process LRU of recently stored keys, then in
+that table, and hands back the response first stored instead of storing the
+submission again.
+
+Forms with ``dedupe_content`` also key each response by a hash of the user
+and the cleaned answers, submission ID and timestamp fields left out, and
+reject a submission repeating one.
+"""
+
+import hashlib
+import json
+import threading
+import uuid
+from collections import OrderedDict
+
+from django.conf import settings
+from django.core.serializers.json import DjangoJSONEncoder
+
+from .fragments import DYNAMIC_FIELD_TYPES
+from .models import SubmissionKey
+
+
+class SeenKeys:
+    """In-process LRU of ``(form_pk, kind, key)`` to the response pk."""
+
+    def __init__(self, maxsize=None):
+        self.maxsize = maxsize
+        self.entries = OrderedDict()
+        self.lock = threading.Lock()
+
+    def get_maxsize(self):
+        if self.maxsize is None:
+            return getattr(settings, "FORMS_SEEN_SUBMISSION_KEYS", 10000)
+        return self.maxsize
+
+    def get_many(self, keys):
+        found = {}
+        with self.lock:
+            for key in keys:
+                response_pk = self.entries.get(key)
+                if response_pk is not None:
+                    self.entries.move_to_end(key)
+                    found[key] = response_pk
+        return found
+
+    def set_many(self, items):
+        maxsize = self.get_maxsize()
+        with self.lock:
+            self.entries.update(items)
+            while len(self.entries) > maxsize:
+                self.entries.popitem(last=False)
+
+    def delete_many(self, keys):
+        with self.lock:
+            for key in keys:
+                self.entries.pop(key, None)
+
+    def clear(self):
+        with self.lock:
+            self.entries.clear()
+
+
+seen_keys = SeenKeys()
+
+
+def get_submission_id(schema, answers):
+    """The normalized UUID answering the form's submission ID field, if any."""
+    for field in schema.fields:
+        if field.key == "submission_id" and field.pk in answers:
+            try:
+                return str(uuid.UUID(str(answers[field.pk])))
+            except ValueError:
+                return None
+    return None
+
+
+def get_content_hash(schema, user, answers):
+    generated = {
+        field.pk for field in schema.fields if field.key in DYNAMIC_FIELD_TYPES
+    }
+    content = sorted(
+        (pk, value) for pk, value in answers.items() if pk not in generated
+    )
+    payload = json.dumps([user.pk, content], cls=DjangoJSONEncoder)
+    return hashlib.sha256(payload.encode()).hexdigest()
+
+
+def get_submission_keys(form, schema, user, answers):
+    """The ``(kind, key)`` pairs a cleaned submission is stored under."""
+    keys = []
+    if (submission_id := get_submission_id(schema, answers)) is not None:
+        keys.append((SubmissionKey.SUBMISSION_ID, f"{user.pk}:{submission_id}"))
+    if form.dedupe_content:
+        keys.append((SubmissionKey.CONTENT, get_content_hash(schema, user, answers)))
+    return keys
+
+
+def find_submission_keys(form, keys):
+    """
+    ``{(kind, key): response_pk}`` for the ``keys`` already stored for
+    ``form``: from the in-process LRU, then one query for the rest.
+    """
+    found = {
+        (kind, key): pk
+        for (_, kind, key), pk in seen_keys.get_many(
+            (form.pk, kind, key) for kind, key in keys
+        ).items()
+    }
+    missing = {pair for pair in keys if pair not in found}
+    if missing:
+        rows = SubmissionKey.objects.filter(
+            form=form, key__in={key for _, key in missing}
+        ).values_list("kind", "key", "response_id")
+        stored = {(kind, key): pk for kind, key, pk in rows if (kind, key) in missing}
+        remember_submission_keys(form, stored)
+        found.update(stored)
+    return found
+
+
+def remember_submission_keys(form, keys):
+    """Add stored ``{(kind, key): response_pk}`` to the in-process LRU."""
+    seen_keys.set_many(((form.pk, kind, key), pk) for (kind, key), pk in keys.items())
+
+
+def forget_submission_keys(form, keys):
+    seen_keys.delete_many((form.pk, kind, key) for kind, key in keys)
+
+
+def create_submission_keys(form, keys):
+    """
+    Store ``{(kind, key): response_pk}``. Raises IntegrityError if a
+    concurrent request stored one of the keys first.
+    """
+    SubmissionKey.objects.bulk_create(
+        SubmissionKey(form=form, kind=kind, key=key, response_id=pk)
+        for (kind, key), pk in keys.items()
+    )
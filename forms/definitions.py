@@ -0,0 +1,639 @@
+"""
+Bulk import and export of complete form definitions.
+
+A definition document is a sequence of records: a header
+``{"type": "formi.definitions", "version": 1}``, ``field_type`` records keyed
+by their natural key, ``choice_set`` records for the shared choice lists in
+use, and one ``form`` record per form holding its groups and fields. Fields
+name their type, group and choice set by key, list their own choices as
+``[label, value]`` pairs and carry a ``ref`` (their index in the form) that
+conditional logic rules point at instead of database pks.
+
+Documents are a JSON array or NDJSON (one record per line). Both are parsed
+incrementally, so a large document is never held in memory whole. Imports
+run in one transaction and write ``FORMS_DEFINITIONS_BATCH_SIZE`` forms at a
+time with bulk_create/bulk_update. Field types and choice sets are shared by
+every owner's forms, so they are only upserted by key with ``update_shared``
+(staff and ``manage.py import_forms``); other imports resolve their keys to
+existing rows. Choices are deduplicated by (label, value) against existing
+FieldChoice rows, so a choice list shared by hundreds of forms is stored once.
+"""
+
+import codecs
+import json
+
+from django.conf import settings
+from django.core.exceptions import ValidationError
+from django.core.serializers.json import DjangoJSONEncoder
+from django.db import transaction
+from django.db.models import Prefetch
+from django.utils.dateparse import parse_datetime
+
+from .layout import get_position
+from .logic import check_conditional_logic
+from .models import (
+    ChoiceSet,
+    ChoiceSetMembership,
+    FieldChoice,
+    FieldType,
+    Form,
+    FormField,
+    FormFieldChoiceMembership,
+    FormFieldGroup,
+)
+from .signals import bump_choice_set_version
+from .validation import check_rules
+
+DEFINITIONS_TYPE = "formi.definitions"
+DEFINITIONS_VERSION = 1
+
+FIELD_TYPE_ATTRS = (
+    "description",
+    "default_label",
+    "default_help_text",
+    "default_validations",
+    "supports_choices",
+)
+GROUP_ATTRS = ("label", "description", "order")
+FIELD_ATTRS = (
+    "label",
+    "help_text",
+    "validations",
+    "conditional_logic",
+    "widths",
+    "order",
+    "optional",
+)
+
+
+class DefinitionError(Exception):
+    """Raised for an invalid definition document; nothing is imported."""
+
+
+# Export
+
+
+def map_rules(logic, refs):
+    """
+    Return ``logic`` with the ``field`` of each rule mapped through ``refs``.
+    A field missing from ``refs`` maps to None rather than being kept, so it
+    can't turn into the pk of a field of another form.
+    """
+    if not isinstance(logic, dict) or not logic.get("rules"):
+        return logic
+    return {
+        **logic,
+        "rules": [
+            {**rule, "field": refs.get(rule.get("field"))}
+            if isinstance(rule, dict)
+            else rule
+            for rule in logic["rules"]
+        ],
+    }
+
+
+def get_form_record(form):
+    groups = {group.pk: group.key for group in form.field_groups.all()}
+    fields = list(form.fields.all())
+    refs = {field.pk: ref for ref, field in enumerate(fields, start=1)}
+    return {
+        "type": "form",
+        "title": form.title,
+        "expiration_date": form.expiration_date,
+        "dedupe_content": form.dedupe_content,
+        "groups": [
+            {"key": group.key, **{attr: getattr(group, attr) for attr in GROUP_ATTRS}}
+            for group in form.field_groups.all()
+        ],
+        "fields": [
+            {
+                "ref": refs[field.pk],
+                "field_type": field.field_type and field.field_type.key,
+                "group": groups.get(field.group_id),
+                "choice_set": field.choice_set and field.choice_set.key,
+                **{attr: getattr(field, attr) for attr in FIELD_ATTRS},
+                "conditional_logic": map_rules(field.conditional_logic, refs),
+                "choices": [[c.label, c.value] for c in field.ordered_choices],
+            }
+            for field in fields
+        ],
+    }
+
+
+def get_choice_set_record(choice_set):
+    memberships = choice_set.choicesetmembership_set.order_by("order", "pk")
+    return {
+        "type": "choice_set",
+        "key": choice_set.key,
+        "label": choice_set.label,
+        "choices": [
+            [label, value]
+            for label, value in memberships.values_list(
+                "choice__label", "choice__value"
+            )
+        ],
+    }
+
+
+def iter_definition_records(forms, chunk_size=100):
+    """Yield the records of a definition document for the ``forms`` queryset."""
+    yield {"type": DEFINITIONS_TYPE, "version": DEFINITIONS_VERSION}
+    for field_type in FieldType.objects.filter(
+        pk__in=FormField.objects.filter(form__in=forms).values("field_type")
+    ).order_by("key"):
+        yield {
+            "type": "field_type",
+            "key": field_type.key,
+            **{attr: getattr(field_type, attr) for attr in FIELD_TYPE_ATTRS},
+        }
+    for choice_set in ChoiceSet.objects.filter(
+        pk__in=FormField.objects.filter(form__in=forms).values("choice_set")
+    ).order_by("key"):
+        yield get_choice_set_record(choice_set)
+    forms = forms.order_by("pk").prefetch_related(
+        "field_groups",
+        Prefetch("fields", queryset=FormField.objects.with_render_data()),
+    )
+    for form in forms.iterator(chunk_size=chunk_size):
+        yield get_form_record(form)
+
+
+def write_ndjson(records):
+    for record in records:
+        yield json.dumps(record, cls=DjangoJSONEncoder) + "\n"
+
+
+def write_json(records):
+    separator = "[\n"
+    for record in records:
+        yield separator + json.dumps(record, cls=DjangoJSONEncoder)
+        separator = ",\n"
+    yield "[]\n" if separator == "[\n" else "\n]\n"
+
+
+DEFINITION_FORMATS = {
+    "json": (write_json, "application/json"),
+    "ndjson": (write_ndjson, "application/x-ndjson"),
+}
+
+
+# Parsing
+
+
+class TextReader:
+    """Reads text from a text or binary file-like object, with a pushback buffer."""
+
+    def __init__(self, stream, chunk_size=1 << 16):
+        self.stream = stream
+        self.chunk_size = chunk_size
+        self.decoder = codecs.getincrementaldecoder("utf-8")()
+        self.pending = ""
+
+    def read(self, size=None):
+        size = size or self.chunk_size
+        if self.pending:
+            text, self.pending = self.pending, ""
+            return text
+        while True:
+            data = self.stream.read(size)
+            if isinstance(data, str):
+                return data
+            # A chunk can end part way through a multi-byte character.
+            text = self.decoder.decode(data, final=not data)
+            if text or not data:
+                return text
+
+    def unread(self, text):
+        self.pending = text + self.pending
+
+
+def iter_json_array(reader):
+    """Yield the items of a JSON array, decoding each once it is complete."""
+    decoder = json.JSONDecoder()
+    buffer, eof, expect = "", False, "["
+    while True:
+        buffer = buffer.lstrip()
+        if buffer and expect in ("item", "first") and buffer[0] != "]":
+            try:
+                item, end = decoder.raw_decode(buffer)
+            except json.JSONDecodeError as e:
+                if eof:
+                    raise DefinitionError(f"Invalid JSON: {e}") from None
+            else:
+                yield item
+                buffer, expect = buffer[end:], ","
+                continue
+        elif buffer:
+            token, buffer = buffer[0], buffer[1:]
+            if expect == "[" and token == "[":
+                expect = "first"
+            elif expect in ("first", ",") and token == "]":
+                return
+            elif expect == "," and token == ",":
+                expect = "item"
+            else:
+                raise DefinitionError("Expected a JSON array of records.")
+            continue
+        elif eof:
+            raise DefinitionError("Unexpected end of JSON document.")
+        # Read at least as much again as is buffered, so an item spanning
+        # many chunks is only decoded a logarithmic number of times.
+        chunk = reader.read(max(len(buffer), reader.chunk_size))
+        eof = not chunk
+        buffer += chunk
+
+
+def iter_ndjson(reader):
+    buffer = ""
+    while chunk := reader.read():
+        *lines, buffer = (buffer + chunk).split("\n")
+        for line in lines:
+            if line.strip():
+                yield json.loads(line)
+    if buffer.strip():
+        yield json.loads(buffer)
+
+
+def iter_records(stream):
+    """
+    Yield the records of the JSON array or NDJSON document read from
+    ``stream`` (text or binary), telling them apart by the first character.
+    """
+    reader = TextReader(stream)
+    head = ""
+    while (chunk := reader.read()) and not (head := head + chunk).strip():
+        pass
+    reader.unread(head)
+    try:
+        if head.lstrip().startswith("["):
+            yield from iter_json_array(reader)
+        else:
+            yield from iter_ndjson(reader)
+    except ValueError as e:
+        raise DefinitionError(f"Invalid JSON: {e}") from None
+
+
+# Import
+
+
+def _check_keys(record, allowed, name):
+    if not isinstance(record, dict):
+        raise DefinitionError(f"Expected {name} to be an object.")
+    unknown = set(record) - set(allowed)
+    if unknown:
+        raise DefinitionError(
+            f"Unknown keys in {name}: {', '.join(sorted(map(str, unknown)))}."
+        )
+
+
+def _check_list(value, name):
+    if not isinstance(value, list):
+        raise DefinitionError(f"Expected {name} to be a list.")
+    return value
+
+
+def _check_validations(validations, name):
+    if errors := check_rules(validations):
+        raise DefinitionError(
+            f"Invalid validations of {name}: "
+            + " ".join(f"{rule}: {message}" for rule, message in errors.items())
+        )
+
+
+def _check_fields(fields):
+    """
+    Run the checks ``FormField.clean`` would on a form's fields: their
+    validations, and conditional logic naming fields of the form by ref
+    without cycles.
+    """
+    logic = {}
+    for field in fields:
+        ref = field.get("ref")
+        if ref is None:
+            continue
+        if not isinstance(ref, int) or isinstance(ref, bool) or ref in logic:
+            raise DefinitionError(f"Expected a unique integer ref, not {ref!r}.")
+        logic[ref] = field.get("conditional_logic")
+    for field in fields:
+        ref = field.get("ref")
+        name = f"field {ref}" if ref is not None else "a field"
+        _check_validations(field.get("validations", {}), name)
+        conditional_logic = field.get("conditional_logic")
+        rules = (
+            conditional_logic.get("rules")
+            if isinstance(conditional_logic, dict)
+            else None
+        )
+        for rule in rules if isinstance(rules, list) else ():
+            source = rule.get("field") if isinstance(rule, dict) else None
+            if isinstance(source, bool) or source not in logic:
+                raise DefinitionError(
+                    f"Conditional logic of {name} refers to an unknown ref {source!r}."
+                )
+        siblings = {other: rules for other, rules in logic.items() if other != ref}
+        try:
+            check_conditional_logic(ref, field.get("conditional_logic"), siblings)
+        except ValidationError as e:
+            raise DefinitionError(f"Invalid {name}: {' '.join(e.messages)}") from None
+
+
+def _check_choices(choices):
+    for choice in _check_list(choices, "choices"):
+        if not (isinstance(choice, list) and len(choice) == 2):
+            raise DefinitionError("Expected choices as [label, value] pairs.")
+    return [(str(label), str(value)) for label, value in choices]
+
+
+class DefinitionImporter:
+    """
+    Buffers records and writes them in batches, upserting the pending field
+    types before the forms that may use them.
+    """
+
+    def __init__(self, owner, batch_size, update_shared=False):
+        self.owner = owner
+        self.batch_size = batch_size
+        self.update_shared = update_shared
+        self.forms = []
+        self.form_pks = []
+        self.pending_field_types = {}
+        self.field_types = {}
+        self.pending_choice_sets = {}
+        self.choice_sets = {}
+        self.choices = {}
+
+    def add(self, record):
+        kind = record.get("type") if isinstance(record, dict) else None
+        if kind == "field_type":
+            self.add_field_type(record)
+        elif kind == "choice_set":
+            self.add_choice_set(record)
+        elif kind == "form":
+            self.add_form(record)
+        else:
+            raise DefinitionError(f"Unknown record type {kind!r}.")
+
+    def add_field_type(self, record):
+        _check_keys(record, ("type", "key", *FIELD_TYPE_ATTRS), "field_type")
+        if not isinstance(record.get("key"), str):
+            raise DefinitionError("Expected a field_type key.")
+        _check_validations(
+            record.get("default_validations", {}), f"field type {record['key']!r}"
+        )
+        self.pending_field_types[record["key"]] = {
+            attr: record[attr] for attr in FIELD_TYPE_ATTRS if attr in record
+        }
+
+    def flush_field_types(self):
+        pending, self.pending_field_types = self.pending_field_types, {}
+        if not self.update_shared:
+            self.resolve_field_types(pending)
+            return
+        if not pending:
+            return
+        existing = FieldType.objects.in_bulk(pending, field_name="key")
+        changed = set()
+        for key, field_type in existing.items():
+            for attr, value in pending[key].items():
+                setattr(field_type, attr, value)
+                changed.add(attr)
+        if changed:
+            FieldType.objects.bulk_update(existing.values(), sorted(changed))
+        created = FieldType.objects.bulk_create(
+            FieldType(key=key, **attrs)
+            for key, attrs in pending.items()
+            if key not in existing
+        )
+        self.field_types.update((t.key, t.pk) for t in (*existing.values(), *created))
+
+    def add_choice_set(self, record):
+        _check_keys(record, ("type", "key", "label", "choices"), "choice_set")
+        if not isinstance(record.get("key"), str):
+            raise DefinitionError("Expected a choice_set key.")
+        self.pending_choice_sets[record["key"]] = (
+            str(record.get("label", record["key"])),
+            _check_choices(record.get("choices", [])),
+        )
+
+    def flush_choice_sets(self):
+        """
+        Upsert the pending choice sets by key, replacing the choices of
+        existing sets whose list changed. Without ``update_shared`` the keys
+        are only resolved to existing sets.
+        """
+        pending, self.pending_choice_sets = self.pending_choice_sets, {}
+        if not self.update_shared:
+            self.resolve_choice_sets(pending)
+            return
+        if not pending:
+            return
+        self.resolve_choices(pair for _, pairs in pending.values() for pair in pairs)
+        existing = ChoiceSet.objects.in_bulk(pending, field_name="key")
+        current = {pk: [] for pk in (s.pk for s in existing.values())}
+        for choice_set, choice in (
+            ChoiceSetMembership.objects.filter(choice_set__in=current)
+            .order_by("order", "pk")
+            .values_list("choice_set", "choice")
+        ):
+            current[choice_set].append(choice)
+        changed, relabeled = [], []
+        for key, choice_set in existing.items():
+            label, pairs = pending[key]
+            if current[choice_set.pk] != [self.choices[pair] for pair in pairs]:
+                changed.append(choice_set)
+            if choice_set.label != label:
+                choice_set.label = label
+                relabeled.append(choice_set)
+        ChoiceSet.objects.bulk_update(relabeled, ["label"])
+        ChoiceSetMembership.objects.filter(choice_set__in=changed).delete()
+        created = ChoiceSet.objects.bulk_create(
+            ChoiceSet(key=key, label=label)
+            for key, (label, _) in pending.items()
+            if key not in existing
+        )
+        ChoiceSetMembership.objects.bulk_create(
+            ChoiceSetMembership(
+                choice_set=choice_set, choice_id=self.choices[pair], order=order
+            )
+            for choice_set in (*changed, *created)
+            for order, pair in enumerate(pending[choice_set.key][1], start=1)
+        )
+        bump_choice_set_version(ChoiceSet.objects.filter(pk__in=changed))
+        self.choice_sets.update((s.key, s.pk) for s in (*existing.values(), *created))
+
+    def add_form(self, record):
+        _check_keys(
+            record,
+            ("type", "title", "expiration_date", "dedupe_content", "groups", "fields"),
+            "form",
+        )
+        expiration_date = parse_datetime(str(record.get("expiration_date")))
+        if expiration_date is None:
+            raise DefinitionError("Expected an ISO 8601 expiration_date.")
+        keys = set()
+        for group in _check_list(record.get("groups", []), "groups"):
+            _check_keys(group, ("key", *GROUP_ATTRS), "group")
+            if group.get("key") in keys:
+                raise DefinitionError(f"Duplicate group key {group.get('key')!r}.")
+            keys.add(group.get("key"))
+        for field in _check_list(record.get("fields", []), "fields"):
+            _check_keys(
+                field,
+                ("ref", "field_type", "group", "choice_set", "choices", *FIELD_ATTRS),
+                "field",
+            )
+            if field.get("group") is not None and field["group"] not in keys:
+                raise DefinitionError(f"Unknown group {field['group']!r}.")
+            _check_choices(field.get("choices", []))
+        _check_fields(record.get("fields", []))
+        self.forms.append({**record, "expiration_date": expiration_date})
+        if len(self.forms) >= self.batch_size:
+            self.flush()
+
+    def resolve_field_types(self, keys):
+        missing = {key for key in keys if key is not None} - set(self.field_types)
+        if missing:
+            found = FieldType.objects.filter(key__in=missing).values_list("key", "pk")
+            self.field_types.update(found)
+        unknown = missing - set(self.field_types)
+        if unknown:
+            raise DefinitionError(
+                f"Unknown field types: {', '.join(sorted(map(str, unknown)))}."
+            )
+
+    def resolve_choice_sets(self, keys):
+        """Map choice set keys not defined by the document to existing sets."""
+        missing = {key for key in keys if key is not None} - set(self.choice_sets)
+        if missing:
+            found = ChoiceSet.objects.filter(key__in=missing).values_list("key", "pk")
+            self.choice_sets.update(found)
+        unknown = missing - set(self.choice_sets)
+        if unknown:
+            raise DefinitionError(
+                f"Unknown choice sets: {', '.join(sorted(map(str, unknown)))}."
+            )
+
+    def resolve_choices(self, pairs):
+        """Map each (label, value) pair to a FieldChoice pk, creating the missing."""
+        missing = set(pairs) - set(self.choices)
+        if not missing:
+            return
+        existing = FieldChoice.objects.filter(
+            value__in={value for _, value in missing}
+        ).order_by("-pk")
+        for label, value, pk in existing.values_list("label", "value", "pk"):
+            if (label, value) in missing:
+                self.choices[label, value] = pk
+        created = FieldChoice.objects.bulk_create(
+            FieldChoice(label=label, value=value)
+            for label, value in missing
+            if (label, value) not in self.choices
+        )
+        self.choices.update({(c.label, c.value): c.pk for c in created})
+
+    def flush(self):
+        self.flush_field_types()
+        self.flush_choice_sets()
+        records, self.forms = self.forms, []
+        if not records:
+            return
+        self.resolve_field_types(
+            f.get("field_type") for r in records for f in r.get("fields", [])
+        )
+        self.resolve_choice_sets(
+            f.get("choice_set") for r in records for f in r.get("fields", [])
+        )
+        self.resolve_choices(
+            (str(label), str(value))
+            for r in records
+            for f in r.get("fields", [])
+            for label, value in f.get("choices", [])
+        )
+
+        forms = Form.objects.bulk_create(
+            Form(
+                owner=self.owner,
+                title=record.get("title", ""),
+                expiration_date=record["expiration_date"],
+                dedupe_content=bool(record.get("dedupe_content", False)),
+            )
+            for record in records
+        )
+        groups = FormFieldGroup.objects.bulk_create(
+            FormFieldGroup(
+                form=form,
+                key=group.get("key"),
+                position=get_position(group.get("order")),
+                **{attr: group[attr] for attr in GROUP_ATTRS if attr in group},
+            )
+            for form, record in zip(forms, records)
+            for group in record.get("groups", [])
+        )
+        groups = {(group.form_id, group.key): group for group in groups}
+
+        items = [
+            (form, field)
+            for form, record in zip(forms, records)
+            for field in record.get("fields", [])
+        ]
+        fields = FormField.objects.bulk_create(
+            FormField(
+                form=form,
+                group=groups.get((form.pk, field.get("group"))),
+                field_type_id=self.field_types.get(field.get("field_type")),
+                choice_set_id=self.choice_sets.get(field.get("choice_set")),
+                position=get_position(field.get("order")),
+                **{attr: field[attr] for attr in FIELD_ATTRS if attr in field},
+            )
+            for form, field in items
+        )
+        FormFieldChoiceMembership.objects.bulk_create(
+            FormFieldChoiceMembership(
+                field=field,
+                choice_id=self.choices[str(label), str(value)],
+                order=order,
+            )
+            for field, (_, item) in zip(fields, items)
+            for order, (label, value) in enumerate(item.get("choices", []), start=1)
+        )
+
+        # Conditional logic names fields by ref; point it at the new pks.
+        refs = {form.pk: {} for form in forms}
+        for field, (form, item) in zip(fields, items):
+            if item.get("ref") is not None:
+                refs[form.pk][item["ref"]] = field.pk
+        with_logic = []
+        for field in fields:
+            logic = map_rules(field.conditional_logic, refs[field.form_id])
+            if logic != field.conditional_logic:
+                field.conditional_logic = logic
+                with_logic.append(field)
+        FormField.objects.bulk_update(with_logic, ["conditional_logic"])
+        self.form_pks += [form.pk for form in forms]
+
+
+def import_definitions(stream, owner, batch_size=None, update_shared=False):
+    """
+    Import the definition document read from ``stream`` as forms owned by
+    ``owner``, returning their pks. Field type and choice set records update
+    the shared rows only with ``update_shared``. Raises DefinitionError and
+    imports nothing if any record is invalid.
+    """
+    batch_size = batch_size or getattr(settings, "FORMS_DEFINITIONS_BATCH_SIZE", 200)
+    importer = DefinitionImporter(owner, batch_size, update_shared)
+    records = iter_records(stream)
+    with transaction.atomic():
+        header = next(records, None)
+        if not isinstance(header, dict) or header.get("type") != DEFINITIONS_TYPE:
+            raise DefinitionError(f"Expected a {DEFINITIONS_TYPE} header record.")
+        if header.get("version") != DEFINITIONS_VERSION:
+            raise DefinitionError(
+                f"Unsupported definitions version {header.get('version')!r}."
+            )
+        for index, record in enumerate(records, start=1):
+            try:
+                importer.add(record)
+            except DefinitionError as e:
+                raise DefinitionError(f"Record {index}: {e}") from None
+        importer.flush()
+    return importer.form_pks
@@ -0,0 +1,138 @@
+"""
+Streaming exports of a form's responses, pivoted to one row per FormResponse
+and one column per FormField.
+
+Answers are read through a server-side cursor (``iterator(chunk_size=...)``)
+ordered by response, or page by page where server-side cursors are disabled,
+so memory stays flat however many FormFieldResponse rows a form has. Forms
+storing answers as documents read one row per response instead, and archived
+forms read their archive (see ``forms.archive``).
+"""
+
+import csv
+import json
+from itertools import groupby
+
+from django.conf import settings
+from django.core.serializers.json import DjangoJSONEncoder
+from django.db import connections
+
+from .models import FormResponse
+from .schema import get_form_schema
+from .storage import is_document, parse_answers
+
+RESPONSE_COLUMNS = ("response", "user", "created_at")
+
+
+class Echo:
+    """File-like object whose write() hands the line back to the caller."""
+
+    def write(self, value):
+        return value
+
+
+def get_export_columns(schema):
+    """
+    Return ``(field_pk, header)`` pairs in field order. Headers come from the
+    field labels, suffixed with the pk when a label repeats.
+    """
+    fields = schema.get_ordered_fields()
+    labels = [field.get_label() for field in fields]
+    return [
+        (field.pk, label if labels.count(label) == 1 else f"{label} ({field.pk})")
+        for field, label in zip(fields, labels)
+    ]
+
+
+def iter_rows(queryset, chunk_size):
+    """
+    Iterate ``queryset`` (FormResponse rows ordered by pk) with a server-side
+    cursor or, where those are disabled (PgBouncer transaction pooling),
+    ``chunk_size`` responses at a time by keyset pagination.
+    """
+    if not connections[queryset.db].settings_dict["DISABLE_SERVER_SIDE_CURSORS"]:
+        yield from queryset.iterator(chunk_size=chunk_size)
+        return
+
+    pks = queryset.values_list("pk", flat=True)
+    last_pk = 0
+    while page := list(pks.filter(pk__gt=last_pk)[:chunk_size]):
+        yield from queryset.filter(pk__in=page)
+        last_pk = page[-1]
+
+
+def iter_responses(form, chunk_size=None):
+    """
+    Yield ``(response_pk, user_pk, created_at, {field_pk: value})`` for every
+    response of ``form``, in pk order.
+    """
+    if chunk_size is None:
+        chunk_size = getattr(settings, "FORMS_EXPORT_CHUNK_SIZE", 2000)
+    if form.archived_at is not None:
+        from .archive import iter_archive
+
+        yield from iter_archive(form)
+        return
+
+    responses = FormResponse.objects.filter(form=form).order_by("pk")
+    if is_document(form):
+        rows = responses.values_list("pk", "user_id", "created_at", "answers")
+        for *response, answers in iter_rows(rows, chunk_size):
+            yield (*response, parse_answers(answers))
+        return
+
+    rows = responses.values_list(
+        "pk",
+        "user_id",
+        "created_at",
+        "formfieldresponse__field_id",
+        "formfieldresponse__value",
+    )
+    for (pk, user_pk, created_at), answers in groupby(
+        iter_rows(rows, chunk_size), key=lambda r: r[:3]
+    ):
+        yield (
+            pk,
+            user_pk,
+            created_at,
+            {
+                field_pk: value
+                for *_, field_pk, value in answers
+                if field_pk is not None
+            },
+        )
+
+
+def format_csv_value(value):
+    if value is None or isinstance(value, str):
+        return value
+    return json.dumps(value, cls=DjangoJSONEncoder)
+
+
+def stream_csv(form):
+    columns = get_export_columns(get_form_schema(form))
+    writer = csv.writer(Echo())
+    yield writer.writerow([*RESPONSE_COLUMNS, *(header for _, header in columns)])
+    for pk, user_pk, created_at, answers in iter_responses(form):
+        yield writer.writerow(
+            [
+                pk,
+                user_pk,
+                created_at.isoformat(),
+                *(format_csv_value(answers.get(field_pk)) for field_pk, _ in columns),
+            ]
+        )
+
+
+def stream_ndjson(form):
+    columns = get_export_columns(get_form_schema(form))
+    for pk, user_pk, created_at, answers in iter_responses(form):
+        row = dict(zip(RESPONSE_COLUMNS, (pk, user_pk, created_at)))
+        row.update((header, answers.get(field_pk)) for field_pk, header in columns)
+        yield json.dumps(row, cls=DjangoJSONEncoder) + "\n"
+
+
+EXPORT_FORMATS = {
+    "csv": (stream_csv, "text/csv"),
+    "ndjson": (stream_ndjson, "application/x-ndjson"),
+}
@@ -0,0 +1,127 @@
+"""
+Cached HTML fragments for the per-field templates in ``fields/``.
+
+A field's markup only changes with its definition, so each fragment is cached
+under (field pk, schema version, field type key, locale) and a version bump
+makes the old entries unreachable. Fields whose value is per request
+(``submission_id``, ``submission_timestamp``) are cached as a shell with a
+placeholder that the fresh value replaces on every render. Hits and misses are
+counted per process to help size the cache.
+"""
+
+import threading
+from urllib.parse import urlencode
+
+from django.conf import settings
+from django.core.cache import caches
+from django.template.loader import render_to_string
+from django.urls import reverse
+from django.utils import translation
+from django.utils.html import escape
+
+from .instrumentation import record_cache
+from .logic import get_form_logic
+
+# Field types whose values differ on every render of the same form.
+DYNAMIC_FIELD_TYPES = frozenset({"submission_id", "submission_timestamp"})
+DYNAMIC_VALUE_PLACEHOLDER = "forms-dynamic-value-placeholder"
+
+
+class FragmentStats:
+    def __init__(self):
+        self.hits = 0
+        self.misses = 0
+        self.lock = threading.Lock()
+
+    def record(self, hit):
+        with self.lock:
+            if hit:
+                self.hits += 1
+            else:
+                self.misses += 1
+
+    def snapshot(self):
+        with self.lock:
+            return {"hits": self.hits, "misses": self.misses}
+
+    def reset(self):
+        with self.lock:
+            self.hits = self.misses = 0
+
+
+fragment_stats = FragmentStats()
+
+
+class DynamicShell:
+    """Stands in for a field while rendering its shell, hiding its value."""
+
+    def __init__(self, field):
+        self.field = field
+
+    def __getattr__(self, name):
+        return getattr(self.field, name)
+
+    def get_value(self):
+        return DYNAMIC_VALUE_PLACEHOLDER
+
+
+def get_fragment_cache():
+    return caches[getattr(settings, "FORMS_FRAGMENT_CACHE", "default")]
+
+
+def get_fragment_cache_key(field, version):
+    return (
+        f"forms:fragment:{field.pk}:{version}:{field.key}:{translation.get_language()}"
+    )
+
+
+def render_field_fragment(schema, field):
+    """
+    Return the HTML of ``field`` (a ``forms.schema.FieldSchema`` of
+    ``schema``), rendering and caching it on a miss.
+    """
+    cache = get_fragment_cache()
+    key = get_fragment_cache_key(field, schema.version)
+    dynamic = field.key in DYNAMIC_FIELD_TYPES
+    html = cache.get(key)
+    fragment_stats.record(hit=html is not None)
+    record_cache("fragment", hit=html is not None)
+    if html is None:
+        logic = get_form_logic(schema)
+        html = render_to_string(
+            field.get_template_name(),
+            {
+                "object": DynamicShell(field) if dynamic else field,
+                "hidden_fields": logic.initially_hidden,
+                "logic_sources": logic.sources,
+            },
+        )
+        cache.set(
+            key, html, getattr(settings, "FORMS_FRAGMENT_CACHE_TIMEOUT", 60 * 60 * 24)
+        )
+    if dynamic:
+        html = html.replace(DYNAMIC_VALUE_PLACEHOLDER, escape(field.get_value()))
+    return html
+
+
+def render_group_fragment(schema, group):
+    """Return the HTML of ``group``, its fields coming from the fragment cache."""
+    return render_to_string(
+        group.get_template_name(), {"object": group, "schema": schema, "inline": True}
+    )
+
+
+def as_oob_swap(html, component_id):
+    """Mark the element ``component_id`` in ``html`` as an HTMX out-of-band swap."""
+    attribute = f'id="{component_id}"'
+    return html.replace(attribute, f'{attribute} hx-swap-oob="true"', 1)
+
+
+def get_components_url(fields=(), groups=()):
+    """URL of the batch endpoint rendering the given fields and groups."""
+    query = {}
+    if fields:
+        query["fields"] = ",".join(str(f.pk) for f in fields)
+    if groups:
+        query["groups"] = ",".join(str(g.pk) for g in groups)
+    return f"{reverse('form_components')}?{urlencode(query)}"
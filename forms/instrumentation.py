@@ -0,0 +1,275 @@
+"""
+Per-request performance instrumentation.
+
+``instrumentation_middleware`` collects, for every request, the wall time, the
+number and duration of SQL queries (through an execute wrapper installed on
+each new connection), template render time and schema/fragment cache hits and
+misses. They are reported in a ``Server-Timing`` header, aggregated per URL
+name into ``metrics_registry`` for the Prometheus endpoint, and requests
+slower than ``FORMS_SLOW_REQUEST_MS`` are logged with their slowest SQL.
+
+The request's metrics live in a context variable so the async views, and the
+sync code they run through ``sync_to_async``, record into the same object.
+Work done while a streaming response is consumed falls outside the request.
+"""
+
+import heapq
+import logging
+import threading
+import time
+from collections import Counter
+from contextvars import ContextVar
+
+from asgiref.sync import iscoroutinefunction
+from django.conf import settings
+from django.template.backends import django as django_backend
+from django.utils.decorators import sync_and_async_middleware
+
+logger = logging.getLogger(__name__)
+
+DURATION_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+_current = ContextVar("request_metrics", default=None)
+
+
+class RequestMetrics:
+    def __init__(self, slow_query_count=5):
+        self.start = time.perf_counter()
+        self.duration = 0.0
+        self.query_count = 0
+        self.query_time = 0.0
+        # (duration, sequence, sql) of the slowest queries, as a min-heap.
+        self.slow_queries = []
+        self.slow_query_count = slow_query_count
+        self.template_time = 0.0
+        self.template_depth = 0
+        self.cache = Counter()
+
+    def record_query(self, sql, duration):
+        self.query_count += 1
+        self.query_time += duration
+        entry = (duration, self.query_count, sql)
+        if len(self.slow_queries) < self.slow_query_count:
+            heapq.heappush(self.slow_queries, entry)
+        else:
+            heapq.heappushpop(self.slow_queries, entry)
+
+    def get_slowest_queries(self):
+        return [(sql, duration) for duration, _, sql in sorted(self.slow_queries)[::-1]]
+
+    def get_server_timing(self):
+        hits = sum(n for (_, hit), n in self.cache.items() if hit)
+        misses = sum(n for (_, hit), n in self.cache.items() if not hit)
+        return ", ".join(
+            (
+                f"total;dur={self.duration * 1000:.1f}",
+                f'db;dur={self.query_time * 1000:.1f};desc="{self.query_count} queries"',
+                f"template;dur={self.template_time * 1000:.1f}",
+                f'cache;desc="{hits} hits, {misses} misses"',
+            )
+        )
+
+
+def record_cache(name, hit):
+    metrics = _current.get()
+    if metrics is not None:
+        metrics.cache[name, hit] += 1
+
+
+def record_query(execute, sql, params, many, context):
+    """``connection.execute_wrapper`` timing queries run inside a request."""
+    metrics = _current.get()
+    if metrics is None:
+        return execute(sql, params, many, context)
+    start = time.perf_counter()
+    try:
+        return execute(sql, params, many, context)
+    finally:
+        metrics.record_query(sql, time.perf_counter() - start)
+
+
+def install_query_recorder(sender, connection, **kwargs):
+    """``connection_created`` receiver adding ``record_query`` once per connection."""
+    if record_query not in connection.execute_wrappers:
+        connection.execute_wrappers.append(record_query)
+
+
+class TimedTemplate:
+    def __init__(self, template):
+        self.template = template
+
+    def __getattr__(self, name):
+        return getattr(self.template, name)
+
+    def render(self, context=None, request=None):
+        metrics = _current.get()
+        if metrics is None:
+            return self.template.render(context, request)
+        # Fragments rendered from a template tag are part of the outer render.
+        metrics.template_depth += 1
+        start = time.perf_counter()
+        try:
+            return self.template.render(context, request)
+        finally:
+            metrics.template_depth -= 1
+            if not metrics.template_depth:
+                metrics.template_time += time.perf_counter() - start
+
+
+class DjangoTemplates(django_backend.DjangoTemplates):
+    """The Django template backend, timing renders into the request metrics."""
+
+    def from_string(self, template_code):
+        return TimedTemplate(super().from_string(template_code))
+
+    def get_template(self, template_name):
+        return TimedTemplate(super().get_template(template_name))
+
+
+class MetricsRegistry:
+    """Process-wide request metrics per URL name, in Prometheus text format."""
+
+    def __init__(self, buckets=DURATION_BUCKETS):
+        self.buckets = buckets
+        self.lock = threading.Lock()
+        self.reset()
+
+    def reset(self):
+        with self.lock:
+            self.requests = Counter()
+            self.duration_buckets = Counter()
+            self.totals = Counter()
+            self.cache = Counter()
+
+    def observe(self, view, method, status, metrics):
+        with self.lock:
+            self.requests[view, method, status] += 1
+            for le in self.buckets:
+                if metrics.duration <= le:
+                    self.duration_buckets[view, le] += 1
+            self.totals["request_duration_seconds_sum", view] += metrics.duration
+            self.totals["request_duration_seconds_count", view] += 1
+            self.totals["db_queries_total", view] += metrics.query_count
+            self.totals["db_query_duration_seconds_total", view] += metrics.query_time
+            self.totals["template_render_seconds_total", view] += metrics.template_time
+            for (cache, hit), n in metrics.cache.items():
+                self.cache[view, cache, "hit" if hit else "miss"] += n
+
+    def render(self):
+        with self.lock:
+            lines = [
+                "# HELP formi_requests_total Requests handled, by URL name.",
+                "# TYPE formi_requests_total counter",
+            ]
+            for (view, method, status), n in sorted(self.requests.items()):
+                lines.append(
+                    f'formi_requests_total{{view="{view}",method="{method}",'
+                    f'status="{status}"}} {n}'
+                )
+
+            views = sorted({view for _, view in self.totals})
+            lines += [
+                "# HELP formi_request_duration_seconds Request wall time.",
+                "# TYPE formi_request_duration_seconds histogram",
+            ]
+            for view in views:
+                for le in self.buckets:
+                    lines.append(
+                        f'formi_request_duration_seconds_bucket{{view="{view}",'
+                        f'le="{le}"}} {self.duration_buckets[view, le]}'
+                    )
+                count = self.totals["request_duration_seconds_count", view]
+                lines += [
+                    f'formi_request_duration_seconds_bucket{{view="{view}",'
+                    f'le="+Inf"}} {count}',
+                    f'formi_request_duration_seconds_sum{{view="{view}"}} '
+                    f"{self.totals['request_duration_seconds_sum', view]:.6f}",
+                    f'formi_request_duration_seconds_count{{view="{view}"}} {count}',
+                ]
+
+            for name, help_text in (
+                ("db_queries_total", "SQL queries run."),
+                ("db_query_duration_seconds_total", "Time spent in SQL queries."),
+                ("template_render_seconds_total", "Time spent rendering templates."),
+            ):
+                lines += [
+                    f"# HELP formi_{name} {help_text}",
+                    f"# TYPE formi_{name} counter",
+                ]
+                lines += [
+                    f'formi_{name}{{view="{view}"}} {self.totals[name, view]:g}'
+                    for view in views
+                ]
+
+            lines += [
+                "# HELP formi_cache_requests_total Schema and fragment cache lookups.",
+                "# TYPE formi_cache_requests_total counter",
+            ]
+            for (view, cache, result), n in sorted(self.cache.items()):
+                lines.append(
+                    f'formi_cache_requests_total{{view="{view}",cache="{cache}",'
+                    f'result="{result}"}} {n}'
+                )
+        return "\n".join(lines) + "\n"
+
+
+metrics_registry = MetricsRegistry()
+
+
+def get_view_name(request):
+    match = getattr(request, "resolver_match", None)
+    return (match and match.view_name) or "unmatched"
+
+
+def finish_request(request, response, metrics):
+    metrics.duration = time.perf_counter() - metrics.start
+    view = get_view_name(request)
+    metrics_registry.observe(view, request.method, response.status_code, metrics)
+    if getattr(settings, "FORMS_SERVER_TIMING", True):
+        response["Server-Timing"] = metrics.get_server_timing()
+    threshold = getattr(settings, "FORMS_SLOW_REQUEST_MS", 500)
+    if threshold is not None and metrics.duration * 1000 >= threshold:
+        logger.warning(
+            "Slow request %s %s (%s): %.0f ms, %d queries in %.0f ms. "
+            "Slowest queries:\n%s",
+            request.method,
+            request.get_full_path(),
+            view,
+            metrics.duration * 1000,
+            metrics.query_count,
+            metrics.query_time * 1000,
+            "\n".join(
+                f"  {duration * 1000:.1f} ms: {sql}"
+                for sql, duration in metrics.get_slowest_queries()
+            ),
+        )
+    return response
+
+
+@sync_and_async_middleware
+def instrumentation_middleware(get_response):
+    slow_query_count = getattr(settings, "FORMS_SLOW_REQUEST_QUERIES", 5)
+
+    if iscoroutinefunction(get_response):
+
+        async def middleware(request):
+            metrics = RequestMetrics(slow_query_count)
+            token = _current.set(metrics)
+            try:
+                response = await get_response(request)
+            finally:
+                _current.reset(token)
+            return finish_request(request, response, metrics)
+
+    else:
+
+        def middleware(request):
+            metrics = RequestMetrics(slow_query_count)
+            token = _current.set(metrics)
+            try:
+                response = get_response(request)
+            finally:
+                _current.reset(token)
+            return finish_request(request, response, metrics)
+
+    return middleware
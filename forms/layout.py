@@ -0,0 +1,153 @@
+"""
+Responsive layout of form fields and groups.
+
+``order`` and ``widths`` stay per-breakpoint JSON dicts so the builder can
+edit them freely, but the base (``xs``) order, which is the DOM order, is
+materialised into an indexed ``position`` column so the field tree comes back
+sorted from SQL. The remaining breakpoints only reorder visually through
+Tailwind's ``order-*`` utilities, compiled here into one class string per
+field and stored on the schema snapshot, so each form version builds them
+once.
+"""
+
+from django.core.exceptions import ValidationError
+from django.db import transaction
+from django.db.models import Case, F, JSONField, Value, When
+
+from .models import Form, FormField, FormFieldGroup
+from .signals import bump_schema_version
+
+BREAKPOINTS = ("xs", "sm", "md", "lg", "xl", "2xl")
+GRID_COLUMNS = 12
+
+
+def _classes(utility, values):
+    return [
+        f"{utility}-{values[bp]}" if bp == "xs" else f"{bp}:{utility}-{values[bp]}"
+        for bp in BREAKPOINTS
+        if bp in values
+    ]
+
+
+def get_layout_class(widths=None, order=None):
+    """
+    Return the grid classes for an item. Items without ``widths`` (groups)
+    span the full row; a breakpoint missing from either dict inherits the
+    next smaller one, as in Tailwind.
+    """
+    if widths is None:
+        classes = ["col-span-full"]
+    else:
+        classes = _classes("col-span", {"xs": GRID_COLUMNS, **widths})
+    return " ".join(classes + _classes("order", order or {}))
+
+
+def get_position(order):
+    """The DOM position of an item, taken from its base breakpoint order."""
+    try:
+        return max(int((order or {}).get("xs", 1)), 0)
+    except (TypeError, ValueError):
+        return 1
+
+
+def clean_breakpoints(values, minimum, maximum):
+    if not isinstance(values, dict):
+        raise ValidationError("Expected a mapping of breakpoint to value.")
+    unknown = set(values) - set(BREAKPOINTS)
+    if unknown:
+        raise ValidationError(
+            "Unknown breakpoints: %(breakpoints)s",
+            params={"breakpoints": ", ".join(sorted(unknown))},
+        )
+    for bp, value in values.items():
+        if (
+            not isinstance(value, int)
+            or isinstance(value, bool)
+            or not minimum <= value <= maximum
+        ):
+            raise ValidationError(
+                "%(breakpoint)s must be a whole number from %(min)s to %(max)s.",
+                params={"breakpoint": bp, "min": minimum, "max": maximum},
+            )
+    return values
+
+
+LAYOUT_LIMITS = {"order": (0, 999), "widths": (1, GRID_COLUMNS)}
+
+
+def _apply(model, form, edits, attrs):
+    """
+    Merge ``edits`` ({pk: {attr: {breakpoint: value}}}) over the stored values
+    and write them back in a single UPDATE. Returns errors keyed by pk.
+    """
+    errors = {}
+    try:
+        pks = {int(pk): edit for pk, edit in edits.items()}
+    except (AttributeError, TypeError, ValueError):
+        return {"__all__": ["Expected a mapping of pk to layout."]}
+
+    rows = model.objects.filter(form=form, pk__in=pks).order_by()
+    current = {
+        pk: dict(zip(attrs, values)) for pk, *values in rows.values_list("pk", *attrs)
+    }
+    whens = {attr: [] for attr in (*attrs, "position")}
+    for pk, edit in pks.items():
+        if pk not in current:
+            errors[pk] = ["Unknown item."]
+            continue
+        if not isinstance(edit, dict) or set(edit) - set(attrs):
+            errors[pk] = [f"Expected a mapping with keys {', '.join(attrs)}."]
+            continue
+        layout = current[pk]
+        try:
+            for attr, values in edit.items():
+                clean_breakpoints(values, *LAYOUT_LIMITS[attr])
+                layout[attr] = {**(layout[attr] or {}), **values}
+        except ValidationError as e:
+            errors[pk] = e.messages
+            continue
+        for attr in attrs:
+            whens[attr].append(When(pk=pk, then=Value(layout[attr], JSONField())))
+        whens["position"].append(When(pk=pk, then=get_position(layout["order"])))
+
+    if not errors and whens["position"]:
+        model.objects.filter(pk__in=current).update(
+            **{
+                attr: Case(
+                    *cases,
+                    default=F(attr),
+                    output_field=model._meta.get_field(attr),
+                )
+                for attr, cases in whens.items()
+            }
+        )
+    return errors
+
+
+def apply_layout(form, fields=None, groups=None):
+    """
+    Apply reorder/resize edits from the builder, given as
+    ``{pk: {"order": {...}, "widths": {...}}}`` for fields and
+    ``{pk: {"order": {...}}}`` for groups. Each model is written with one
+    UPDATE and the form's schema version is bumped once, instead of a save
+    (and a version bump) per item. Raises ValidationError keyed by
+    ``"fields"``/``"groups"`` and nothing is written.
+    """
+    errors = {}
+    with transaction.atomic():
+        for key, model, edits, attrs in (
+            ("fields", FormField, fields, ("order", "widths")),
+            ("groups", FormFieldGroup, groups, ("order",)),
+        ):
+            if edits:
+                item_errors = _apply(model, form, edits, attrs)
+                if item_errors:
+                    errors[key] = [
+                        f"{pk}: {message}"
+                        for pk, messages in item_errors.items()
+                        for message in messages
+                    ]
+        if errors:
+            raise ValidationError(errors)
+        bump_schema_version(Form.objects.filter(pk=form.pk))
+    form.refresh_from_db(fields=["schema_version"])
@@ -0,0 +1,223 @@
+"""
+Conditional visibility for ``FormField.conditional_logic``.
+
+The rules of every field in a form are compiled once per schema version into
+a dependency DAG (source field -> dependent fields). Visibility is evaluated
+lazily along that graph, so a changed answer only recomputes the fields
+downstream of it. A field whose source is hidden sees that source as empty.
+See the sample rule set next to ``FormField`` in ``forms.models``.
+"""
+
+import re
+from collections import defaultdict, deque
+from functools import cached_property
+
+from django.core.exceptions import ValidationError
+
+from .schema import CompiledSchemaCache
+from .validation import EMPTY_VALUES
+
+
+def _normalize(value):
+    if isinstance(value, bool):
+        return "true" if value else "false"
+    return str(value)
+
+
+def _values(value):
+    return value if isinstance(value, list) else [value]
+
+
+def _as_number(value):
+    try:
+        return float(value)
+    except (TypeError, ValueError):
+        return None
+
+
+def _compile_rule(rule):
+    operator, operand = rule.get("operator", "$eq"), rule.get("value")
+
+    if operator == "$filled":
+        return lambda value: value not in EMPTY_VALUES
+    if operator == "$empty":
+        return lambda value: value in EMPTY_VALUES
+    if operator in ("$eq", "$ne"):
+        expected = _normalize(operand)
+        negate = operator == "$ne"
+        return lambda value: (
+            any(_normalize(v) == expected for v in _values(value)) != negate
+        )
+    if operator == "$in":
+        expected = frozenset(_normalize(v) for v in _values(operand))
+        return lambda value: any(_normalize(v) in expected for v in _values(value))
+    if operator == "$regex":
+        search = re.compile(operand).search
+        return lambda value: value not in EMPTY_VALUES and bool(search(str(value)))
+    if operator in ("$gt", "$lt"):
+        bound = _as_number(operand)
+        if bound is None:
+            raise ValueError(f"{operator} needs a numeric value, got {operand!r}")
+        if operator == "$gt":
+            return lambda value: (n := _as_number(value)) is not None and n > bound
+        return lambda value: (n := _as_number(value)) is not None and n < bound
+    raise ValueError(f"Unknown conditional logic operator {operator!r}")
+
+
+def get_sources(logic):
+    """Return the pks of the fields ``logic`` depends on."""
+    sources = []
+    for rule in (logic or {}).get("rules", ()):
+        try:
+            sources.append(int(rule["field"]))
+        except (KeyError, TypeError, ValueError):
+            continue
+    return sources
+
+
+def compile_condition(logic):
+    """
+    Compile a ``conditional_logic`` dict into ``(sources, predicate)`` where
+    ``predicate`` takes a ``{source_pk: value}`` dict and returns whether the
+    field is visible. Returns None for fields without rules.
+    """
+    rules = (logic or {}).get("rules")
+    if not rules:
+        return None
+    checks = tuple((int(rule["field"]), _compile_rule(rule)) for rule in rules)
+    match = any if logic.get("match") == "any" else all
+    show = logic.get("action", "show") != "hide"
+
+    def predicate(values):
+        return match(check(values.get(pk)) for pk, check in checks) == show
+
+    return tuple(pk for pk, _ in checks), predicate
+
+
+def find_cycles(dependencies):
+    """
+    Return the set of nodes that sit on (or behind) a cycle in
+    ``dependencies``, a mapping of node -> iterable of nodes it depends on.
+    """
+    dependents = defaultdict(set)
+    pending = {}
+    for node, sources in dependencies.items():
+        pending[node] = set(sources)
+        for source in sources:
+            dependents[source].add(node)
+    queue = deque(node for node, sources in pending.items() if not sources)
+    queue.extend(set(dependents) - set(pending))
+    while queue:
+        source = queue.popleft()
+        for node in dependents[source]:
+            pending[node].discard(source)
+            if not pending[node]:
+                queue.append(node)
+    return {node for node, sources in pending.items() if sources}
+
+
+class FormLogic:
+    def __init__(self, conditions):
+        # Fields whose rules sit on a cycle are treated as unconditional.
+        cycles = find_cycles({pk: sources for pk, (sources, _) in conditions.items()})
+        self.conditions = {
+            pk: condition for pk, condition in conditions.items() if pk not in cycles
+        }
+        self.dependents = defaultdict(list)
+        for pk, (sources, _) in self.conditions.items():
+            for source in sources:
+                self.dependents[source].append(pk)
+        self.sources = frozenset(self.dependents)
+        self._downstream = {}
+
+    def downstream(self, pk):
+        """Fields whose visibility can change when ``pk``'s answer changes."""
+        if pk not in self._downstream:
+            seen, queue = [], deque(self.dependents.get(pk, ()))
+            while queue:
+                node = queue.popleft()
+                if node not in seen:
+                    seen.append(node)
+                    queue.extend(self.dependents.get(node, ()))
+            self._downstream[pk] = tuple(seen)
+        return self._downstream[pk]
+
+    def _is_visible(self, pk, answers, memo):
+        if pk not in memo:
+            condition = self.conditions.get(pk)
+            if condition is None:
+                memo[pk] = True
+            else:
+                sources, predicate = condition
+                values = {
+                    source: answers.get(source)
+                    for source in sources
+                    if self._is_visible(source, answers, memo)
+                }
+                memo[pk] = predicate(values)
+        return memo[pk]
+
+    @cached_property
+    def initially_hidden(self):
+        """The pks of the fields hidden before anything is answered."""
+        return frozenset(self.hidden_fields({}))
+
+    def hidden_fields(self, answers):
+        """Return the pks of every field hidden by ``answers``."""
+        memo = {}
+        return {pk for pk in self.conditions if not self._is_visible(pk, answers, memo)}
+
+    def update(self, answers, changed):
+        """
+        Recompute visibility only for the fields downstream of ``changed``,
+        returning ``{pk: visible}``.
+        """
+        memo = {}
+        return {
+            pk: self._is_visible(pk, answers, memo) for pk in self.downstream(changed)
+        }
+
+
+def compile_form_logic(schema):
+    conditions = {}
+    for field in schema.fields:
+        try:
+            condition = compile_condition(field.conditional_logic)
+        except (KeyError, TypeError, ValueError, AttributeError, re.error):
+            # Rules that slipped past FormField.clean() never hide a field.
+            condition = None
+        if condition is not None:
+            conditions[field.pk] = condition
+    return FormLogic(conditions)
+
+
+form_logic = CompiledSchemaCache(compile_form_logic)
+
+
+def get_form_logic(schema):
+    """Return the compiled logic for ``schema``, compiling it on a miss."""
+    return form_logic.get(schema)
+
+
+def check_conditional_logic(field_pk, logic, siblings):
+    """
+    Validate ``logic`` for the field ``field_pk`` against ``siblings``, a
+    mapping of pk -> conditional_logic for the other fields in its form.
+    """
+    try:
+        compile_condition(logic)
+    except (KeyError, TypeError, ValueError, AttributeError, re.error) as e:
+        raise ValidationError(f"Invalid conditional logic: {e}")
+
+    sources = get_sources(logic)
+    unknown = [pk for pk in sources if pk not in siblings and pk != field_pk]
+    if unknown:
+        raise ValidationError(
+            "Conditional logic refers to fields outside this form: %(fields)s",
+            params={"fields": ", ".join(map(str, unknown))},
+        )
+
+    dependencies = {pk: get_sources(other) for pk, other in siblings.items()}
+    dependencies[field_pk] = sources
+    if field_pk in find_cycles(dependencies):
+        raise ValidationError("Conditional logic creates a dependency cycle.")
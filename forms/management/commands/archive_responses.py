@@ -0,0 +1,41 @@
+from datetime import timedelta
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from django.utils import timezone
+
+from forms.archive import archive_form
+from forms.models import Form, FormFieldResponse, FormResponse
+from forms.partitioning import drop_empty_partitions
+
+
+class Command(BaseCommand):
+    help = (
+        "Move the responses of forms expired for longer than the retention "
+        "window to compressed archives in the database, then drop the monthly "
+        "partitions left empty."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--retention-days",
+            type=int,
+            help="Days after expiration (default: FORMS_ARCHIVE_RETENTION_DAYS)",
+        )
+        parser.add_argument("--dry-run", action="store_true")
+
+    def handle(self, *args, retention_days, dry_run, **options):
+        if retention_days is None:
+            retention_days = getattr(settings, "FORMS_ARCHIVE_RETENTION_DAYS", 365)
+        cutoff = timezone.now() - timedelta(days=retention_days)
+        forms = Form.objects.filter(archived_at=None, expiration_date__lt=cutoff)
+        for form in forms.order_by("pk").iterator():
+            if dry_run:
+                self.stdout.write(f"Would archive {form}")
+                continue
+            count = archive_form(form)
+            self.stdout.write(f"Archived {count} responses of {form}")
+        if dry_run:
+            return
+        for name in drop_empty_partitions((FormResponse, FormFieldResponse), cutoff):
+            self.stdout.write(f"Dropped empty partition {name}")
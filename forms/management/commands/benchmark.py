@@ -0,0 +1,394 @@
+import json
+import platform
+import statistics
+import subprocess
+import time
+import tracemalloc
+from datetime import timedelta
+from pathlib import Path
+
+import django
+from asgiref.sync import async_to_sync
+from django.apps import apps
+from django.conf import settings
+from django.core import serializers
+from django.core.cache import cache
+from django.core.management.base import BaseCommand, CommandError
+from django.core.management.color import no_style
+from django.db import connection, transaction
+from django.template import TemplateDoesNotExist
+from django.template.loader import get_template
+from django.test import Client
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from django.utils import timezone
+
+from forms.fragments import get_components_url
+from forms.layout import get_position
+from forms.models import (
+    FieldChoice,
+    FieldType,
+    Form,
+    FormField,
+    FormFieldChoiceMembership,
+    FormFieldGroup,
+)
+from forms.schema import get_form_schema
+from forms.storage import create_responses
+from forms.uploads import UPLOAD_FIELD_TYPES
+from forms.validation import compile_field_validator
+
+# The repo-root fixtures, in dependency order. form_field_groups.json and
+# data.json are left out: the former was dumped from FormField rows and the
+# latter duplicates content types and sessions.
+FIXTURES = (
+    "users.json",
+    "field_types.json",
+    "forms.json",
+    "form_fields.json",
+    "field_choices.json",
+    "field_choices_membership.json",
+)
+SAMPLE_VALUES = ["Benchmark", "ada@example.com", "42", "1990-05-17"]
+
+
+def upgrade_records(records, loaded):
+    """
+    Bring records dumped by older schemas in line with the current models:
+    integer ``order`` becomes a per-breakpoint dict, field types whose fields
+    were given choices support them, and rows pointing at objects missing from
+    the fixtures are skipped. ``loaded`` maps model to the pks loaded so far.
+    """
+    choice_fields = {
+        r["fields"]["field"]
+        for r in records
+        if r["model"] == "forms.formfieldchoicemembership"
+    }
+    for record in records:
+        model = apps.get_model(record["model"])
+        fields = record["fields"]
+        if model in (FormField, FormFieldGroup):
+            if isinstance(fields.get("order"), int):
+                fields["order"] = {"xs": fields["order"]}
+            fields["position"] = get_position(fields.get("order"))
+        if any(
+            fields.get(f.name) is not None
+            and f.related_model in loaded
+            and fields[f.name] not in loaded[f.related_model]
+            for f in model._meta.concrete_fields
+            if f.many_to_one
+        ):
+            continue
+        loaded.setdefault(model, set()).add(record["pk"])
+        yield record
+    if choice_fields:
+        types = FormField.objects.filter(pk__in=choice_fields).values("field_type")
+        FieldType.objects.filter(pk__in=types).update(supports_choices=True)
+
+
+def load_fixtures(fixture_dir):
+    """Load ``FIXTURES`` from ``fixture_dir``. Returns object counts per file."""
+    loaded, counts = {}, {}
+    with transaction.atomic():
+        for name in FIXTURES:
+            with open(Path(fixture_dir) / name) as f:
+                records = list(upgrade_records(json.load(f), loaded))
+            for obj in serializers.deserialize("python", records):
+                obj.save()
+            # Records sharing a pk overwrite each other, as with loaddata.
+            counts[name] = len({(r["model"], r["pk"]) for r in records})
+        models = [apps.get_model(label) for label in ("auth.User", "forms.FieldType")]
+        models += [FieldChoice, Form, FormField, FormFieldChoiceMembership]
+        with connection.cursor() as cursor:
+            for sql in connection.ops.sequence_reset_sql(no_style(), models):
+                cursor.execute(sql)
+    return counts
+
+
+def has_template(field_type):
+    try:
+        get_template(f"fields/{field_type.key}.html")
+    except TemplateDoesNotExist:
+        return False
+    return True
+
+
+def synthesize_form(owner, field_types, field_count, choices, response_count):
+    """
+    A form of ``field_count`` fields cycling through ``field_types``, half of
+    them in groups of ten, with every twentieth field a select over
+    ``choices`` and ``response_count`` stored responses.
+    """
+    select = FieldType.objects.get(key="select")
+    form = Form.objects.create(
+        owner=owner,
+        title=f"Benchmark {field_count} fields",
+        expiration_date=timezone.now() + timedelta(days=365),
+    )
+    groups = FormFieldGroup.objects.bulk_create(
+        FormFieldGroup(form=form, key=f"group_{n}", label=f"Group {n}", position=n)
+        for n in range(field_count // 20 + 1)
+    )
+    fields = FormField.objects.bulk_create(
+        FormField(
+            form=form,
+            group=groups[i // 20] if i % 20 >= 10 else None,
+            field_type=select if i % 20 == 0 else field_types[i % len(field_types)],
+            label=f"Field {i}",
+            optional=True,
+            order={"xs": i},
+            position=i,
+        )
+        for i in range(field_count)
+    )
+    FormFieldChoiceMembership.objects.bulk_create(
+        FormFieldChoiceMembership(field=field, choice=choice, order=n)
+        for field in fields
+        if field.field_type_id == select.pk
+        for n, choice in enumerate(choices)
+    )
+    answers = get_answers(form) or {}
+    create_responses(form, owner, [answers] * response_count, batch_size=5000)
+    return form
+
+
+def get_answers(form, limit=20):
+    """
+    Valid answers for the required fields of ``form`` and up to ``limit``
+    others, tried from their choices and ``SAMPLE_VALUES``. Upload fields
+    are left out, as they answer with the id of a processed upload. None if a
+    required field accepts none of them.
+    """
+    answers = {}
+    for field in get_form_schema(form).fields:
+        if field.key in UPLOAD_FIELD_TYPES:
+            if field.required:
+                return None
+            continue
+        if not field.required and len(answers) >= limit:
+            continue
+        validate = compile_field_validator(field)
+        candidates = [value for value, _ in field.get_choices() or ()]
+        value = next((v for v in candidates + SAMPLE_VALUES if not validate(v)), None)
+        if value is not None:
+            answers[field.pk] = value
+        elif field.required:
+            return None
+    return answers
+
+
+async def read_stream(response):
+    """Read a streaming response's async content as the ASGI handler would."""
+    async for _ in response.streaming_content:
+        pass
+
+
+def percentile(timings, n):
+    if len(timings) < 2:
+        return timings[0]
+    return statistics.quantiles(timings, n=100, method="inclusive")[n - 1]
+
+
+def get_commit():
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "HEAD"],
+            cwd=settings.BASE_DIR,
+            capture_output=True,
+            check=True,
+            text=True,
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+class Command(BaseCommand):
+    help = (
+        "Load the repo fixtures and synthesized forms of 100-2,000 fields into a "
+        "test database and measure latency percentiles, queries and peak memory "
+        "for the list, detail, component, submit and export endpoints."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--sizes", type=int, nargs="+", default=[100, 500, 2000], metavar="FIELDS"
+        )
+        parser.add_argument("--choices", type=int, default=250)
+        parser.add_argument("--responses", type=int, default=500)
+        parser.add_argument("--requests", type=int, default=50)
+        parser.add_argument("--fixture-dir", default=settings.BASE_DIR)
+        parser.add_argument("--output", default="benchmark.json")
+        parser.add_argument(
+            "--compare", help="Earlier results to report p95 changes against."
+        )
+        parser.add_argument(
+            "--keepdb",
+            action="store_true",
+            help="Keep the test database (its data is always reloaded).",
+        )
+
+    def handle(self, *args, keepdb, **options):
+        old_name = connection.settings_dict["NAME"]
+        connection.creation.create_test_db(verbosity=0, keepdb=keepdb, serialize=False)
+        try:
+            results = self.run(**options)
+        finally:
+            if keepdb:
+                connection.close()
+                connection.settings_dict["NAME"] = old_name
+            else:
+                connection.creation.destroy_test_db(old_name, verbosity=0)
+        with open(options["output"], "w") as f:
+            json.dump(results, f, indent=2)
+        self.stdout.write(f"Wrote {options['output']}")
+        if options["compare"]:
+            self.compare(options["compare"], results)
+
+    def run(self, sizes, choices, responses, requests, fixture_dir, **options):
+        Form.objects.all().delete()
+        for model in (FieldChoice, FieldType, apps.get_model(settings.AUTH_USER_MODEL)):
+            model.objects.all().delete()
+        counts = load_fixtures(fixture_dir)
+        field_types = [t for t in FieldType.objects.order_by("pk") if has_template(t)]
+        owner = Form.objects.order_by("pk").first().owner
+        forms = [
+            form
+            for form in Form.objects.order_by("pk")
+            if all(has_template(f.field_type) for f in form.fields.all())
+        ]
+        if not forms:
+            raise CommandError("No fixture form renders with the shipped templates.")
+        choice_list = FieldChoice.objects.bulk_create(
+            FieldChoice(label=f"Option {i}", value=f"option-{i}")
+            for i in range(choices)
+        )
+        forms += [
+            synthesize_form(owner, field_types, size, choice_list, responses)
+            for size in sizes
+        ]
+
+        self.client = Client(HTTP_HOST=settings.ALLOWED_HOSTS[0])
+        self.client.force_login(owner)
+        self.requests = requests
+        scenarios = [self.measure("form list", None, "get", reverse("form_list"))]
+        for form in forms:
+            scenarios += self.form_scenarios(form)
+        return {
+            "commit": get_commit(),
+            "created_at": timezone.now().isoformat(),
+            "python": platform.python_version(),
+            "django": django.get_version(),
+            "requests": requests,
+            "fixtures": counts,
+            "scenarios": scenarios,
+        }
+
+    def form_scenarios(self, form):
+        schema = get_form_schema(form)
+        select = next((f for f in schema.fields if f.supports_choices), None)
+        field = select or schema.fields[0]
+        batch = schema.get_ordered_fields()[:200]
+        answers = get_answers(form)
+        scenarios = [
+            self.measure(
+                "detail (cold)", form, "get", form.get_absolute_url(), cold=True
+            ),
+            self.measure("detail", form, "get", form.get_absolute_url()),
+            self.measure(
+                "detail (lazy)", form, "get", f"{form.get_absolute_url()}?render=lazy"
+            ),
+            self.measure("field component", form, "get", field.get_absolute_url()),
+            self.measure(
+                f"component batch ({len(batch)})",
+                form,
+                "get",
+                get_components_url(fields=batch),
+            ),
+            self.measure(
+                "export (csv)",
+                form,
+                "get",
+                reverse("form_export", kwargs={"pk": form.pk}),
+            ),
+        ]
+        if answers is None:
+            self.stdout.write(f"Skipping submit for {form.title}: no valid answers.")
+        else:
+            scenarios.append(
+                self.measure(
+                    "submit",
+                    form,
+                    "post",
+                    reverse("form_submit", kwargs={"pk": form.pk}),
+                    data=json.dumps({"answers": answers}),
+                    content_type="application/json",
+                )
+            )
+        return scenarios
+
+    def request(self, method, url, **kwargs):
+        response = getattr(self.client, method)(url, **kwargs)
+        if response.status_code >= 400:
+            raise CommandError(f"{method.upper()} {url}: {response.status_code}")
+        if response.streaming:
+            async_to_sync(read_stream)(response)
+        return response
+
+    def measure(self, name, form, method, url, cold=False, **kwargs):
+        """
+        Time ``self.requests`` requests after a warm-up one. ``cold`` clears the
+        cache before each request so schemas and fragments are rebuilt.
+        """
+        timings, queries = [], []
+        self.request(method, url, **kwargs)
+        for _ in range(self.requests):
+            if cold:
+                cache.clear()
+            with CaptureQueriesContext(connection) as context:
+                start = time.perf_counter()
+                self.request(method, url, **kwargs)
+                timings.append((time.perf_counter() - start) * 1000)
+            queries.append(len(context.captured_queries))
+
+        if cold:
+            cache.clear()
+        tracemalloc.start()
+        try:
+            self.request(method, url, **kwargs)
+            peak = tracemalloc.get_traced_memory()[1]
+        finally:
+            tracemalloc.stop()
+
+        result = {
+            "name": name,
+            "form": form and form.title,
+            "fields": form and form.fields.count(),
+            "p50_ms": round(percentile(timings, 50), 2),
+            "p95_ms": round(percentile(timings, 95), 2),
+            "p99_ms": round(percentile(timings, 99), 2),
+            "queries": max(queries),
+            "peak_memory_kb": round(peak / 1024),
+        }
+        self.stdout.write(
+            f"{name:<24} {result['fields'] or '':>5} fields "
+            f"p50 {result['p50_ms']:>8.2f} ms  p95 {result['p95_ms']:>8.2f} ms  "
+            f"p99 {result['p99_ms']:>8.2f} ms  {result['queries']:>4} queries  "
+            f"{result['peak_memory_kb']:>7,} KiB"
+        )
+        return result
+
+    def compare(self, path, results):
+        with open(path) as f:
+            baseline = json.load(f)
+        before = {(s["name"], s["fields"]): s for s in baseline["scenarios"]}
+        self.stdout.write(f"p95 against {baseline.get('commit') or path}:")
+        for scenario in results["scenarios"]:
+            old = before.get((scenario["name"], scenario["fields"]))
+            if old is None or not old["p95_ms"]:
+                continue
+            change = (scenario["p95_ms"] - old["p95_ms"]) / old["p95_ms"] * 100
+            self.stdout.write(
+                f"{scenario['name']:<24} {scenario['fields'] or '':>5} fields "
+                f"{old['p95_ms']:>8.2f} -> {scenario['p95_ms']:>8.2f} ms "
+                f"({change:+.1f}%)"
+            )
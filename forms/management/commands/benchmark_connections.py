@@ -0,0 +1,69 @@
+import time
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.db import close_old_connections, connection
+from django.test import Client
+
+from forms.models import Form
+
+
+def connection_modes():
+    """(name, settings_dict overrides) pairs, the reconnecting baseline first."""
+    options = dict(connection.settings_dict["OPTIONS"])
+    options.pop("pool", None)
+    return (
+        ("per request", {"CONN_MAX_AGE": 0, "OPTIONS": options}),
+        (
+            "persistent",
+            {"CONN_MAX_AGE": settings.DATABASE_CONN_MAX_AGE, "OPTIONS": options},
+        ),
+        (
+            "pool",
+            {
+                "CONN_MAX_AGE": 0,
+                "OPTIONS": {**options, "pool": settings.DATABASE_POOL_OPTIONS},
+            },
+        ),
+    )
+
+
+class Command(BaseCommand):
+    help = (
+        "Benchmark requests/s on the form detail page reconnecting per request, "
+        "with persistent connections and with the psycopg pool."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("form", type=int, nargs="?")
+        parser.add_argument("--requests", type=int, default=500)
+
+    def handle(self, *args, form, requests, **options):
+        form = Form.objects.filter(pk=form) if form else Form.objects.order_by("pk")
+        form = form.first()
+        if form is None:
+            raise CommandError("No form to benchmark.")
+        url = form.get_absolute_url()
+        client = Client(HTTP_HOST=settings.ALLOWED_HOSTS[0])
+        original = {
+            "CONN_MAX_AGE": connection.settings_dict["CONN_MAX_AGE"],
+            "OPTIONS": connection.settings_dict["OPTIONS"],
+        }
+        try:
+            for name, overrides in connection_modes():
+                connection.close()
+                connection.settings_dict.update(overrides)
+                client.get(url)
+                start = time.perf_counter()
+                for _ in range(requests):
+                    client.get(url)
+                    # The test client skips this request_finished handler.
+                    close_old_connections()
+                seconds = time.perf_counter() - start
+                self.stdout.write(
+                    f"{name:<12} {requests / seconds:>10,.0f} requests/s "
+                    f"({seconds / requests * 1000:.2f} ms/request)"
+                )
+        finally:
+            connection.close()
+            connection.settings_dict.update(original)
@@ -0,0 +1,122 @@
+import time
+from datetime import timedelta
+
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand
+from django.db import connection
+from django.utils import timezone
+
+from forms.analytics import rebuild_field_summaries
+from forms.export import stream_csv
+from forms.models import FieldType, Form, FormField, FormFieldResponse, FormResponse
+from forms.storage import create_responses, get_answers
+
+# Field type key and a sample answer, cycled through the form's fields.
+SAMPLE_ANSWERS = (
+    ("char", "Ada Lovelace"),
+    ("integer", 42),
+    ("select", "option-3"),
+    ("date", "1990-05-17"),
+)
+
+
+def get_table_size():
+    """
+    Bytes used by the answer tables, their indexes and TOAST included, summed
+    over their partitions: a partitioned parent holds no data of its own.
+    """
+    with connection.cursor() as cursor:
+        cursor.execute(
+            "SELECT coalesce(sum(pg_total_relation_size(relid)), 0)"
+            " FROM unnest(%s::regclass[]) AS parent, pg_partition_tree(parent)",
+            [[FormResponse._meta.db_table, FormFieldResponse._meta.db_table]],
+        )
+        return int(cursor.fetchone()[0])
+
+
+def create_form(owner, storage, field_count):
+    field_types = {
+        key: FieldType.objects.get_or_create(
+            key=key, defaults={"description": key, "default_label": key}
+        )[0]
+        for key, _ in SAMPLE_ANSWERS
+    }
+    form = Form.objects.create(
+        owner=owner,
+        title=f"Storage benchmark ({storage})",
+        expiration_date=timezone.now() + timedelta(days=1),
+        response_storage=storage,
+    )
+    fields = FormField.objects.bulk_create(
+        FormField(
+            form=form,
+            field_type=field_types[SAMPLE_ANSWERS[i % len(SAMPLE_ANSWERS)][0]],
+            label=f"Field {i}",
+            optional=True,
+            position=i,
+        )
+        for i in range(field_count)
+    )
+    answers = {
+        field.pk: SAMPLE_ANSWERS[i % len(SAMPLE_ANSWERS)][1]
+        for i, field in enumerate(fields)
+    }
+    return form, answers
+
+
+class Command(BaseCommand):
+    help = (
+        "Compare row-per-answer and document-per-response storage in a test "
+        "database: insert rate, table size, export and analytics speed, and "
+        "single response reads."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--fields", type=int, default=50)
+        parser.add_argument("--responses", type=int, default=5000)
+        parser.add_argument("--batch-size", type=int, default=100)
+
+    def handle(self, *args, **options):
+        old_name = connection.settings_dict["NAME"]
+        connection.creation.create_test_db(verbosity=0, serialize=False)
+        try:
+            owner = get_user_model().objects.create_user("benchmark")
+            for storage, _ in Form.RESPONSE_STORAGE_CHOICES:
+                self.run(owner, storage, **options)
+        finally:
+            connection.creation.destroy_test_db(old_name, verbosity=0)
+
+    def run(self, owner, storage, fields, responses, batch_size, **options):
+        form, answers = create_form(owner, storage, fields)
+        size = get_table_size()
+        start = time.perf_counter()
+        for offset in range(0, responses, batch_size):
+            count = min(batch_size, responses - offset)
+            create_responses(form, owner, [answers] * count)
+        insert = time.perf_counter() - start
+        size = get_table_size() - size
+
+        start = time.perf_counter()
+        for _ in stream_csv(form):
+            pass
+        export = time.perf_counter() - start
+
+        start = time.perf_counter()
+        rebuild_field_summaries(form)
+        analytics = time.perf_counter() - start
+
+        sample = list(FormResponse.objects.filter(form=form).order_by("?")[:200])
+        start = time.perf_counter()
+        for response in sample:
+            response.form = form
+            get_answers(response)
+        read = (time.perf_counter() - start) / len(sample)
+
+        self.stdout.write(
+            f"{storage:<9} insert {responses / insert:>8,.0f} responses/s "
+            f"({responses * fields / insert:,.0f} answers/s)  "
+            f"size {size / 2**20:>7.1f} MiB  "
+            f"export {responses / export:>8,.0f} rows/s  "
+            f"analytics {analytics * 1000:>6.0f} ms  "
+            f"read {read * 1000:.2f} ms/response"
+        )
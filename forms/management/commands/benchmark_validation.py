@@ -0,0 +1,64 @@
+import timeit
+
+from django.core.management.base import BaseCommand, CommandError
+
+from forms.schema import FieldSchema, FormSchema
+from forms.validation import compile_field_validator, compile_form_validator
+
+HOT_RULES = {
+    "required": ({"required": True}, "value"),
+    "length": ({"min_length": 1, "max_length": 50}, "Ada"),
+    "regex": ({"regex": "^[A-Za-z]+$"}, "Ada"),
+    "email": ({"regex": "^[^@]+@[^@]+\\.[^@]+$"}, "ada@example.com"),
+    "choices": ({"choices": [str(i) for i in range(250)]}, "249"),
+    "min_max": ({"min": 0, "max": 100}, 42),
+    "date_min_max": ({"min": "1900-01-01", "max": "today"}, "1990-05-17"),
+    "allowed_domains": ({"allowed_domains": ["example.com"]}, "ada@example.com"),
+    "custom_in": ({"custom": {"operator": "$in", "value": ["A", "B"]}}, "B"),
+}
+
+
+def field_schema(pk, validations):
+    return FieldSchema(
+        pk=pk,
+        group_pk=None,
+        key="char",
+        label=f"Field {pk}",
+        help_text="",
+        template_name="fields/char.html",
+        supports_choices=False,
+        choices=(),
+        validations=validations,
+    )
+
+
+class Command(BaseCommand):
+    help = "Benchmark compiled validators for the hot validation rules."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--number", type=int, default=100_000)
+
+    def handle(self, *args, number, **options):
+        for name, (rules, value) in HOT_RULES.items():
+            validate = compile_field_validator(field_schema(1, rules))
+            # A benchmark of the error path would be meaningless.
+            if errors := validate(value):
+                raise CommandError(f"{name}: {value!r} is invalid: {errors}")
+            seconds = timeit.timeit(lambda: validate(value), number=number)
+            self.stdout.write(f"{name:<16} {number / seconds:>12,.0f} values/s")
+
+        fields = tuple(
+            field_schema(pk, rules)
+            for pk, (rules, _) in enumerate(HOT_RULES.values(), start=1)
+        )
+        answers = {
+            pk: value for pk, (_, value) in enumerate(HOT_RULES.values(), start=1)
+        }
+        schema = FormSchema(pk=1, version=1, title="", fields=fields, groups=())
+        validate = compile_form_validator(schema)
+        submissions = max(number // len(fields), 1)
+        seconds = timeit.timeit(lambda: validate(answers), number=submissions)
+        self.stdout.write(
+            f"{'submission':<16} {submissions / seconds:>12,.0f} submissions/s "
+            f"({len(fields)} fields)"
+        )
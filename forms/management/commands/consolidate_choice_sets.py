@@ -0,0 +1,42 @@
+from django.core.management.base import BaseCommand
+
+from forms.choices import consolidate_choice_sets, find_duplicate_choice_lists
+
+
+class Command(BaseCommand):
+    help = (
+        "Move choice lists repeated across fields into shared choice sets, "
+        "dropping the per-field copies."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--min-fields",
+            type=int,
+            default=2,
+            help="Fields that must share a list (default: 2)",
+        )
+        parser.add_argument(
+            "--min-size",
+            type=int,
+            default=10,
+            help="Smallest list worth sharing (default: 10)",
+        )
+        parser.add_argument(
+            "--dry-run",
+            action="store_true",
+            help="Only report the lists that would be shared",
+        )
+
+    def handle(self, *args, min_fields, min_size, dry_run, **options):
+        if dry_run:
+            for choices, fields in find_duplicate_choice_lists(min_fields, min_size):
+                self.stdout.write(
+                    f"{len(choices)} choices shared by {len(fields)} fields: "
+                    f"{', '.join(map(str, fields))}"
+                )
+            return
+        for choice_set in consolidate_choice_sets(min_fields, min_size):
+            self.stdout.write(
+                f"Created {choice_set.key} for {choice_set.fields.count()} fields"
+            )
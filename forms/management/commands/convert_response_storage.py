@@ -0,0 +1,27 @@
+from django.core.management.base import BaseCommand
+
+from forms.models import Form
+from forms.storage import convert_response_storage
+
+
+class Command(BaseCommand):
+    help = (
+        "Move the stored answers of forms between one row per answer and one "
+        "document per response."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "storage", choices=[value for value, _ in Form.RESPONSE_STORAGE_CHOICES]
+        )
+        parser.add_argument(
+            "forms", nargs="*", type=int, help="Form pks (default: all forms)"
+        )
+
+    def handle(self, *args, storage, forms, **options):
+        queryset = Form.objects.all()
+        if forms:
+            queryset = queryset.filter(pk__in=forms)
+        for form in queryset.order_by("pk").iterator():
+            convert_response_storage(form, storage)
+            self.stdout.write(f"Converted {form} to {storage} storage")
@@ -0,0 +1,25 @@
+from django.core.management.base import BaseCommand
+
+from forms.models import FormFieldResponse, FormResponse
+from forms.partitioning import create_partitions
+
+
+class Command(BaseCommand):
+    help = (
+        "Create the monthly partitions of the response tables for the coming "
+        "months. run_tasks also does this hourly."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--months-ahead",
+            type=int,
+            help="Months after the current one (default: FORMS_PARTITION_MONTHS_AHEAD)",
+        )
+
+    def handle(self, *args, months_ahead, **options):
+        created = create_partitions((FormResponse, FormFieldResponse), months_ahead)
+        for name in created:
+            self.stdout.write(f"Created {name}")
+        if not created:
+            self.stdout.write("Partitions are up to date")
@@ -0,0 +1,39 @@
+import sys
+
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand, CommandError
+
+from forms.definitions import DEFINITION_FORMATS, iter_definition_records
+from forms.models import Form
+
+
+class Command(BaseCommand):
+    help = "Export form definitions (fields, groups, types and choices)."
+
+    def add_arguments(self, parser):
+        parser.add_argument("forms", type=int, nargs="*", metavar="FORM")
+        parser.add_argument("--owner", help="Only export this user's forms.")
+        parser.add_argument(
+            "--format", choices=sorted(DEFINITION_FORMATS), default="ndjson"
+        )
+        parser.add_argument("--output", default="-")
+
+    def handle(self, *args, forms, owner, format, output, **options):
+        queryset = Form.objects.all()
+        if forms:
+            queryset = queryset.filter(pk__in=forms)
+        if owner:
+            user_model = get_user_model()
+            try:
+                owner = user_model.objects.get_by_natural_key(owner)
+            except user_model.DoesNotExist:
+                raise CommandError(f"No user {owner!r}.")
+            queryset = queryset.filter(owner=owner)
+
+        write, _ = DEFINITION_FORMATS[format]
+        stream = sys.stdout if output == "-" else open(output, "w")
+        try:
+            stream.writelines(write(iter_definition_records(queryset)))
+        finally:
+            if stream is not sys.stdout:
+                stream.close()
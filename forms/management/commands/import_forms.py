@@ -0,0 +1,41 @@
+import sys
+import time
+
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand, CommandError
+
+from forms.definitions import DefinitionError, import_definitions
+
+
+class Command(BaseCommand):
+    help = (
+        "Import form definitions from a JSON array or NDJSON document, in one "
+        "transaction."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("path", help="Document to import, or - for stdin.")
+        parser.add_argument("--owner", required=True)
+        parser.add_argument("--batch-size", type=int)
+
+    def handle(self, *args, path, owner, batch_size, **options):
+        user_model = get_user_model()
+        try:
+            owner = user_model.objects.get_by_natural_key(owner)
+        except user_model.DoesNotExist:
+            raise CommandError(f"No user {owner!r}.")
+
+        start = time.perf_counter()
+        stream = sys.stdin.buffer if path == "-" else open(path, "rb")
+        try:
+            pks = import_definitions(
+                stream, owner, batch_size=batch_size, update_shared=True
+            )
+        except DefinitionError as e:
+            raise CommandError(f"Nothing imported. {e}")
+        finally:
+            if stream is not sys.stdin.buffer:
+                stream.close()
+        self.stdout.write(
+            f"Imported {len(pks)} forms in {time.perf_counter() - start:.2f}s."
+        )
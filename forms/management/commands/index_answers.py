@@ -0,0 +1,43 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from forms.models import FormField, FormFieldResponse, FormResponse
+from forms.partitioning import add_index, remove_index
+from forms.storage import get_answer_index, get_value_index, is_document
+
+
+class Command(BaseCommand):
+    help = (
+        "Create, or with --drop remove, a partial expression index on the "
+        "answers to hot fields of forms storing responses as documents, or "
+        "with --containment the GIN index on all answers stored as rows."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("fields", nargs="*", type=int, help="Field pks")
+        parser.add_argument(
+            "--containment",
+            action="store_true",
+            help="Index answers stored as rows for value__contains filters",
+        )
+        parser.add_argument("--drop", action="store_true")
+
+    def handle(self, *args, fields, containment, drop, **options):
+        if not fields and not containment:
+            raise CommandError("Give field pks, or --containment.")
+        fields = FormField.objects.filter(pk__in=fields).select_related("form")
+        for field in fields:
+            if not drop and not is_document(field.form):
+                raise CommandError(
+                    f"Form {field.form_id} stores answers as rows, which the "
+                    "(field, created_at) index already covers."
+                )
+        indexes = [(FormResponse, get_answer_index(field)) for field in fields]
+        if containment:
+            indexes.append((FormFieldResponse, get_value_index()))
+        for model, index in indexes:
+            if drop:
+                remove_index(model, index)
+            else:
+                # Built partition by partition without blocking submissions.
+                add_index(model, index)
+            self.stdout.write(f"{'Dropped' if drop else 'Created'} {index.name}")
@@ -0,0 +1,15 @@
+from django.conf import settings
+from django.core.management.base import BaseCommand
+
+from forms.profiling import HEADER, get_profile_token
+
+
+class Command(BaseCommand):
+    help = "Print a header that profiles the requests sending it to a forms view."
+
+    def handle(self, *args, **options):
+        self.stdout.write(f"{HEADER}: {get_profile_token()}")
+        self.stderr.write(
+            f"Valid for {getattr(settings, 'FORMS_PROFILE_TOKEN_MAX_AGE', 3600)}s; "
+            "profiles are listed under Request Profiles in the admin."
+        )
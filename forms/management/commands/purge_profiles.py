@@ -0,0 +1,24 @@
+from datetime import timedelta
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from django.utils import timezone
+
+from forms.profiling import purge_profiles
+
+
+class Command(BaseCommand):
+    help = "Delete request profiles older than the retention period."
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--days",
+            type=int,
+            help="Days to keep profiles (default: FORMS_PROFILE_RETENTION_DAYS)",
+        )
+
+    def handle(self, *args, days, **options):
+        if days is None:
+            days = getattr(settings, "FORMS_PROFILE_RETENTION_DAYS", 7)
+        count = purge_profiles(timezone.now() - timedelta(days=days))
+        self.stdout.write(f"Purged {count} profiles")
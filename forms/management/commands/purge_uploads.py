@@ -0,0 +1,24 @@
+from datetime import timedelta
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from django.utils import timezone
+
+from forms.uploads import purge_uploads
+
+
+class Command(BaseCommand):
+    help = "Delete chunked uploads left unfinished or failed, and their files."
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--hours",
+            type=int,
+            help="Hours since the upload started (default: FORMS_UPLOAD_ABANDON_HOURS)",
+        )
+
+    def handle(self, *args, hours, **options):
+        if hours is None:
+            hours = getattr(settings, "FORMS_UPLOAD_ABANDON_HOURS", 24)
+        count = purge_uploads(timezone.now() - timedelta(hours=hours))
+        self.stdout.write(f"Purged {count} uploads")
@@ -0,0 +1,26 @@
+from django.core.management.base import BaseCommand
+from django.db import transaction
+
+from forms.analytics import rebuild_field_summaries
+from forms.models import Form
+
+
+class Command(BaseCommand):
+    help = (
+        "Recompute FormFieldSummary rows from stored responses, skipping "
+        "archived forms."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "forms", nargs="*", type=int, help="Form pks (default: all forms)"
+        )
+
+    def handle(self, *args, forms, **options):
+        queryset = Form.objects.filter(archived_at=None)
+        if forms:
+            queryset = queryset.filter(pk__in=forms)
+        for form in queryset.iterator():
+            with transaction.atomic():
+                rebuild_field_summaries(form)
+            self.stdout.write(f"Rebuilt summaries for {form}")
@@ -0,0 +1,95 @@
+import signal
+import time
+from datetime import timedelta
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.db import close_old_connections
+from django.tasks import DEFAULT_TASK_BACKEND_ALIAS, task_backends
+from django.utils import timezone
+from django.utils.crypto import get_random_string
+
+from forms.models import FormFieldResponse, FormResponse
+from forms.partitioning import create_partitions
+from forms.profiling import purge_profiles
+from forms.queue import (
+    DatabaseBackend,
+    claim_tasks,
+    purge_finished_tasks,
+    requeue_stalled_tasks,
+    run_task,
+)
+
+# Seconds between sweeps for stalled and old finished tasks, and old profiles.
+SWEEP_INTERVAL = 60
+# Seconds between checks that the coming months' response partitions exist.
+PARTITION_INTERVAL = 3600
+
+
+class Command(BaseCommand):
+    help = (
+        "Run tasks queued on the database task backend until stopped, or with "
+        "--once until none is due."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--backend", default=DEFAULT_TASK_BACKEND_ALIAS)
+        parser.add_argument(
+            "--queue",
+            action="append",
+            dest="queues",
+            help="Queue to run (repeatable, default: all of the backend's)",
+        )
+        parser.add_argument("--batch-size", type=int, default=10)
+        parser.add_argument("--once", action="store_true")
+
+    def handle(self, *args, backend, queues, batch_size, once, **options):
+        backend = task_backends[backend]
+        if not isinstance(backend, DatabaseBackend):
+            raise CommandError(f"{backend.alias} is not a DatabaseBackend.")
+        queues = queues or sorted(backend.queues)
+        worker_id = get_random_string(32)
+
+        self.stopping = False
+        handlers = {
+            signum: signal.signal(signum, self.stop)
+            for signum in (signal.SIGINT, signal.SIGTERM)
+        }
+        try:
+            self.stdout.write(f"Worker {worker_id} running {', '.join(queues)}")
+            self.run(backend, worker_id, queues, batch_size, once)
+        finally:
+            for signum, handler in handlers.items():
+                signal.signal(signum, handler)
+
+    def run(self, backend, worker_id, queues, batch_size, once):
+        poll_interval = getattr(settings, "FORMS_TASK_POLL_INTERVAL", 1)
+        retention = getattr(settings, "FORMS_TASK_RESULT_DAYS", 7)
+        profile_retention = getattr(settings, "FORMS_PROFILE_RETENTION_DAYS", 7)
+        swept = partitioned = None
+        while not self.stopping:
+            close_old_connections()
+            if swept is None or time.monotonic() - swept >= SWEEP_INTERVAL:
+                requeue_stalled_tasks()
+                purge_finished_tasks(timezone.now() - timedelta(days=retention))
+                purge_profiles(timezone.now() - timedelta(days=profile_retention))
+                swept = time.monotonic()
+            if (
+                partitioned is None
+                or time.monotonic() - partitioned >= PARTITION_INTERVAL
+            ):
+                for name in create_partitions((FormResponse, FormFieldResponse)):
+                    self.stdout.write(f"Created {name}")
+                partitioned = time.monotonic()
+            rows = claim_tasks(worker_id, queues, limit=batch_size)
+            for row in rows:
+                # Claimed tasks are finished even when asked to stop.
+                row = run_task(row, backend)
+                self.stdout.write(f"{row.task_path} {row.pk}: {row.status}")
+            if not rows:
+                if once:
+                    break
+                time.sleep(poll_interval)
+
+    def stop(self, signum, frame):
+        self.stopping = True
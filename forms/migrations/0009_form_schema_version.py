@@ -0,0 +1,19 @@
+# Generated by Django 6.0 on 2026-10-18 19:03
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+    dependencies = [
+        ("forms", "0008_formfield_optional"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="form",
+            name="schema_version",
+            field=models.PositiveIntegerField(
+                default=1, editable=False, verbose_name="schema version"
+            ),
+        ),
+    ]
@@ -0,0 +1,96 @@
+# Generated by Django 6.0 on 2026-10-18 19:09
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+    dependencies = [
+        ("forms", "0009_form_schema_version"),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="FormFieldSummary",
+            fields=[
+                (
+                    "id",
+                    models.BigAutoField(
+                        auto_created=True,
+                        primary_key=True,
+                        serialize=False,
+                        verbose_name="ID",
+                    ),
+                ),
+                (
+                    "kind",
+                    models.CharField(
+                        choices=[
+                            ("choice", "Choice distribution"),
+                            ("numeric", "Numeric statistics"),
+                            ("date", "Monthly date histogram"),
+                        ],
+                        max_length=10,
+                        verbose_name="kind",
+                    ),
+                ),
+                (
+                    "bucket",
+                    models.CharField(blank=True, max_length=200, verbose_name="bucket"),
+                ),
+                (
+                    "count",
+                    models.PositiveBigIntegerField(default=0, verbose_name="count"),
+                ),
+                (
+                    "total",
+                    models.DecimalField(
+                        blank=True,
+                        decimal_places=6,
+                        max_digits=30,
+                        null=True,
+                        verbose_name="total",
+                    ),
+                ),
+                (
+                    "minimum",
+                    models.DecimalField(
+                        blank=True,
+                        decimal_places=6,
+                        max_digits=30,
+                        null=True,
+                        verbose_name="minimum",
+                    ),
+                ),
+                (
+                    "maximum",
+                    models.DecimalField(
+                        blank=True,
+                        decimal_places=6,
+                        max_digits=30,
+                        null=True,
+                        verbose_name="maximum",
+                    ),
+                ),
+                (
+                    "field",
+                    models.ForeignKey(
+                        on_delete=django.db.models.deletion.CASCADE,
+                        related_name="summaries",
+                        to="forms.formfield",
+                        verbose_name="form field",
+                    ),
+                ),
+            ],
+            options={
+                "verbose_name": "Form Field Summary",
+                "verbose_name_plural": "Form Field Summaries",
+                "constraints": [
+                    models.UniqueConstraint(
+                        fields=("field", "kind", "bucket"),
+                        name="unique_field_summary_bucket",
+                    )
+                ],
+            },
+        ),
+    ]
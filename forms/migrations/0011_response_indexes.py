@@ -0,0 +1,74 @@
+# Generated by Django 6.0 on 2026-10-18 19:13
+
+import django.db.models.deletion
+from django.conf import settings
+from django.contrib.postgres.operations import AddIndexConcurrently
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+    # The indexes are built CONCURRENTLY, without blocking writes, before the
+    # foreign key indexes they cover are dropped.
+    atomic = False
+
+    dependencies = [
+        ("forms", "0010_formfieldsummary"),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        AddIndexConcurrently(
+            model_name="formfield",
+            index=models.Index(
+                fields=["form", "group"], name="forms_field_form_group_idx"
+            ),
+        ),
+        AddIndexConcurrently(
+            model_name="formfieldresponse",
+            index=models.Index(
+                fields=["field", "created_at"], name="forms_fieldresp_field_time_idx"
+            ),
+        ),
+        AddIndexConcurrently(
+            model_name="formresponse",
+            index=models.Index(
+                fields=["form", "created_at"], name="forms_response_form_time_idx"
+            ),
+        ),
+        AddIndexConcurrently(
+            model_name="formresponse",
+            index=models.Index(
+                fields=["form", "user"], name="forms_response_form_user_idx"
+            ),
+        ),
+        migrations.AlterField(
+            model_name="formfield",
+            name="form",
+            field=models.ForeignKey(
+                db_index=False,
+                on_delete=django.db.models.deletion.CASCADE,
+                related_name="fields",
+                to="forms.form",
+            ),
+        ),
+        migrations.AlterField(
+            model_name="formfieldresponse",
+            name="field",
+            field=models.ForeignKey(
+                db_index=False,
+                on_delete=django.db.models.deletion.CASCADE,
+                to="forms.formfield",
+                verbose_name="form field",
+            ),
+        ),
+        migrations.AlterField(
+            model_name="formresponse",
+            name="form",
+            field=models.ForeignKey(
+                db_index=False,
+                on_delete=django.db.models.deletion.CASCADE,
+                to="forms.form",
+                verbose_name="form",
+            ),
+        ),
+    ]
@@ -0,0 +1,85 @@
+# Generated by Django 6.0 on 2026-10-18 19:13
+
+import django.contrib.postgres.indexes
+import django.db.models.deletion
+from django.contrib.postgres.operations import AddIndexConcurrently
+from django.db import migrations, models
+
+# Keep the newest answer where a response holds several for one field, so the
+# unique constraint below can be created.
+DELETE_DUPLICATE_ANSWERS_SQL = """
+    DELETE FROM forms_formfieldresponse r
+    USING forms_formfieldresponse newer
+    WHERE newer.response_id = r.response_id
+        AND newer.field_id = r.field_id
+        AND newer.id > r.id
+    RETURNING r.id, r.response_id, r.field_id, r.value::text
+"""
+
+# Built CONCURRENTLY, then promoted to the constraint Django would have added.
+CREATE_UNIQUE_SQL = [
+    "CREATE UNIQUE INDEX CONCURRENTLY IF NOT EXISTS unique_response_field "
+    "ON forms_formfieldresponse (response_id, field_id)",
+    "ALTER TABLE forms_formfieldresponse ADD CONSTRAINT unique_response_field "
+    "UNIQUE USING INDEX unique_response_field",
+]
+
+DROP_UNIQUE_SQL = (
+    "ALTER TABLE forms_formfieldresponse DROP CONSTRAINT unique_response_field"
+)
+
+
+def delete_duplicate_answers(apps, schema_editor):
+    """Delete the older duplicate answers and list each one deleted."""
+    with schema_editor.connection.cursor() as cursor:
+        cursor.execute(DELETE_DUPLICATE_ANSWERS_SQL)
+        deleted = cursor.fetchall()
+    if deleted:
+        print(f"\n  Deleted {len(deleted)} older duplicate answers:")
+        for pk, response_pk, field_pk, value in sorted(deleted):
+            print(f"    #{pk} (response {response_pk}, field {field_pk}): {value}")
+
+
+class Migration(migrations.Migration):
+    # No transaction: CREATE INDEX CONCURRENTLY can't run in one, and builds
+    # the index without blocking writes to the table.
+    atomic = False
+
+    dependencies = [
+        ("forms", "0011_response_indexes"),
+    ]
+
+    operations = [
+        migrations.RunPython(delete_duplicate_answers, migrations.RunPython.noop),
+        migrations.SeparateDatabaseAndState(
+            database_operations=[
+                migrations.RunSQL(CREATE_UNIQUE_SQL, DROP_UNIQUE_SQL),
+            ],
+            state_operations=[
+                migrations.AddConstraint(
+                    model_name="formfieldresponse",
+                    constraint=models.UniqueConstraint(
+                        fields=("response", "field"), name="unique_response_field"
+                    ),
+                ),
+            ],
+        ),
+        migrations.AlterField(
+            model_name="formfieldresponse",
+            name="response",
+            field=models.ForeignKey(
+                db_index=False,
+                on_delete=django.db.models.deletion.CASCADE,
+                to="forms.formresponse",
+                verbose_name="form response",
+            ),
+        ),
+        AddIndexConcurrently(
+            model_name="formfieldresponse",
+            index=django.contrib.postgres.indexes.GinIndex(
+                fields=["value"],
+                name="forms_fieldresp_value_gin",
+                opclasses=["jsonb_path_ops"],
+            ),
+        ),
+    ]
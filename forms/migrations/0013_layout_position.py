@@ -0,0 +1,58 @@
+# Generated by Django 6.0 on 2026-10-18 19:14
+
+from django.db import migrations, models
+
+# Non-numeric or negative xs orders fall back to get_position()'s default.
+BACKFILL_POSITION_SQL = """
+    UPDATE {table} SET position = GREATEST(("order" ->> 'xs')::integer, 0)
+    WHERE ("order" ->> 'xs') ~ '^-?[0-9]+$'
+"""
+
+
+class Migration(migrations.Migration):
+    dependencies = [
+        ("forms", "0012_response_uniqueness"),
+    ]
+
+    operations = [
+        migrations.AlterModelOptions(
+            name="formfield",
+            options={
+                "ordering": ["position", "pk"],
+                "verbose_name": "Form Field",
+                "verbose_name_plural": "Form Fields",
+            },
+        ),
+        migrations.AlterModelOptions(
+            name="formfieldgroup",
+            options={"ordering": ["position", "pk"]},
+        ),
+        migrations.RemoveIndex(
+            model_name="formfield",
+            name="forms_field_form_group_idx",
+        ),
+        migrations.AddField(
+            model_name="formfield",
+            name="position",
+            field=models.PositiveIntegerField(default=1, editable=False),
+        ),
+        migrations.AddField(
+            model_name="formfieldgroup",
+            name="position",
+            field=models.PositiveIntegerField(default=1, editable=False),
+        ),
+        migrations.RunSQL(
+            BACKFILL_POSITION_SQL.format(table="forms_formfield"),
+            migrations.RunSQL.noop,
+        ),
+        migrations.RunSQL(
+            BACKFILL_POSITION_SQL.format(table="forms_formfieldgroup"),
+            migrations.RunSQL.noop,
+        ),
+        migrations.AddIndex(
+            model_name="formfield",
+            index=models.Index(
+                fields=["form", "group", "position"], name="forms_field_form_group_idx"
+            ),
+        ),
+    ]
@@ -0,0 +1,64 @@
+# Generated by Django 6.0 on 2026-10-18 19:32
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+    dependencies = [
+        ("forms", "0013_layout_position"),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="RequestProfile",
+            fields=[
+                (
+                    "id",
+                    models.BigAutoField(
+                        auto_created=True,
+                        primary_key=True,
+                        serialize=False,
+                        verbose_name="ID",
+                    ),
+                ),
+                (
+                    "created_at",
+                    models.DateTimeField(auto_now_add=True, verbose_name="created at"),
+                ),
+                ("method", models.CharField(max_length=10, verbose_name="method")),
+                ("path", models.CharField(max_length=2000, verbose_name="path")),
+                (
+                    "view_name",
+                    models.CharField(max_length=100, verbose_name="view name"),
+                ),
+                (
+                    "status_code",
+                    models.PositiveSmallIntegerField(verbose_name="status code"),
+                ),
+                (
+                    "trigger",
+                    models.CharField(
+                        choices=[
+                            ("header", "Signed header"),
+                            ("cookie", "Admin toggle"),
+                            ("sample", "Random sample"),
+                        ],
+                        max_length=10,
+                        verbose_name="trigger",
+                    ),
+                ),
+                ("duration", models.FloatField(verbose_name="duration (ms)")),
+                ("interval", models.FloatField(verbose_name="sampling interval (ms)")),
+                ("sample_count", models.PositiveIntegerField(verbose_name="samples")),
+                (
+                    "stacks",
+                    models.TextField(blank=True, verbose_name="collapsed stacks"),
+                ),
+            ],
+            options={
+                "verbose_name": "Request Profile",
+                "verbose_name_plural": "Request Profiles",
+                "ordering": ["-created_at"],
+            },
+        ),
+    ]
@@ -0,0 +1,95 @@
+# Generated by Django 6.0 on 2026-10-18 19:44
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+    dependencies = [
+        ("forms", "0014_request_profile"),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="ChoiceSet",
+            fields=[
+                (
+                    "id",
+                    models.BigAutoField(
+                        auto_created=True,
+                        primary_key=True,
+                        serialize=False,
+                        verbose_name="ID",
+                    ),
+                ),
+                ("key", models.SlugField(unique=True, verbose_name="key")),
+                ("label", models.CharField(max_length=200, verbose_name="label")),
+                (
+                    "version",
+                    models.PositiveIntegerField(
+                        default=1, editable=False, verbose_name="version"
+                    ),
+                ),
+            ],
+            options={
+                "verbose_name": "Choice Set",
+                "verbose_name_plural": "Choice Sets",
+            },
+        ),
+        migrations.AddField(
+            model_name="formfield",
+            name="choice_set",
+            field=models.ForeignKey(
+                blank=True,
+                null=True,
+                on_delete=django.db.models.deletion.PROTECT,
+                related_name="fields",
+                to="forms.choiceset",
+            ),
+        ),
+        migrations.CreateModel(
+            name="ChoiceSetMembership",
+            fields=[
+                (
+                    "id",
+                    models.BigAutoField(
+                        auto_created=True,
+                        primary_key=True,
+                        serialize=False,
+                        verbose_name="ID",
+                    ),
+                ),
+                ("order", models.PositiveIntegerField(default=1)),
+                (
+                    "choice",
+                    models.ForeignKey(
+                        on_delete=django.db.models.deletion.CASCADE,
+                        to="forms.fieldchoice",
+                    ),
+                ),
+                (
+                    "choice_set",
+                    models.ForeignKey(
+                        db_index=False,
+                        on_delete=django.db.models.deletion.CASCADE,
+                        to="forms.choiceset",
+                    ),
+                ),
+            ],
+        ),
+        migrations.AddField(
+            model_name="choiceset",
+            name="choices",
+            field=models.ManyToManyField(
+                related_name="choice_sets",
+                through="forms.ChoiceSetMembership",
+                to="forms.fieldchoice",
+            ),
+        ),
+        migrations.AddConstraint(
+            model_name="choicesetmembership",
+            constraint=models.UniqueConstraint(
+                fields=("choice_set", "choice"), name="unique_choice_set_choice"
+            ),
+        ),
+    ]
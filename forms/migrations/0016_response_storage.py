@@ -0,0 +1,59 @@
+# Generated by Django 6.0 on 2026-10-18 19:50
+
+import django.contrib.postgres.indexes
+from django.conf import settings
+from django.db import migrations, models
+
+import forms.models
+
+
+class Migration(migrations.Migration):
+    dependencies = [
+        ("forms", "0015_choice_sets"),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        # Existing forms keep their answers in rows whatever the new default.
+        migrations.AddField(
+            model_name="form",
+            name="response_storage",
+            field=models.CharField(
+                choices=[
+                    ("rows", "One row per answer"),
+                    ("document", "One document per response"),
+                ],
+                default="rows",
+                editable=False,
+                max_length=10,
+                verbose_name="response storage",
+            ),
+        ),
+        migrations.AlterField(
+            model_name="form",
+            name="response_storage",
+            field=models.CharField(
+                choices=[
+                    ("rows", "One row per answer"),
+                    ("document", "One document per response"),
+                ],
+                default=forms.models.get_default_response_storage,
+                editable=False,
+                max_length=10,
+                verbose_name="response storage",
+            ),
+        ),
+        migrations.AddField(
+            model_name="formresponse",
+            name="answers",
+            field=models.JSONField(blank=True, null=True, verbose_name="answers"),
+        ),
+        migrations.AddIndex(
+            model_name="formresponse",
+            index=django.contrib.postgres.indexes.GinIndex(
+                fields=["answers"],
+                name="forms_response_answers_idx",
+                opclasses=["jsonb_path_ops"],
+            ),
+        ),
+    ]
@@ -0,0 +1,72 @@
+# Generated by Django 6.0 on 2026-10-18 19:57
+
+import django.db.models.deletion
+import django.utils.timezone
+from django.db import migrations, models
+
+from forms.partitioning import partition_table, unpartition_table
+
+PARTITIONED = ("FormResponse", "FormFieldResponse")
+
+
+def partition_responses(apps, schema_editor):
+    for name in PARTITIONED:
+        partition_table(schema_editor, apps.get_model("forms", name))
+
+
+def unpartition_responses(apps, schema_editor):
+    for name in PARTITIONED:
+        unpartition_table(schema_editor, apps.get_model("forms", name))
+
+
+class Migration(migrations.Migration):
+    dependencies = [
+        ("forms", "0016_response_storage"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="form",
+            name="archived_at",
+            field=models.DateTimeField(
+                blank=True, editable=False, null=True, verbose_name="archived at"
+            ),
+        ),
+        # Runs backwards last, rebuilding the tables from the state before.
+        migrations.RunPython(migrations.RunPython.noop, unpartition_responses),
+        # partition_responses rebuilds the constraints from the state after.
+        migrations.SeparateDatabaseAndState(
+            state_operations=[
+                migrations.RemoveConstraint(
+                    model_name="formfieldresponse",
+                    name="unique_response_field",
+                ),
+                migrations.AlterField(
+                    model_name="formfieldresponse",
+                    name="created_at",
+                    field=models.DateTimeField(
+                        default=django.utils.timezone.now, verbose_name="created at"
+                    ),
+                ),
+                migrations.AlterField(
+                    model_name="formfieldresponse",
+                    name="response",
+                    field=models.ForeignKey(
+                        db_constraint=False,
+                        db_index=False,
+                        on_delete=django.db.models.deletion.CASCADE,
+                        to="forms.formresponse",
+                        verbose_name="form response",
+                    ),
+                ),
+                migrations.AddConstraint(
+                    model_name="formfieldresponse",
+                    constraint=models.UniqueConstraint(
+                        fields=("response", "field", "created_at"),
+                        name="unique_response_field",
+                    ),
+                ),
+            ],
+        ),
+        migrations.RunPython(partition_responses, migrations.RunPython.noop),
+    ]
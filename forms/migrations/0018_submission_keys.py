@@ -0,0 +1,72 @@
+# Generated by Django 6.0 on 2026-10-18 20:01
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+    dependencies = [
+        ("forms", "0017_partition_responses"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="form",
+            name="dedupe_content",
+            field=models.BooleanField(
+                default=False,
+                help_text="Reject a submission repeating a user's earlier answers.",
+                verbose_name="reject duplicate answers",
+            ),
+        ),
+        migrations.CreateModel(
+            name="SubmissionKey",
+            fields=[
+                (
+                    "id",
+                    models.BigAutoField(
+                        auto_created=True,
+                        primary_key=True,
+                        serialize=False,
+                        verbose_name="ID",
+                    ),
+                ),
+                (
+                    "kind",
+                    models.CharField(
+                        choices=[("id", "Submission ID"), ("content", "Content hash")],
+                        max_length=10,
+                        verbose_name="kind",
+                    ),
+                ),
+                ("key", models.CharField(max_length=64, verbose_name="key")),
+                (
+                    "form",
+                    models.ForeignKey(
+                        db_index=False,
+                        on_delete=django.db.models.deletion.CASCADE,
+                        to="forms.form",
+                        verbose_name="form",
+                    ),
+                ),
+                (
+                    "response",
+                    models.ForeignKey(
+                        db_constraint=False,
+                        on_delete=django.db.models.deletion.CASCADE,
+                        to="forms.formresponse",
+                        verbose_name="form response",
+                    ),
+                ),
+            ],
+            options={
+                "verbose_name": "Submission Key",
+                "verbose_name_plural": "Submission Keys",
+                "constraints": [
+                    models.UniqueConstraint(
+                        fields=("form", "kind", "key"), name="unique_submission_key"
+                    )
+                ],
+            },
+        ),
+    ]
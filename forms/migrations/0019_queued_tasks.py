@@ -0,0 +1,117 @@
+# Generated by Django 6.0 on 2026-10-18 20:05
+
+import django.utils.timezone
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+    dependencies = [
+        ("forms", "0018_submission_keys"),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="QueuedTask",
+            fields=[
+                (
+                    "id",
+                    models.BigAutoField(
+                        auto_created=True,
+                        primary_key=True,
+                        serialize=False,
+                        verbose_name="ID",
+                    ),
+                ),
+                ("task_path", models.CharField(max_length=200, verbose_name="task")),
+                ("queue_name", models.CharField(max_length=100, verbose_name="queue")),
+                (
+                    "priority",
+                    models.SmallIntegerField(default=0, verbose_name="priority"),
+                ),
+                ("args", models.JSONField(default=list, verbose_name="arguments")),
+                (
+                    "kwargs",
+                    models.JSONField(default=dict, verbose_name="keyword arguments"),
+                ),
+                (
+                    "batch_key",
+                    models.CharField(
+                        blank=True, max_length=100, null=True, verbose_name="batch key"
+                    ),
+                ),
+                (
+                    "status",
+                    models.CharField(
+                        choices=[
+                            ("READY", "Ready"),
+                            ("RUNNING", "Running"),
+                            ("FAILED", "Failed"),
+                            ("SUCCESSFUL", "Successful"),
+                        ],
+                        default="READY",
+                        max_length=10,
+                        verbose_name="status",
+                    ),
+                ),
+                (
+                    "enqueued_at",
+                    models.DateTimeField(
+                        default=django.utils.timezone.now, verbose_name="enqueued at"
+                    ),
+                ),
+                (
+                    "run_after",
+                    models.DateTimeField(
+                        default=django.utils.timezone.now, verbose_name="run after"
+                    ),
+                ),
+                (
+                    "started_at",
+                    models.DateTimeField(
+                        blank=True, null=True, verbose_name="started at"
+                    ),
+                ),
+                (
+                    "last_attempted_at",
+                    models.DateTimeField(
+                        blank=True, null=True, verbose_name="last attempted at"
+                    ),
+                ),
+                (
+                    "finished_at",
+                    models.DateTimeField(
+                        blank=True, null=True, verbose_name="finished at"
+                    ),
+                ),
+                ("worker_ids", models.JSONField(default=list, verbose_name="workers")),
+                ("errors", models.JSONField(default=list, verbose_name="errors")),
+                (
+                    "return_value",
+                    models.JSONField(
+                        blank=True, null=True, verbose_name="return value"
+                    ),
+                ),
+            ],
+            options={
+                "verbose_name": "Queued Task",
+                "verbose_name_plural": "Queued Tasks",
+                "indexes": [
+                    models.Index(
+                        condition=models.Q(("status", "READY")),
+                        fields=["queue_name", "-priority", "run_after"],
+                        name="forms_task_ready_idx",
+                    ),
+                    models.Index(
+                        fields=["status", "finished_at"], name="forms_task_status_idx"
+                    ),
+                ],
+                "constraints": [
+                    models.UniqueConstraint(
+                        condition=models.Q(("status", "READY")),
+                        fields=("batch_key",),
+                        name="unique_ready_task_batch",
+                    )
+                ],
+            },
+        ),
+    ]
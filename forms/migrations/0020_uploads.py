@@ -0,0 +1,102 @@
+# Generated by Django 6.0 on 2026-10-18 20:14
+
+import uuid
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+    dependencies = [
+        ("forms", "0019_queued_tasks"),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="Upload",
+            fields=[
+                (
+                    "id",
+                    models.UUIDField(
+                        default=uuid.uuid4,
+                        editable=False,
+                        primary_key=True,
+                        serialize=False,
+                    ),
+                ),
+                ("filename", models.CharField(max_length=255, verbose_name="filename")),
+                (
+                    "content_type",
+                    models.CharField(max_length=100, verbose_name="content type"),
+                ),
+                ("size", models.PositiveBigIntegerField(verbose_name="size")),
+                (
+                    "offset",
+                    models.PositiveBigIntegerField(default=0, verbose_name="offset"),
+                ),
+                (
+                    "sha256",
+                    models.CharField(blank=True, max_length=64, verbose_name="SHA-256"),
+                ),
+                (
+                    "state",
+                    models.CharField(
+                        choices=[
+                            ("uploading", "Uploading"),
+                            ("complete", "Complete"),
+                            ("processed", "Processed"),
+                            ("failed", "Failed"),
+                        ],
+                        default="uploading",
+                        max_length=10,
+                        verbose_name="state",
+                    ),
+                ),
+                (
+                    "preview",
+                    models.CharField(blank=True, max_length=20, verbose_name="preview"),
+                ),
+                (
+                    "error",
+                    models.CharField(blank=True, max_length=200, verbose_name="error"),
+                ),
+                (
+                    "created_at",
+                    models.DateTimeField(auto_now_add=True, verbose_name="created at"),
+                ),
+                (
+                    "completed_at",
+                    models.DateTimeField(
+                        blank=True, null=True, verbose_name="completed at"
+                    ),
+                ),
+                (
+                    "field",
+                    models.ForeignKey(
+                        on_delete=django.db.models.deletion.CASCADE,
+                        to="forms.formfield",
+                        verbose_name="form field",
+                    ),
+                ),
+                (
+                    "user",
+                    models.ForeignKey(
+                        on_delete=django.db.models.deletion.CASCADE,
+                        to=settings.AUTH_USER_MODEL,
+                        verbose_name="user",
+                    ),
+                ),
+            ],
+            options={
+                "verbose_name": "Upload",
+                "verbose_name_plural": "Uploads",
+                "indexes": [
+                    models.Index(
+                        fields=["state", "created_at"], name="forms_upload_state_idx"
+                    )
+                ],
+            },
+        ),
+    ]
@@ -0,0 +1,31 @@
+# Generated by Django 6.0 on 2026-10-18 20:34
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+    dependencies = [
+        ("forms", "0020_uploads"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="upload",
+            name="machine_id",
+            field=models.CharField(blank=True, max_length=50, verbose_name="machine"),
+        ),
+        migrations.AlterField(
+            model_name="upload",
+            name="state",
+            field=models.CharField(
+                choices=[
+                    ("uploading", "Uploading"),
+                    ("processed", "Processed"),
+                    ("failed", "Failed"),
+                ],
+                default="uploading",
+                max_length=10,
+                verbose_name="state",
+            ),
+        ),
+    ]
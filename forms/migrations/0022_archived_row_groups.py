@@ -0,0 +1,52 @@
+# Generated by Django 6.0 on 2026-10-18 20:43
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+    dependencies = [
+        ("forms", "0021_upload_machine"),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="ArchivedRowGroup",
+            fields=[
+                (
+                    "id",
+                    models.BigAutoField(
+                        auto_created=True,
+                        primary_key=True,
+                        serialize=False,
+                        verbose_name="ID",
+                    ),
+                ),
+                ("index", models.PositiveIntegerField(verbose_name="index")),
+                ("version", models.PositiveSmallIntegerField(verbose_name="version")),
+                (
+                    "response_count",
+                    models.PositiveIntegerField(verbose_name="response count"),
+                ),
+                ("data", models.BinaryField(verbose_name="data")),
+                (
+                    "form",
+                    models.ForeignKey(
+                        db_index=False,
+                        on_delete=django.db.models.deletion.CASCADE,
+                        to="forms.form",
+                        verbose_name="form",
+                    ),
+                ),
+            ],
+            options={
+                "verbose_name": "Archived Row Group",
+                "verbose_name_plural": "Archived Row Groups",
+                "constraints": [
+                    models.UniqueConstraint(
+                        fields=("form", "index"), name="unique_archived_row_group"
+                    )
+                ],
+            },
+        ),
+    ]
@@ -0,0 +1,25 @@
+from django.db import migrations
+
+# Submission ID keys become "<user pk>:<uuid>" (see forms.dedupe).
+SCOPE_SQL = """
+    UPDATE forms_submissionkey k
+    SET key = r.user_id || ':' || k.key
+    FROM forms_formresponse r
+    WHERE r.id = k.response_id AND k.kind = 'id' AND position(':' in k.key) = 0
+"""
+
+UNSCOPE_SQL = """
+    UPDATE forms_submissionkey
+    SET key = split_part(key, ':', 2)
+    WHERE kind = 'id' AND position(':' in key) > 0
+"""
+
+
+class Migration(migrations.Migration):
+    dependencies = [
+        ("forms", "0022_archived_row_groups"),
+    ]
+
+    operations = [
+        migrations.RunSQL(SCOPE_SQL, UNSCOPE_SQL),
+    ]
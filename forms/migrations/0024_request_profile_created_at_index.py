@@ -0,0 +1,19 @@
+# Generated by Django 6.0 on 2026-10-18 20:53
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+    dependencies = [
+        ("forms", "0023_submission_keys_per_user"),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name="requestprofile",
+            name="created_at",
+            field=models.DateTimeField(
+                auto_now_add=True, db_index=True, verbose_name="created at"
+            ),
+        ),
+    ]
@@ -0,0 +1,19 @@
+# Generated by Django 6.0 on 2026-10-18 21:01
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+    dependencies = [
+        ("forms", "0024_request_profile_created_at_index"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="formresponse",
+            name="summarized_at",
+            field=models.DateTimeField(
+                blank=True, null=True, verbose_name="summarized at"
+            ),
+        ),
+    ]
@@ -0,0 +1,27 @@
+# Generated by Django 6.0 on 2026-10-18 21:03
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+    dependencies = [
+        ("forms", "0025_response_summarized_at"),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name="upload",
+            name="state",
+            field=models.CharField(
+                choices=[
+                    ("uploading", "Uploading"),
+                    ("processing", "Processing"),
+                    ("processed", "Processed"),
+                    ("failed", "Failed"),
+                ],
+                default="uploading",
+                max_length=10,
+                verbose_name="state",
+            ),
+        ),
+    ]
@@ -0,0 +1,17 @@
+# Generated by Django 6.0 on 2026-10-18 21:05
+
+from django.db import migrations
+
+
+# The GIN index on answers is opt-in: `manage.py index_answers --containment`.
+class Migration(migrations.Migration):
+    dependencies = [
+        ("forms", "0026_upload_processing_state"),
+    ]
+
+    operations = [
+        migrations.RemoveIndex(
+            model_name="formfieldresponse",
+            name="forms_fieldresp_value_gin",
+        ),
+    ]
@@ -0,0 +1,17 @@
+# Generated by Django 6.0 on 2026-10-18 21:06
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+    dependencies = [
+        ("forms", "0027_optional_value_index"),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name="formfieldresponse",
+            name="created_at",
+            field=models.DateTimeField(editable=False, verbose_name="created at"),
+        ),
+    ]
@@ -2,8 +2,12 @@ import uuid
 from itertools import chain
 
 from django.conf import settings
+from django.contrib.postgres.indexes import GinIndex
+from django.core.exceptions import ValidationError
 from django.db import models
+from django.tasks import TaskResultStatus
 from django.urls import reverse
+from django.utils import timezone
 from django.utils.translation import gettext_lazy as _
 
 
@@ -23,11 +27,40 @@ class FieldType(models.Model):
     def __str__(self):
         return self.default_label
 
+    def clean(self):
+        from .validation import check_rules
+
+        if errors := check_rules(self.default_validations):
+            raise ValidationError(
+                {
+                    "default_validations": [
+                        f"{rule}: {message}" for rule, message in errors.items()
+                    ]
+                }
+            )
+
 
 def create_default_order_dict():
     return {"xs": 1, "sm": 1, "md": 1, "lg": 1, "xl": 1, "2xl": 1}
 
 
+def sync_position(instance, save_kwargs):
+    """Copy ``instance.order`` into its indexed ``position`` before a save."""
+    from .layout import get_position
+
+    instance.position = get_position(instance.order)
+    update_fields = save_kwargs.get("update_fields")
+    if update_fields is not None and "order" in update_fields:
+        save_kwargs["update_fields"] = {*update_fields, "position"}
+
+
+class FormFieldGroupQuerySet(models.QuerySet):
+    def with_render_data(self):
+        return self.prefetch_related(
+            models.Prefetch("fields", queryset=FormField.objects.with_render_data())
+        )
+
+
 class FormFieldGroup(models.Model):
     form = models.ForeignKey(
         "Form", related_name="field_groups", on_delete=models.CASCADE
@@ -43,26 +76,95 @@ class FormFieldGroup(models.Model):
         default=create_default_order_dict,
         blank=True,
     )
+    # order["xs"], materialised by save() so the DOM order sorts in SQL.
+    position = models.PositiveIntegerField(default=1, editable=False)
+
+    objects = FormFieldGroupQuerySet.as_manager()
 
     class Meta:
         unique_together = ("form", "key")
+        ordering = ["position", "pk"]
 
     def __str__(self):
         return f"{self.form.title} - {self.label}"
 
+    def save(self, *args, **kwargs):
+        sync_position(self, kwargs)
+        super().save(*args, **kwargs)
+
+    @property
+    def layout_class(self):
+        from .layout import get_layout_class
+
+        return get_layout_class(order=self.order)
+
+    @property
+    def component_id(self):
+        return f"group-{self.pk}"
+
     def get_absolute_url(self):
         return reverse("form_field_group_component", kwargs={"pk": self.pk})
 
+    def get_template_name(self):
+        return "form_field_group.html"
+
+    def get_fields(self):
+        return self.fields.all()
+
     def get_field_urls(self):
-        return [x.get_absolute_url() for x in self.fields.all()]
+        return [x.get_absolute_url() for x in self.get_fields()]
 
 
 def create_default_widths_dict():
     return {"xs": 12, "sm": 12, "md": 6, "lg": 4, "xl": 3, "2xl": 3}
 
 
+def get_generated_value(field_type_key):
+    """The value rendered into a field of this type, fresh per request, or None."""
+    if field_type_key == "submission_id":
+        return str(uuid.uuid4())
+    if field_type_key == "submission_timestamp":
+        return timezone.localtime().strftime("%Y-%m-%d %H:%M")
+    return None
+
+
+# Sample Conditional Logic
+# {
+#   "action": "show",               // "show" (default) or "hide" when matched
+#   "match": "all",                 // "all" (default) or "any" of the rules
+#   "rules": [
+#     {
+#       "field": 33,                // pk of another field in the same form
+#       "operator": "$eq",          // "$eq", "$ne", "$in", "$regex", "$gt",
+#                                   // "$lt", "$filled", "$empty"
+#       "value": "SGP"              // value to compare
+#     }
+#   ]
+# }
+
+
+class FormFieldQuerySet(models.QuerySet):
+    def with_render_data(self):
+        """
+        Load everything the field accessors and templates touch, so rendering
+        any number of fields costs a fixed number of queries.
+        """
+        return self.select_related("field_type", "choice_set").prefetch_related(
+            models.Prefetch(
+                "choices",
+                queryset=FieldChoice.objects.order_by(
+                    "formfieldchoicemembership__order", "formfieldchoicemembership__pk"
+                ),
+                to_attr="ordered_choices",
+            )
+        )
+
+
 class FormField(models.Model):
-    form = models.ForeignKey("Form", related_name="fields", on_delete=models.CASCADE)
+    # Indexed by the (form, group) index below.
+    form = models.ForeignKey(
+        "Form", related_name="fields", db_index=False, on_delete=models.CASCADE
+    )
     conditional_logic = models.JSONField(default=dict, blank=True)
     group = models.ForeignKey(
         "FormFieldGroup",
@@ -76,6 +178,14 @@ class FormField(models.Model):
         FieldType, null=True, blank=True, on_delete=models.PROTECT
     )
     choices = models.ManyToManyField("FieldChoice", through="FormFieldChoiceMembership")
+    # Shared list used instead of ``choices`` when set.
+    choice_set = models.ForeignKey(
+        "ChoiceSet",
+        related_name="fields",
+        null=True,
+        blank=True,
+        on_delete=models.PROTECT,
+    )
     label = models.CharField(max_length=200, blank=True)
     help_text = models.CharField(max_length=300, blank=True)
     validations = models.JSONField(default=dict, blank=True)
@@ -88,14 +198,63 @@ class FormField(models.Model):
         blank=True,
     )
     optional = models.BooleanField(default=False, blank=True)
+    # order["xs"], materialised by save() so the DOM order sorts in SQL.
+    position = models.PositiveIntegerField(default=1, editable=False)
+
+    objects = FormFieldQuerySet.as_manager()
 
     class Meta:
         verbose_name = _("Form Field")
         verbose_name_plural = _("Form Fields")
+        ordering = ["position", "pk"]
+        indexes = [
+            # Form.get_field_tree and schema builds: fields of a form by group,
+            # in DOM order.
+            models.Index(
+                fields=["form", "group", "position"],
+                name="forms_field_form_group_idx",
+            ),
+        ]
 
     def __str__(self):
         return f"{self.group or self.form} - {self.get_label()}"
 
+    def clean(self):
+        from .logic import check_conditional_logic
+        from .validation import check_rules
+
+        if errors := check_rules(self.validations):
+            raise ValidationError(
+                {
+                    "validations": [
+                        f"{rule}: {message}" for rule, message in errors.items()
+                    ]
+                }
+            )
+        siblings = dict(
+            FormField.objects.filter(form_id=self.form_id)
+            .exclude(pk=self.pk)
+            .values_list("pk", "conditional_logic")
+        )
+        try:
+            check_conditional_logic(self.pk, self.conditional_logic, siblings)
+        except ValidationError as e:
+            raise ValidationError({"conditional_logic": e.messages})
+
+    def save(self, *args, **kwargs):
+        sync_position(self, kwargs)
+        super().save(*args, **kwargs)
+
+    @property
+    def layout_class(self):
+        from .layout import get_layout_class
+
+        return get_layout_class(self.widths, self.order)
+
+    @property
+    def component_id(self):
+        return f"field-{self.pk}"
+
     def get_absolute_url(self):
         return reverse("form_field_component", kwargs={"pk": self.pk})
 
@@ -105,17 +264,43 @@ class FormField(models.Model):
     def get_help_text(self):
         return self.help_text or self.field_type.default_help_text
 
+    @property
+    def choice_set_ref(self):
+        """(pk, version) of the field's choice set, keying its cached choices."""
+        if self.choice_set_id is None:
+            return None
+        return (self.choice_set_id, self.choice_set.version)
+
+    @property
+    def lazy_choices(self):
+        from .choices import is_lazy
+
+        return is_lazy(self.choice_set_ref)
+
+    def get_options_url(self):
+        from .choices import get_options_url
+
+        return get_options_url(self.choice_set_ref)
+
     def get_choices(self):
         if not self.field_type.supports_choices:
             return None
-        return [(c.value, c.label) for c in self.choices.all()]
+        if self.choice_set_id is not None:
+            from .choices import get_choice_set_choices
+
+            return list(get_choice_set_choices(*self.choice_set_ref))
+        choices = getattr(self, "ordered_choices", None)
+        if choices is None:
+            choices = self.choices.order_by(
+                "formfieldchoicemembership__order", "formfieldchoicemembership__pk"
+            )
+        return [(c.value, c.label) for c in choices]
 
     def get_template_name(self):
         return f"fields/{self.field_type.key}.html"
 
     def get_value(self):
-        if self.field_type.key == "submission_id":
-            return str(uuid.uuid4())
+        return get_generated_value(self.field_type.key)
 
 
 class FieldChoice(models.Model):
@@ -126,6 +311,43 @@ class FieldChoice(models.Model):
         return f"{self.label} ({self.value})"
 
 
+class ChoiceSet(models.Model):
+    """
+    A named choice list (countries, currencies, ...) that any number of fields
+    share through ``FormField.choice_set``. ``version`` is bumped by the
+    signal handlers whenever its choices change and keys the cached lists and
+    option blocks in ``forms.choices``.
+    """
+
+    key = models.SlugField(_("key"), max_length=50, unique=True)
+    label = models.CharField(_("label"), max_length=200)
+    choices = models.ManyToManyField(
+        FieldChoice, through="ChoiceSetMembership", related_name="choice_sets"
+    )
+    version = models.PositiveIntegerField(_("version"), default=1, editable=False)
+
+    class Meta:
+        verbose_name = _("Choice Set")
+        verbose_name_plural = _("Choice Sets")
+
+    def __str__(self):
+        return self.label
+
+
+class ChoiceSetMembership(models.Model):
+    # Indexed by the (choice_set, choice) constraint below.
+    choice_set = models.ForeignKey(ChoiceSet, db_index=False, on_delete=models.CASCADE)
+    choice = models.ForeignKey(FieldChoice, on_delete=models.CASCADE)
+    order = models.PositiveIntegerField(default=1)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(
+                fields=["choice_set", "choice"], name="unique_choice_set_choice"
+            )
+        ]
+
+
 class FormFieldChoiceMembership(models.Model):
     field = models.ForeignKey("FormField", on_delete=models.CASCADE)
     choice = models.ForeignKey("FieldChoice", on_delete=models.CASCADE)
@@ -149,6 +371,8 @@ class FormFieldChoiceMembership(models.Model):
 #   "min": 0,                       // number, minimum for numeric fields
 #   "max": 100,                     // number, maximum for numeric fields
 #   "allowed_domains": ["company.com"], // array, for email domains
+#   "max_size": 10485760,           // integer, bytes, for uploads
+#   "allowed_types": ["image/*"],   // array of MIME types or extensions
 #   "custom": {                     // optional, custom validator logic
 #     "operator": "$in",            // "$in", "$regex", "$gt", "$lt"
 #     "value": ["A", "B", "C"]     // value to compare
@@ -171,8 +395,48 @@ class ValidationType(models.Model):
     def __str__(self):
         return self.label
 
+    def clean(self):
+        try:
+            self.default_error_message.format(0)
+        except (IndexError, KeyError, ValueError):
+            raise ValidationError(
+                {
+                    "default_error_message": _(
+                        "Use {0} for the rule's value and no other placeholders."
+                    )
+                }
+            )
+
+
+class FormQuerySet(models.QuerySet):
+    def with_render_data(self):
+        return self.prefetch_related(
+            models.Prefetch(
+                "fields",
+                queryset=FormField.objects.with_render_data().filter(
+                    group__isnull=True
+                ),
+                to_attr="ungrouped_fields",
+            ),
+            models.Prefetch(
+                "field_groups", queryset=FormFieldGroup.objects.with_render_data()
+            ),
+        )
+
+
+def get_default_response_storage():
+    return getattr(settings, "FORMS_RESPONSE_STORAGE", Form.ROWS)
+
 
 class Form(models.Model):
+    # How answers are stored, see forms.storage.
+    ROWS = "rows"
+    DOCUMENT = "document"
+    RESPONSE_STORAGE_CHOICES = [
+        (ROWS, _("One row per answer")),
+        (DOCUMENT, _("One document per response")),
+    ]
+
     owner = models.ForeignKey(
         settings.AUTH_USER_MODEL, verbose_name=_("owner"), on_delete=models.CASCADE
     )
@@ -183,6 +447,29 @@ class Form(models.Model):
     expiration_date = models.DateTimeField(
         _("expiration date"), blank=False, auto_now=False, auto_now_add=False
     )
+    schema_version = models.PositiveIntegerField(
+        _("schema version"), default=1, editable=False
+    )
+    # Changed with `manage.py convert_response_storage`, which moves the answers.
+    response_storage = models.CharField(
+        _("response storage"),
+        max_length=10,
+        choices=RESPONSE_STORAGE_CHOICES,
+        default=get_default_response_storage,
+        editable=False,
+    )
+    # Set once `manage.py archive_responses` has moved the answers to their
+    # archive.
+    archived_at = models.DateTimeField(
+        _("archived at"), null=True, blank=True, editable=False
+    )
+    dedupe_content = models.BooleanField(
+        _("reject duplicate answers"),
+        default=False,
+        help_text=_("Reject a submission repeating a user's earlier answers."),
+    )
+
+    objects = FormQuerySet.as_manager()
 
     class Meta:
         verbose_name = _("Form")
@@ -191,6 +478,17 @@ class Form(models.Model):
     def __str__(self):
         return self.title
 
+    def save(self, *args, **kwargs):
+        # Bump atomically so a stale instance never rolls the version back.
+        bump = not self._state.adding
+        if bump:
+            self.schema_version = models.F("schema_version") + 1
+            if kwargs.get("update_fields") is not None:
+                kwargs["update_fields"] = {*kwargs["update_fields"], "schema_version"}
+        super().save(*args, **kwargs)
+        if bump:
+            self.refresh_from_db(fields=["schema_version"])
+
     def get_absolute_url(self):
         return reverse("form_detail", kwargs={"pk": self.pk})
 
@@ -198,26 +496,56 @@ class Form(models.Model):
         return reverse("form_update", kwargs={"pk": self.pk})
 
     def get_field_urls(self):
-        return [
-            y.get_absolute_url()
-            for y in chain(
-                self.fields.filter(group__isnull=True).all(), self.field_groups.all()
-            )
-        ]
-
-
+        return [y.get_absolute_url() for y in self.get_field_tree()]
+
+    def get_field_tree(self):
+        """
+        Top level fields followed by field groups, in render order. Reuses the
+        ``ungrouped_fields`` prefetch from ``Form.objects.with_render_data()``.
+        """
+        ungrouped_fields = getattr(self, "ungrouped_fields", None)
+        if ungrouped_fields is None:
+            ungrouped_fields = self.fields.filter(group__isnull=True)
+        return list(chain(ungrouped_fields, self.field_groups.all()))
+
+
+# FormResponse and FormFieldResponse are partitioned by created_at month (see
+# forms.partitioning), so their primary keys are (id, created_at) in the
+# database and FormFieldResponse.response has no foreign key constraint.
 class FormResponse(models.Model):
-    form = models.ForeignKey(Form, verbose_name=_("form"), on_delete=models.CASCADE)
+    # Indexed by the (form, created_at) and (form, user) indexes below.
+    form = models.ForeignKey(
+        Form, verbose_name=_("form"), db_index=False, on_delete=models.CASCADE
+    )
     user = models.ForeignKey(
         settings.AUTH_USER_MODEL, verbose_name=_("user"), on_delete=models.CASCADE
     )
     created_at = models.DateTimeField(
         _("created at"), auto_now=False, auto_now_add=True
     )
+    # Answers keyed by field pk when the form uses document storage.
+    answers = models.JSONField(_("answers"), null=True, blank=True)
+    # Set when the answers are folded into the form's summaries, so a roll-up
+    # that runs again doesn't count them twice (see forms.analytics).
+    summarized_at = models.DateTimeField(_("summarized at"), null=True, blank=True)
 
     class Meta:
         verbose_name = _("Form Response")
         verbose_name_plural = _("Form Responses")
+        indexes = [
+            # Exports and dashboards: a form's responses by time.
+            models.Index(
+                fields=["form", "created_at"], name="forms_response_form_time_idx"
+            ),
+            # "My responses": a user's responses to a form.
+            models.Index(fields=["form", "user"], name="forms_response_form_user_idx"),
+            # JSON containment filters on document-mode answers.
+            GinIndex(
+                fields=["answers"],
+                opclasses=["jsonb_path_ops"],
+                name="forms_response_answers_idx",
+            ),
+        ]
 
     def __str__(self):
         return self.name
@@ -227,26 +555,325 @@ class FormResponse(models.Model):
 
 
 class FormFieldResponse(models.Model):
+    # Indexed by the (response, field) constraint below. Postgres can't
+    # reference a partitioned table's id alone, so the cascade is Django's.
     response = models.ForeignKey(
-        FormResponse, verbose_name=_("form response"), on_delete=models.CASCADE
+        FormResponse,
+        verbose_name=_("form response"),
+        db_index=False,
+        db_constraint=False,
+        on_delete=models.CASCADE,
     )
 
+    # Indexed by the (field, created_at) index below.
     field = models.ForeignKey(
-        FormField, verbose_name=_("form field"), on_delete=models.CASCADE
+        FormField,
+        verbose_name=_("form field"),
+        db_index=False,
+        on_delete=models.CASCADE,
     )
 
     value = models.JSONField()
 
-    created_at = models.DateTimeField(
-        _("created at"), auto_now=False, auto_now_add=True
-    )
+    # The response's created_at, keeping both rows in the same partition and
+    # the unique constraint below to one answer per field. Set by save(); no
+    # default, so a bulk insert that leaves it out fails.
+    created_at = models.DateTimeField(_("created at"), editable=False)
 
     class Meta:
         verbose_name = _("Form Field Response")
         verbose_name_plural = _("Form Field Responses")
+        constraints = [
+            # One answer per field per response; also serves the export join.
+            # Partitioned unique constraints must include the partition key.
+            models.UniqueConstraint(
+                fields=["response", "field", "created_at"],
+                name="unique_response_field",
+            ),
+        ]
+        indexes = [
+            # Per-field analytics and percentiles, optionally over a time range.
+            models.Index(
+                fields=["field", "created_at"], name="forms_fieldresp_field_time_idx"
+            ),
+            # JSON containment filters are indexed on demand with
+            # `manage.py index_answers --containment` (see forms.storage).
+        ]
 
     def __str__(self):
         return self.name
 
+    def save(self, *args, **kwargs):
+        self.created_at = self.response.created_at
+        super().save(*args, **kwargs)
+
     def get_absolute_url(self):
         return reverse("form_field_response_detail", kwargs={"pk": self.pk})
+
+
+class SubmissionKey(models.Model):
+    """
+    The response first stored under a submission ID, or under a hash of a
+    user's answers on forms with ``dedupe_content`` (see ``forms.dedupe``).
+    Kept out of the partitioned response tables so the key alone is unique.
+    """
+
+    SUBMISSION_ID = "id"
+    CONTENT = "content"
+    KIND_CHOICES = [
+        (SUBMISSION_ID, _("Submission ID")),
+        (CONTENT, _("Content hash")),
+    ]
+
+    # Indexed by the (form, kind, key) constraint below.
+    form = models.ForeignKey(
+        Form, verbose_name=_("form"), db_index=False, on_delete=models.CASCADE
+    )
+    kind = models.CharField(_("kind"), max_length=10, choices=KIND_CHOICES)
+    key = models.CharField(_("key"), max_length=64)
+    response = models.ForeignKey(
+        FormResponse,
+        verbose_name=_("form response"),
+        db_constraint=False,
+        on_delete=models.CASCADE,
+    )
+
+    class Meta:
+        verbose_name = _("Submission Key")
+        verbose_name_plural = _("Submission Keys")
+        constraints = [
+            models.UniqueConstraint(
+                fields=["form", "kind", "key"], name="unique_submission_key"
+            ),
+        ]
+
+    def __str__(self):
+        return f"{self.kind}:{self.key}"
+
+
+class ArchivedRowGroup(models.Model):
+    """
+    One gzip-compressed row group of the responses of an archived form (see
+    ``forms.archive``). Kept in Postgres rather than on a machine's disk, so
+    the archive is as durable as the rows it replaced.
+    """
+
+    # Indexed by the (form, index) constraint below.
+    form = models.ForeignKey(
+        Form, verbose_name=_("form"), db_index=False, on_delete=models.CASCADE
+    )
+    index = models.PositiveIntegerField(_("index"))
+    version = models.PositiveSmallIntegerField(_("version"))
+    response_count = models.PositiveIntegerField(_("response count"))
+    data = models.BinaryField(_("data"))
+
+    class Meta:
+        verbose_name = _("Archived Row Group")
+        verbose_name_plural = _("Archived Row Groups")
+        constraints = [
+            models.UniqueConstraint(
+                fields=["form", "index"], name="unique_archived_row_group"
+            ),
+        ]
+
+    def __str__(self):
+        return f"{self.form} #{self.index}"
+
+
+class Upload(models.Model):
+    """
+    A file uploaded in chunks for a file, image or signature field (see
+    ``forms.uploads``). Submissions answer the field with the id of a
+    processed upload.
+    """
+
+    UPLOADING = "uploading"
+    PROCESSING = "processing"
+    PROCESSED = "processed"
+    FAILED = "failed"
+    STATE_CHOICES = [
+        (UPLOADING, _("Uploading")),
+        (PROCESSING, _("Processing")),
+        (PROCESSED, _("Processed")),
+        (FAILED, _("Failed")),
+    ]
+
+    id = models.UUIDField(primary_key=True, default=uuid.uuid4, editable=False)
+    field = models.ForeignKey(
+        FormField, verbose_name=_("form field"), on_delete=models.CASCADE
+    )
+    user = models.ForeignKey(
+        settings.AUTH_USER_MODEL, verbose_name=_("user"), on_delete=models.CASCADE
+    )
+    filename = models.CharField(_("filename"), max_length=255)
+    content_type = models.CharField(_("content type"), max_length=100)
+    size = models.PositiveBigIntegerField(_("size"))
+    # Bytes received so far; the next chunk starts here.
+    offset = models.PositiveBigIntegerField(_("offset"), default=0)
+    # Declared by the client, checked once the upload is complete.
+    sha256 = models.CharField(_("SHA-256"), max_length=64, blank=True)
+    state = models.CharField(
+        _("state"), max_length=10, choices=STATE_CHOICES, default=UPLOADING
+    )
+    # The machine whose volume holds the file; chunks are routed to it.
+    machine_id = models.CharField(_("machine"), max_length=50, blank=True)
+    # Suffix of the thumbnail or rasterized signature next to the file.
+    preview = models.CharField(_("preview"), max_length=20, blank=True)
+    error = models.CharField(_("error"), max_length=200, blank=True)
+    created_at = models.DateTimeField(_("created at"), auto_now_add=True)
+    completed_at = models.DateTimeField(_("completed at"), null=True, blank=True)
+
+    class Meta:
+        verbose_name = _("Upload")
+        verbose_name_plural = _("Uploads")
+        indexes = [
+            # Purging abandoned uploads.
+            models.Index(fields=["state", "created_at"], name="forms_upload_state_idx"),
+        ]
+
+    def __str__(self):
+        return self.filename
+
+    def get_absolute_url(self):
+        return reverse("upload", kwargs={"pk": self.pk})
+
+
+class FormFieldSummary(models.Model):
+    """
+    Running per-field aggregates over FormFieldResponse values, maintained
+    incrementally by ``forms.analytics`` as responses arrive.
+    """
+
+    CHOICE = "choice"
+    NUMERIC = "numeric"
+    DATE = "date"
+    KIND_CHOICES = [
+        (CHOICE, _("Choice distribution")),
+        (NUMERIC, _("Numeric statistics")),
+        (DATE, _("Monthly date histogram")),
+    ]
+
+    field = models.ForeignKey(
+        FormField,
+        verbose_name=_("form field"),
+        related_name="summaries",
+        on_delete=models.CASCADE,
+    )
+    kind = models.CharField(_("kind"), max_length=10, choices=KIND_CHOICES)
+    bucket = models.CharField(_("bucket"), max_length=200, blank=True)
+    count = models.PositiveBigIntegerField(_("count"), default=0)
+    total = models.DecimalField(
+        _("total"), max_digits=30, decimal_places=6, null=True, blank=True
+    )
+    minimum = models.DecimalField(
+        _("minimum"), max_digits=30, decimal_places=6, null=True, blank=True
+    )
+    maximum = models.DecimalField(
+        _("maximum"), max_digits=30, decimal_places=6, null=True, blank=True
+    )
+
+    class Meta:
+        verbose_name = _("Form Field Summary")
+        verbose_name_plural = _("Form Field Summaries")
+        constraints = [
+            models.UniqueConstraint(
+                fields=["field", "kind", "bucket"], name="unique_field_summary_bucket"
+            )
+        ]
+
+    def __str__(self):
+        return f"{self.field} - {self.kind} {self.bucket}".rstrip()
+
+
+class RequestProfile(models.Model):
+    """
+    Sampled call stacks of one request to a forms view, captured by
+    ``forms.profiling`` in collapsed-stack format ("a;b;c count" per line).
+    """
+
+    HEADER = "header"
+    COOKIE = "cookie"
+    SAMPLE = "sample"
+    TRIGGER_CHOICES = [
+        (HEADER, _("Signed header")),
+        (COOKIE, _("Admin toggle")),
+        (SAMPLE, _("Random sample")),
+    ]
+
+    created_at = models.DateTimeField(_("created at"), auto_now_add=True, db_index=True)
+    method = models.CharField(_("method"), max_length=10)
+    path = models.CharField(_("path"), max_length=2000)
+    view_name = models.CharField(_("view name"), max_length=100)
+    status_code = models.PositiveSmallIntegerField(_("status code"))
+    trigger = models.CharField(_("trigger"), max_length=10, choices=TRIGGER_CHOICES)
+    duration = models.FloatField(_("duration (ms)"))
+    interval = models.FloatField(_("sampling interval (ms)"))
+    sample_count = models.PositiveIntegerField(_("samples"))
+    stacks = models.TextField(_("collapsed stacks"), blank=True)
+
+    class Meta:
+        verbose_name = _("Request Profile")
+        verbose_name_plural = _("Request Profiles")
+        ordering = ["-created_at"]
+
+    def __str__(self):
+        return f"{self.method} {self.path} ({self.duration:.0f} ms)"
+
+
+class QueuedTask(models.Model):
+    """
+    A task enqueued on ``forms.queue.DatabaseBackend``, claimed and run by
+    ``manage.py run_tasks``. ``status`` and the timestamps mirror Django's
+    ``TaskResult``.
+    """
+
+    task_path = models.CharField(_("task"), max_length=200)
+    queue_name = models.CharField(_("queue"), max_length=100)
+    priority = models.SmallIntegerField(_("priority"), default=0)
+    args = models.JSONField(_("arguments"), default=list)
+    kwargs = models.JSONField(_("keyword arguments"), default=dict)
+    # Enqueueing with the key of a ready task merges into it (see forms.queue).
+    batch_key = models.CharField(_("batch key"), max_length=100, null=True, blank=True)
+    status = models.CharField(
+        _("status"),
+        max_length=10,
+        choices=TaskResultStatus.choices,
+        default=TaskResultStatus.READY,
+    )
+    enqueued_at = models.DateTimeField(_("enqueued at"), default=timezone.now)
+    # The earliest the task runs; pushed back between retries.
+    run_after = models.DateTimeField(_("run after"), default=timezone.now)
+    started_at = models.DateTimeField(_("started at"), null=True, blank=True)
+    last_attempted_at = models.DateTimeField(
+        _("last attempted at"), null=True, blank=True
+    )
+    finished_at = models.DateTimeField(_("finished at"), null=True, blank=True)
+    worker_ids = models.JSONField(_("workers"), default=list)
+    errors = models.JSONField(_("errors"), default=list)
+    return_value = models.JSONField(_("return value"), null=True, blank=True)
+
+    class Meta:
+        verbose_name = _("Queued Task")
+        verbose_name_plural = _("Queued Tasks")
+        constraints = [
+            models.UniqueConstraint(
+                fields=["batch_key"],
+                condition=models.Q(status=TaskResultStatus.READY),
+                name="unique_ready_task_batch",
+            ),
+        ]
+        indexes = [
+            # Workers claiming the next due task of their queues.
+            models.Index(
+                fields=["queue_name", "-priority", "run_after"],
+                condition=models.Q(status=TaskResultStatus.READY),
+                name="forms_task_ready_idx",
+            ),
+            # Purging finished tasks; requeueing stalled ones by status.
+            models.Index(
+                fields=["status", "finished_at"], name="forms_task_status_idx"
+            ),
+        ]
+
+    def __str__(self):
+        return f"{self.task_path} ({self.status})"
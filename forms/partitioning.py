@@ -0,0 +1,261 @@
+"""
+Monthly range partitioning of the response tables.
+
+``FormResponse`` and ``FormFieldResponse`` are partitioned by ``created_at``
+month; a field response is stamped with its response's ``created_at`` so both
+rows land in the same month. Postgres requires the partition key in every
+unique constraint, so the primary keys are (id, created_at) in the database
+and ``FormFieldResponse.response`` has no foreign key constraint. Django still
+treats ``id`` as the primary key and runs the cascades itself.
+
+``partition_table`` converts an existing table from a migration. Rows outside
+every monthly partition go to a ``_default`` partition; ``create_partitions``
+(``manage.py create_partitions``, also run hourly by ``manage.py run_tasks``)
+adds the months ahead and moves any such rows into their own month. Once ``forms.archive`` has moved the responses of
+old expired forms out, ``drop_empty_partitions`` detaches and drops the
+months left empty.
+"""
+
+import re
+from datetime import UTC, date
+
+from django.conf import settings
+from django.db import connection, transaction
+from django.utils import timezone
+
+PARTITION_KEY = "created_at"
+# Advisory lock serializing create_partitions runs.
+PARTITION_LOCK_ID = 0x666F726D
+
+
+def get_month(value):
+    """The first day of the (UTC) month of ``value``, a date or datetime."""
+    if hasattr(value, "tzinfo") and timezone.is_aware(value):
+        value = value.astimezone(UTC)
+    return date(value.year, value.month, 1)
+
+
+def add_months(month, count):
+    years, month_index = divmod(month.month - 1 + count, 12)
+    return date(month.year + years, month_index + 1, 1)
+
+
+def get_partition_name(table, month):
+    return f"{table}_p{month:%Y%m}"
+
+
+def get_bound(month):
+    return f"'{month.isoformat()} 00:00+00'"
+
+
+def get_partitions(cursor, table):
+    """``{month: name}`` of the monthly partitions attached to ``table``."""
+    cursor.execute(
+        """
+        SELECT c.relname FROM pg_inherits i
+        JOIN pg_class c ON c.oid = i.inhrelid
+        WHERE i.inhparent = %s::regclass
+        """,
+        [table],
+    )
+    pattern = re.compile(rf"^{re.escape(table)}_p(\d{{4}})(\d{{2}})$")
+    partitions = {}
+    for (name,) in cursor.fetchall():
+        if match := pattern.match(name):
+            partitions[date(int(match[1]), int(match[2]), 1)] = name
+    return partitions
+
+
+def create_partition(cursor, table, month):
+    """
+    Attach the partition of ``month`` to ``table``, moving its rows out of the
+    default partition. Returns False if it already existed.
+    """
+    name = get_partition_name(table, month)
+    cursor.execute("SELECT to_regclass(%s)", [name])
+    if cursor.fetchone()[0] is not None:
+        return False
+    start, end = get_bound(month), get_bound(add_months(month, 1))
+    cursor.execute(
+        f"CREATE TABLE {name} (LIKE {table} INCLUDING DEFAULTS INCLUDING CONSTRAINTS)"
+    )
+    cursor.execute(
+        f"""
+        WITH moved AS (
+            DELETE FROM {table}_default
+            WHERE {PARTITION_KEY} >= {start} AND {PARTITION_KEY} < {end}
+            RETURNING *
+        )
+        INSERT INTO {name} SELECT * FROM moved
+        """
+    )
+    cursor.execute(
+        f"ALTER TABLE {table} ATTACH PARTITION {name} FOR VALUES FROM ({start}) TO ({end})"
+    )
+    return True
+
+
+def create_partitions(models, months_ahead=None, now=None):
+    """
+    Make sure every table of ``models`` has partitions from the current month
+    through ``months_ahead`` months ahead, returning the names created. Runs
+    in one transaction holding an advisory lock, so concurrent runs from
+    several workers wait for each other instead of racing.
+    """
+    if months_ahead is None:
+        months_ahead = getattr(settings, "FORMS_PARTITION_MONTHS_AHEAD", 3)
+    month = get_month(now or timezone.now())
+    created = []
+    with transaction.atomic(), connection.cursor() as cursor:
+        cursor.execute("SELECT pg_advisory_xact_lock(%s)", [PARTITION_LOCK_ID])
+        for model in models:
+            table = model._meta.db_table
+            for n in range(months_ahead + 1):
+                if create_partition(cursor, table, add_months(month, n)):
+                    created.append(get_partition_name(table, add_months(month, n)))
+    return created
+
+
+def drop_empty_partitions(models, before):
+    """
+    Detach and drop the empty monthly partitions of ``models`` that end on or
+    before ``before``, returning their names.
+    """
+    dropped = []
+    with connection.cursor() as cursor:
+        for model in models:
+            table = model._meta.db_table
+            for month, name in sorted(get_partitions(cursor, table).items()):
+                if add_months(month, 1) > get_month(before):
+                    continue
+                cursor.execute(f"SELECT EXISTS (SELECT 1 FROM {name})")
+                if cursor.fetchone()[0]:
+                    continue
+                cursor.execute(f"ALTER TABLE {table} DETACH PARTITION {name}")
+                cursor.execute(f"DROP TABLE {name}")
+                dropped.append(name)
+    return dropped
+
+
+def get_all_partitions(cursor, table):
+    cursor.execute(
+        "SELECT inhrelid::regclass::text FROM pg_inherits WHERE inhparent = %s::regclass",
+        [table],
+    )
+    return [name for (name,) in cursor.fetchall()]
+
+
+def add_index(model, index):
+    """
+    Build ``index`` on the partitioned table of ``model`` without blocking
+    writes: it is created invalid ON ONLY the parent, then built CONCURRENTLY
+    on each partition and attached. Partitions created later get it on attach.
+    """
+    table = model._meta.db_table
+    with connection.schema_editor(atomic=False) as editor:
+        parent = str(index.create_sql(model, editor))
+        quoted = editor.quote_name(table)
+        editor.execute(parent.replace(f" ON {quoted}", f" ON ONLY {quoted}", 1))
+        with connection.cursor() as cursor:
+            partitions = get_all_partitions(cursor, table)
+        for partition in partitions:
+            name = f"{index.name}_{partition.removeprefix(table + '_')}"
+            statement = index.create_sql(model, editor, concurrently=True)
+            statement.rename_table_references(table, partition)
+            statement.parts["name"] = editor.quote_name(name)
+            editor.execute(statement)
+            editor.execute(f"ALTER INDEX {index.name} ATTACH PARTITION {name}")
+
+
+def remove_index(model, index):
+    """Drop ``index`` from the partitioned table of ``model`` and its partitions."""
+    with connection.schema_editor(atomic=False) as editor:
+        editor.remove_index(model, index)
+
+
+def _drop_id_sequence(schema_editor, table):
+    """Drop the sequence generating ``table``'s ids, returning its next id."""
+    with schema_editor.connection.cursor() as cursor:
+        cursor.execute("SELECT pg_get_serial_sequence(%s, 'id')", [table])
+        sequence = cursor.fetchone()[0]
+        cursor.execute(f"SELECT last_value, is_called FROM {sequence}")
+        last_value, is_called = cursor.fetchone()
+        cursor.execute(
+            "SELECT attidentity FROM pg_attribute "
+            "WHERE attrelid = %s::regclass AND attname = 'id'",
+            [table],
+        )
+        identity = cursor.fetchone()[0]
+    if identity:
+        schema_editor.execute(f"ALTER TABLE {table} ALTER COLUMN id DROP IDENTITY")
+    else:
+        schema_editor.execute(f"ALTER TABLE {table} ALTER COLUMN id DROP DEFAULT")
+        # CASCADE: the defaults of partitions created LIKE the table use it.
+        schema_editor.execute(f"DROP SEQUENCE {sequence} CASCADE")
+    return last_value + 1 if is_called else last_value
+
+
+def _rebuild_table(schema_editor, model, partitioned, months_ahead):
+    table = model._meta.db_table
+    old = f"{table}_old"
+    schema_editor.execute(f"ALTER TABLE {table} RENAME TO {old}")
+    next_id = _drop_id_sequence(schema_editor, old)
+    if partitioned:
+        schema_editor.execute(
+            f"CREATE TABLE {table} (LIKE {old}) PARTITION BY RANGE ({PARTITION_KEY})"
+        )
+        # Partitioned tables can't have identity columns before Postgres 17.
+        schema_editor.execute(
+            f"CREATE SEQUENCE {table}_id_seq START WITH {next_id} OWNED BY {table}.id"
+        )
+        schema_editor.execute(
+            f"ALTER TABLE {table} ALTER COLUMN id SET DEFAULT nextval('{table}_id_seq')"
+        )
+        schema_editor.execute(
+            f"CREATE TABLE {table}_default PARTITION OF {table} DEFAULT"
+        )
+        with schema_editor.connection.cursor() as cursor:
+            cursor.execute(f"SELECT MIN({PARTITION_KEY}) FROM {old}")
+            month = get_month(cursor.fetchone()[0] or timezone.now())
+            last = add_months(get_month(timezone.now()), months_ahead)
+            while month <= last:
+                create_partition(cursor, table, month)
+                month = add_months(month, 1)
+    else:
+        schema_editor.execute(f"CREATE TABLE {table} (LIKE {old})")
+        schema_editor.execute(
+            f"ALTER TABLE {table} ALTER COLUMN id ADD GENERATED BY DEFAULT AS "
+            f"IDENTITY (START WITH {next_id})"
+        )
+
+    schema_editor.execute(f"INSERT INTO {table} SELECT * FROM {old}")
+    schema_editor.execute(f"DROP TABLE {old} CASCADE")
+
+    # What CREATE TABLE would have added, with the partition key in the pk.
+    pk = f"id, {PARTITION_KEY}" if partitioned else "id"
+    schema_editor.execute(f"ALTER TABLE {table} ADD PRIMARY KEY ({pk})")
+    for sql in schema_editor._model_indexes_sql(model):
+        schema_editor.execute(sql)
+    for constraint in model._meta.constraints:
+        schema_editor.add_constraint(model, constraint)
+    for field in model._meta.local_fields:
+        if field.remote_field and field.db_constraint:
+            schema_editor.execute(
+                schema_editor._create_fk_sql(
+                    model, field, "_fk_%(to_table)s_%(to_column)s"
+                )
+            )
+
+
+def partition_table(schema_editor, model, months_ahead=3):
+    """
+    Migration helper converting ``model``'s table, data included, into one
+    partitioned by ``created_at`` month. ``model`` is the historical model
+    after the migration, whose constraints must include ``created_at``.
+    """
+    _rebuild_table(schema_editor, model, partitioned=True, months_ahead=months_ahead)
+
+
+def unpartition_table(schema_editor, model):
+    """The reverse of ``partition_table``, given the model before it."""
+    _rebuild_table(schema_editor, model, partitioned=False, months_ahead=0)
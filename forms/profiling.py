@@ -0,0 +1,252 @@
+"""
+Opt-in sampling profiler for the forms views.
+
+A request is profiled when it carries a valid token, either in the
+``X-Formi-Profile`` header or in the cookie the admin's profiling toggle sets,
+or when it falls in the ``FORMS_PROFILE_SAMPLE_RATE`` 1-in-N random sample.
+While the view runs, a background thread samples the stacks of the thread
+serving it every ``FORMS_PROFILE_INTERVAL_MS`` and the result is stored as a
+``RequestProfile`` in collapsed-stack format, which speedscope and
+flamegraph.pl both read. Profiles older than ``FORMS_PROFILE_RETENTION_DAYS``
+are deleted by ``manage.py run_tasks`` or ``manage.py purge_profiles``.
+
+Async views run on the event loop and in ``sync_to_async`` threads, so
+besides the thread serving the request every other thread is sampled too,
+keeping only stacks that pass through this project's code. A concurrent
+request in the same worker can therefore show up in a profile.
+"""
+
+import random
+import sys
+import threading
+import time
+from collections import Counter
+
+from asgiref.sync import iscoroutinefunction
+from django.conf import settings
+from django.core import signing
+from django.urls import Resolver404, resolve
+from django.utils.decorators import sync_and_async_middleware
+
+from .models import RequestProfile
+
+HEADER = "X-Formi-Profile"
+COOKIE = "formi_profile"
+SALT = "forms.profiling"
+
+
+def purge_profiles(before):
+    """Delete the profiles created before ``before``; returns how many."""
+    return RequestProfile.objects.filter(created_at__lt=before).delete()[0]
+
+
+def get_profile_token():
+    """A token enabling profiling for ``FORMS_PROFILE_TOKEN_MAX_AGE`` seconds."""
+    return signing.TimestampSigner(salt=SALT).sign("profile")
+
+
+def check_profile_token(token):
+    try:
+        signing.TimestampSigner(salt=SALT).unsign(
+            token, max_age=getattr(settings, "FORMS_PROFILE_TOKEN_MAX_AGE", 3600)
+        )
+    except signing.BadSignature:
+        return False
+    return True
+
+
+def get_trigger(request):
+    """Why ``request`` should be profiled, as a RequestProfile trigger, or None."""
+    if HEADER in request.headers and check_profile_token(request.headers[HEADER]):
+        return RequestProfile.HEADER
+    if COOKIE in request.COOKIES and check_profile_token(request.COOKIES[COOKIE]):
+        return RequestProfile.COOKIE
+    rate = getattr(settings, "FORMS_PROFILE_SAMPLE_RATE", 0)
+    if rate and random.randrange(rate) == 0:
+        return RequestProfile.SAMPLE
+    return None
+
+
+def get_forms_view_name(request):
+    """
+    The name of the forms view ``request`` resolves to, or None for other
+    views (admin, static files, metrics), which aren't profiled.
+    """
+    try:
+        match = resolve(request.path_info, getattr(request, "urlconf", None))
+    except Resolver404:
+        return None
+    view_class = getattr(match.func, "view_class", None)
+    if view_class is None or view_class.__module__ != "forms.views":
+        return None
+    if view_class.__name__ == "MetricsView":
+        return None
+    return match.view_name
+
+
+def get_frame_label(code):
+    filename = code.co_filename
+    for prefix in ("site-packages/", f"{settings.BASE_DIR}/"):
+        if prefix in filename:
+            filename = filename.rsplit(prefix, 1)[1]
+            break
+    return f"{code.co_qualname} ({filename}:{code.co_firstlineno})"
+
+
+def is_project_frame(code):
+    filename = code.co_filename
+    return filename.startswith(str(settings.BASE_DIR)) and (
+        "site-packages" not in filename
+    )
+
+
+class StackSampler:
+    """
+    Counts the stacks of ``thread_id`` and of any other thread running project
+    code every ``interval`` seconds until stopped.
+    """
+
+    def __init__(self, thread_id=None, interval=0.005):
+        self.thread_id = thread_id
+        self.interval = interval
+        self.stacks = Counter()
+        self.labels = {}
+        self.stopped = threading.Event()
+        self.thread = threading.Thread(target=self.run, daemon=True)
+
+    def start(self):
+        self.thread.start()
+
+    def stop(self):
+        self.stopped.set()
+        self.thread.join()
+
+    def run(self):
+        while not self.stopped.wait(self.interval):
+            self.sample()
+
+    def sample(self):
+        for thread_id, frame in sys._current_frames().items():
+            if thread_id == self.thread.ident:
+                continue
+            codes = []
+            while frame is not None:
+                codes.append(frame.f_code)
+                frame = frame.f_back
+            if thread_id != self.thread_id and not any(map(is_project_frame, codes)):
+                continue
+            self.stacks[tuple(reversed(codes))] += 1
+
+    def get_label(self, code):
+        label = self.labels.get(code)
+        if label is None:
+            label = self.labels[code] = get_frame_label(code)
+        return label
+
+    def collapse(self):
+        """The samples in collapsed-stack format, most frequent first."""
+        return "\n".join(
+            f"{';'.join(map(self.get_label, codes))} {count}"
+            for codes, count in self.stacks.most_common()
+        )
+
+
+def parse_collapsed(stacks):
+    """Yield (frames, count) pairs from collapsed-stack text."""
+    for line in stacks.splitlines():
+        stack, _, count = line.rpartition(" ")
+        if stack:
+            yield stack.split(";"), int(count)
+
+
+def to_speedscope(profile):
+    """A speedscope (https://www.speedscope.app) document for ``profile``."""
+    frames, index, samples, weights = [], {}, [], []
+    for stack, count in parse_collapsed(profile.stacks):
+        sample = []
+        for name in stack:
+            if name not in index:
+                index[name] = len(frames)
+                frames.append({"name": name})
+            sample.append(index[name])
+        samples.append(sample)
+        weights.append(count * profile.interval)
+    return {
+        "$schema": "https://www.speedscope.app/file-format-schema.json",
+        "name": str(profile),
+        "exporter": "formi",
+        "shared": {"frames": frames},
+        "profiles": [
+            {
+                "type": "sampled",
+                "name": str(profile),
+                "unit": "milliseconds",
+                "startValue": 0,
+                "endValue": sum(weights),
+                "samples": samples,
+                "weights": weights,
+            }
+        ],
+    }
+
+
+def build_profile(request, response, view_name, trigger, sampler, duration):
+    return RequestProfile(
+        method=request.method,
+        path=request.get_full_path()[:2000],
+        view_name=view_name,
+        status_code=response.status_code,
+        trigger=trigger,
+        duration=duration * 1000,
+        interval=sampler.interval * 1000,
+        sample_count=sum(sampler.stacks.values()),
+        stacks=sampler.collapse(),
+    )
+
+
+@sync_and_async_middleware
+def profiling_middleware(get_response):
+    interval = getattr(settings, "FORMS_PROFILE_INTERVAL_MS", 5) / 1000
+
+    if iscoroutinefunction(get_response):
+
+        async def middleware(request):
+            trigger = get_trigger(request)
+            view_name = trigger and get_forms_view_name(request)
+            if not view_name:
+                return await get_response(request)
+            sampler = StackSampler(threading.get_ident(), interval)
+            start = time.perf_counter()
+            sampler.start()
+            try:
+                response = await get_response(request)
+            finally:
+                sampler.stop()
+            duration = time.perf_counter() - start
+            profile = build_profile(
+                request, response, view_name, trigger, sampler, duration
+            )
+            await profile.asave()
+            return response
+
+    else:
+
+        def middleware(request):
+            trigger = get_trigger(request)
+            view_name = trigger and get_forms_view_name(request)
+            if not view_name:
+                return get_response(request)
+            sampler = StackSampler(threading.get_ident(), interval)
+            start = time.perf_counter()
+            sampler.start()
+            try:
+                response = get_response(request)
+            finally:
+                sampler.stop()
+            duration = time.perf_counter() - start
+            build_profile(
+                request, response, view_name, trigger, sampler, duration
+            ).save()
+            return response
+
+    return middleware
@@ -0,0 +1,342 @@
+"""
+A Postgres-backed backend for Django's tasks framework.
+
+``DatabaseBackend`` stores enqueued tasks as ``QueuedTask`` rows, in the
+caller's transaction, so work enqueued by a request is only queued if the
+request's writes commit. ``manage.py run_tasks`` claims due tasks with
+``FOR UPDATE SKIP LOCKED``, so any number of workers can share a queue.
+Failed tasks are retried up to ``FORMS_TASK_MAX_ATTEMPTS`` times, waiting
+``FORMS_TASK_RETRY_DELAY`` seconds doubled after each attempt. A worker
+refreshes the ``last_attempted_at`` of the task it runs every third of
+``FORMS_TASK_TIMEOUT``, so tasks not refreshed for ``FORMS_TASK_TIMEOUT``
+were left by a worker that died, and are put back in the queue.
+
+``enqueue_batched`` merges work into a task still waiting with the same batch
+key, so a burst of submissions to one form queues one summary roll-up.
+"""
+
+import logging
+import threading
+from contextlib import contextmanager
+from datetime import timedelta
+from traceback import format_exception
+
+from django.conf import settings
+from django.db import DatabaseError, connection, transaction
+from django.db.models import Count, Min
+from django.tasks import TaskContext, TaskResult, TaskResultStatus
+from django.tasks.backends.base import BaseTaskBackend
+from django.tasks.base import TaskError
+from django.tasks.exceptions import TaskResultDoesNotExist
+from django.tasks.signals import task_enqueued, task_finished, task_started
+from django.utils import timezone
+from django.utils.json import normalize_json
+from django.utils.module_loading import import_string
+
+from .models import QueuedTask
+
+logger = logging.getLogger(__name__)
+
+BATCH_SQL = """
+    INSERT INTO {table} (
+        task_path, queue_name, priority, args, kwargs, batch_key, status,
+        enqueued_at, run_after, worker_ids, errors
+    )
+    VALUES (
+        %(task_path)s, %(queue_name)s, %(priority)s, %(args)s, %(kwargs)s,
+        %(batch_key)s, 'READY', %(now)s, %(run_after)s, '[]', '[]'
+    )
+    ON CONFLICT (batch_key) WHERE status = 'READY' DO UPDATE
+    SET kwargs = jsonb_set(
+        {table}.kwargs,
+        %(path)s::text[],
+        ({table}.kwargs #> %(path)s::text[]) || (EXCLUDED.kwargs #> %(path)s::text[])
+    )
+    RETURNING *
+"""
+
+
+def get_max_attempts():
+    return getattr(settings, "FORMS_TASK_MAX_ATTEMPTS", 5)
+
+
+def get_retry_delay(attempts):
+    """Seconds before retrying a task that failed its ``attempts``-th attempt."""
+    return getattr(settings, "FORMS_TASK_RETRY_DELAY", 10) * 2 ** (attempts - 1)
+
+
+class DatabaseBackend(BaseTaskBackend):
+    supports_defer = True
+    supports_get_result = True
+    supports_priority = True
+
+    def enqueue(self, task, args, kwargs):
+        self.validate_task(task)
+        row = QueuedTask.objects.create(
+            task_path=task.module_path,
+            queue_name=task.queue_name,
+            priority=task.priority,
+            args=normalize_json(args),
+            kwargs=normalize_json(kwargs),
+            run_after=task.run_after or timezone.now(),
+        )
+        result = self.get_task_result(row, task)
+        task_enqueued.send(type(self), task_result=result)
+        return result
+
+    def enqueue_batched(self, task, batch_key, args, kwargs, extend):
+        """
+        Enqueue ``task`` like ``enqueue``, unless a task with ``batch_key`` is
+        still waiting to run: then the list ``kwargs[extend]`` is appended to
+        that task's own instead, in one statement.
+        """
+        self.validate_task(task)
+        now = timezone.now()
+        json_field = QueuedTask._meta.get_field("kwargs")
+        params = {
+            "task_path": task.module_path,
+            "queue_name": task.queue_name,
+            "priority": task.priority,
+            "args": json_field.get_db_prep_value(normalize_json(args), connection),
+            "kwargs": json_field.get_db_prep_value(normalize_json(kwargs), connection),
+            "batch_key": batch_key,
+            "now": now,
+            "run_after": task.run_after or now,
+            "path": [extend],
+        }
+        sql = BATCH_SQL.format(table=QueuedTask._meta.db_table)
+        (row,) = QueuedTask.objects.raw(sql, params)
+        result = self.get_task_result(row, task)
+        task_enqueued.send(type(self), task_result=result)
+        return result
+
+    def get_result(self, result_id):
+        try:
+            row = QueuedTask.objects.get(pk=result_id)
+        except (QueuedTask.DoesNotExist, ValueError):
+            raise TaskResultDoesNotExist(result_id) from None
+        return self.get_task_result(row)
+
+    def get_task_result(self, row, task=None):
+        if task is None:
+            task = import_string(row.task_path).using(
+                priority=row.priority,
+                queue_name=row.queue_name,
+                run_after=row.run_after,
+                backend=self.alias,
+            )
+        result = TaskResult(
+            task=task,
+            id=str(row.pk),
+            status=row.status,
+            enqueued_at=row.enqueued_at,
+            started_at=row.started_at,
+            finished_at=row.finished_at,
+            last_attempted_at=row.last_attempted_at,
+            args=row.args,
+            kwargs=row.kwargs,
+            backend=self.alias,
+            errors=[TaskError(**error) for error in row.errors],
+            worker_ids=row.worker_ids,
+        )
+        object.__setattr__(result, "_return_value", row.return_value)
+        return result
+
+
+def enqueue_batched(task, batch_key, args, kwargs, extend):
+    """
+    Enqueue ``task``, merged into a waiting task with the same ``batch_key``
+    where the backend supports it (see ``DatabaseBackend.enqueue_batched``).
+    """
+    backend = task.get_backend()
+    if isinstance(backend, DatabaseBackend):
+        return backend.enqueue_batched(task, batch_key, args, kwargs, extend)
+    return task.enqueue(*args, **kwargs)
+
+
+def claim_tasks(worker_id, queues, limit=1, now=None):
+    """
+    Mark up to ``limit`` due tasks of ``queues`` as running by ``worker_id``
+    and return them, highest priority first. Tasks other workers are
+    claiming are skipped, not waited for.
+    """
+    now = now or timezone.now()
+    with transaction.atomic():
+        rows = list(
+            QueuedTask.objects.select_for_update(skip_locked=True)
+            .filter(
+                status=TaskResultStatus.READY,
+                queue_name__in=queues,
+                run_after__lte=now,
+            )
+            .order_by("-priority", "run_after", "pk")[:limit]
+        )
+        for row in rows:
+            row.status = TaskResultStatus.RUNNING
+            row.started_at = row.started_at or now
+            row.last_attempted_at = now
+            row.worker_ids = [*row.worker_ids, worker_id]
+        QueuedTask.objects.bulk_update(
+            rows, ["status", "started_at", "last_attempted_at", "worker_ids"]
+        )
+    return rows
+
+
+def touch_task(pk):
+    """Mark the running task ``pk`` as still being worked on."""
+    QueuedTask.objects.filter(pk=pk, status=TaskResultStatus.RUNNING).update(
+        last_attempted_at=timezone.now()
+    )
+
+
+@contextmanager
+def heartbeat(row, interval=None):
+    """
+    Touch ``row`` every ``interval`` seconds, a third of
+    ``FORMS_TASK_TIMEOUT`` by default, from a thread of its own while the
+    block runs, so ``requeue_stalled_tasks`` leaves a slow task be.
+    """
+    if interval is None:
+        interval = getattr(settings, "FORMS_TASK_TIMEOUT", 600) / 3
+    stop = threading.Event()
+
+    def beat():
+        try:
+            while not stop.wait(interval):
+                try:
+                    touch_task(row.pk)
+                except DatabaseError:
+                    logger.warning("Task id=%s heartbeat failed", row.pk, exc_info=True)
+        finally:
+            connection.close()
+
+    thread = threading.Thread(target=beat, name=f"task-heartbeat-{row.pk}", daemon=True)
+    thread.start()
+    try:
+        yield
+    finally:
+        stop.set()
+        thread.join()
+
+
+def run_task(row, backend):
+    """
+    Run a claimed task and record its outcome. A failed attempt is retried
+    after a backoff until ``FORMS_TASK_MAX_ATTEMPTS`` have failed.
+    """
+    result = backend.get_task_result(row)
+    task = result.task
+    task_started.send(type(backend), task_result=result)
+    try:
+        with heartbeat(row):
+            if task.takes_context:
+                context = TaskContext(task_result=result)
+                value = task.call(context, *row.args, **row.kwargs)
+            else:
+                value = task.call(*row.args, **row.kwargs)
+        row.return_value = normalize_json(value)
+    except KeyboardInterrupt:
+        raise
+    except BaseException as e:
+        error_type = type(e)
+        error = {
+            "exception_class_path": f"{error_type.__module__}.{error_type.__qualname__}",
+            "traceback": "".join(format_exception(e)),
+        }
+        row.errors = [*row.errors, error]
+        attempts = len(row.worker_ids)
+        if attempts < get_max_attempts():
+            row.status = TaskResultStatus.READY
+            # Work batched since waits in a task of its own under the key.
+            row.batch_key = None
+            row.run_after = timezone.now() + timedelta(
+                seconds=get_retry_delay(attempts)
+            )
+            logger.warning(
+                "Task id=%s path=%s failed attempt %d, retrying at %s",
+                row.pk,
+                row.task_path,
+                attempts,
+                row.run_after,
+            )
+        else:
+            row.status = TaskResultStatus.FAILED
+            row.finished_at = timezone.now()
+    else:
+        row.status = TaskResultStatus.SUCCESSFUL
+        row.finished_at = timezone.now()
+    row.save(
+        update_fields=[
+            "status",
+            "batch_key",
+            "run_after",
+            "finished_at",
+            "errors",
+            "return_value",
+        ]
+    )
+    if row.status != TaskResultStatus.READY:
+        task_finished.send(type(backend), task_result=backend.get_task_result(row))
+    return row
+
+
+def requeue_stalled_tasks(timeout=None, now=None):
+    """
+    Put running tasks not touched for ``timeout`` seconds, left by a worker
+    that died, back in the queue. Returns how many were requeued.
+    """
+    if timeout is None:
+        timeout = getattr(settings, "FORMS_TASK_TIMEOUT", 600)
+    now = now or timezone.now()
+    stalled = QueuedTask.objects.filter(
+        status=TaskResultStatus.RUNNING,
+        last_attempted_at__lt=now - timedelta(seconds=timeout),
+    )
+    # Clearing the batch key keeps a task merged into since from conflicting.
+    return stalled.update(status=TaskResultStatus.READY, run_after=now, batch_key=None)
+
+
+def purge_finished_tasks(before):
+    """Delete tasks that succeeded before ``before``, keeping failed ones."""
+    return QueuedTask.objects.filter(
+        status=TaskResultStatus.SUCCESSFUL, finished_at__lt=before
+    ).delete()[0]
+
+
+def get_queue_depth():
+    """
+    ``{(queue, status): (count, oldest enqueued_at)}`` of the tasks waiting,
+    running or failed for good.
+    """
+    rows = (
+        QueuedTask.objects.exclude(status=TaskResultStatus.SUCCESSFUL)
+        .values_list("queue_name", "status")
+        .annotate(count=Count("pk"), oldest=Min("enqueued_at"))
+        .order_by("queue_name", "status")
+    )
+    return {(queue, status): (count, oldest) for queue, status, count, oldest in rows}
+
+
+def render_queue_metrics(now=None):
+    """The queue depth and age of its oldest task in Prometheus text format."""
+    now = now or timezone.now()
+    depth = get_queue_depth()
+    lines = [
+        "# HELP formi_task_queue_depth Queued tasks, by queue and status.",
+        "# TYPE formi_task_queue_depth gauge",
+    ]
+    lines += [
+        f'formi_task_queue_depth{{queue="{queue}",status="{status}"}} {count}'
+        for (queue, status), (count, _) in depth.items()
+    ]
+    lines += [
+        "# HELP formi_task_queue_oldest_seconds Age of the oldest ready task.",
+        "# TYPE formi_task_queue_oldest_seconds gauge",
+    ]
+    lines += [
+        f'formi_task_queue_oldest_seconds{{queue="{queue}"}} '
+        f"{(now - oldest).total_seconds():.3f}"
+        for (queue, status), (_, oldest) in depth.items()
+        if status == TaskResultStatus.READY
+    ]
+    return "\n".join(lines) + "\n"
@@ -0,0 +1,233 @@
+"""
+Immutable, cached snapshots of a form's field tree.
+
+A ``FormSchema`` holds everything needed to render, validate or export a form
+(resolved labels, help text, ordered choices, template names, widths and
+per-breakpoint order) so those paths never walk the ORM. Snapshots are cached
+under the form's ``schema_version``, which the signal handlers in
+``forms.signals`` bump whenever anything in the tree changes. Fields on a
+shared ``ChoiceSet`` only hold its (pk, version): the choices themselves are
+cached once per set by ``forms.choices``.
+"""
+
+import threading
+from collections import OrderedDict
+from dataclasses import dataclass, field
+from functools import cached_property
+
+from django.conf import settings
+from django.core.cache import caches
+from django.urls import reverse
+
+from .choices import get_choice_set_choices, get_options_url
+from .instrumentation import record_cache
+from .models import FormField, FormFieldGroup, get_generated_value
+
+
+@dataclass(frozen=True)
+class FieldSchema:
+    pk: int
+    group_pk: int | None
+    key: str
+    label: str
+    help_text: str
+    template_name: str
+    supports_choices: bool
+    choices: tuple[tuple[str, str], ...]
+    validations: dict = field(default_factory=dict)
+    conditional_logic: dict = field(default_factory=dict)
+    widths: dict = field(default_factory=dict)
+    order: dict = field(default_factory=dict)
+    optional: bool = False
+    layout_class: str = ""
+    # (pk, version) of the shared ChoiceSet whose cached choices replace
+    # ``choices``, and whether there are too many to inline.
+    choice_set_ref: tuple[int, int] | None = None
+    lazy_choices: bool = False
+
+    @property
+    def required(self):
+        return bool(self.validations.get("required")) and not self.optional
+
+    # Mirrors the FormField accessors so field templates render either one.
+    @property
+    def component_id(self):
+        return f"field-{self.pk}"
+
+    def get_absolute_url(self):
+        return reverse("form_field_component", kwargs={"pk": self.pk})
+
+    def get_label(self):
+        return self.label
+
+    def get_help_text(self):
+        return self.help_text
+
+    def get_choices(self):
+        if not self.supports_choices:
+            return None
+        if self.choice_set_ref is not None:
+            return list(get_choice_set_choices(*self.choice_set_ref))
+        return list(self.choices)
+
+    def get_options_url(self):
+        return get_options_url(self.choice_set_ref)
+
+    def get_template_name(self):
+        return self.template_name
+
+    def get_value(self):
+        return get_generated_value(self.key)
+
+
+@dataclass(frozen=True)
+class GroupSchema:
+    pk: int
+    key: str
+    label: str
+    description: str
+    order: dict
+    fields: tuple[FieldSchema, ...]
+    layout_class: str = ""
+
+    @property
+    def component_id(self):
+        return f"group-{self.pk}"
+
+    def get_absolute_url(self):
+        return reverse("form_field_group_component", kwargs={"pk": self.pk})
+
+    def get_template_name(self):
+        return "form_field_group.html"
+
+    def get_fields(self):
+        return self.fields
+
+
+@dataclass(frozen=True)
+class FormSchema:
+    pk: int
+    version: int
+    title: str
+    fields: tuple[FieldSchema, ...]
+    groups: tuple[GroupSchema, ...]
+
+    @cached_property
+    def field_map(self):
+        return {f.pk: f for f in self.fields}
+
+    def get_field(self, pk):
+        return self.field_map[pk]
+
+    def get_field_tree(self):
+        """Top level fields followed by field groups, like Form.get_field_tree."""
+        return [f for f in self.fields if f.group_pk is None] + list(self.groups)
+
+    def get_ordered_fields(self):
+        """Every field in render order, with group members flattened in."""
+        return [
+            field
+            for item in self.get_field_tree()
+            for field in (item.fields if isinstance(item, GroupSchema) else (item,))
+        ]
+
+
+class CompiledSchemaCache:
+    """
+    In-process LRU of objects compiled from a ``FormSchema`` (validators,
+    conditional logic, ...) that can't be pickled into the shared cache.
+    Entries are keyed by form pk and schema version, so a version bump makes
+    stale entries unreachable until they age out.
+    """
+
+    def __init__(self, compile, maxsize=256):
+        self.compile = compile
+        self.maxsize = maxsize
+        self.entries = OrderedDict()
+        self.lock = threading.Lock()
+
+    def get(self, schema):
+        key = (schema.pk, schema.version)
+        with self.lock:
+            compiled = self.entries.get(key)
+            if compiled is not None:
+                self.entries.move_to_end(key)
+                return compiled
+
+        compiled = self.compile(schema)
+        with self.lock:
+            self.entries[key] = compiled
+            while len(self.entries) > self.maxsize:
+                self.entries.popitem(last=False)
+        return compiled
+
+    def clear(self):
+        with self.lock:
+            self.entries.clear()
+
+
+def get_schema_cache():
+    return caches[getattr(settings, "FORMS_SCHEMA_CACHE", "default")]
+
+
+def get_schema_cache_key(form_pk, version):
+    return f"forms:schema:{form_pk}:{version}"
+
+
+def get_form_schema(form):
+    """Return the cached schema for ``form``, compiling it on a miss."""
+    cache = get_schema_cache()
+    key = get_schema_cache_key(form.pk, form.schema_version)
+    schema = cache.get(key)
+    record_cache("schema", hit=schema is not None)
+    if schema is None:
+        schema = build_form_schema(form)
+        cache.set(
+            key, schema, getattr(settings, "FORMS_SCHEMA_CACHE_TIMEOUT", 60 * 60 * 24)
+        )
+    return schema
+
+
+def build_form_schema(form):
+    fields = tuple(
+        FieldSchema(
+            pk=f.pk,
+            group_pk=f.group_id,
+            key=f.field_type.key,
+            label=f.get_label(),
+            help_text=f.get_help_text(),
+            template_name=f.get_template_name(),
+            supports_choices=f.field_type.supports_choices,
+            choices=() if f.choice_set_id else tuple(f.get_choices() or ()),
+            validations={**f.field_type.default_validations, **f.validations},
+            conditional_logic=f.conditional_logic,
+            widths=f.widths,
+            order=f.order,
+            optional=f.optional,
+            layout_class=f.layout_class,
+            choice_set_ref=f.choice_set_ref,
+            lazy_choices=f.lazy_choices,
+        )
+        for f in FormField.objects.filter(form=form).with_render_data()
+    )
+
+    groups = tuple(
+        GroupSchema(
+            pk=g.pk,
+            key=g.key,
+            label=g.label,
+            description=g.description,
+            order=g.order,
+            fields=tuple(f for f in fields if f.group_pk == g.pk),
+            layout_class=g.layout_class,
+        )
+        for g in FormFieldGroup.objects.filter(form=form)
+    )
+
+    return FormSchema(
+        pk=form.pk,
+        version=form.schema_version,
+        title=form.title,
+        fields=fields,
+        groups=groups,
+    )
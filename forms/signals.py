@@ -0,0 +1,87 @@
+from django.db.models import F
+from django.db.models.signals import m2m_changed, post_delete, post_save
+from django.dispatch import receiver
+
+from .models import (
+    ChoiceSet,
+    ChoiceSetMembership,
+    FieldChoice,
+    FieldType,
+    Form,
+    FormField,
+    FormFieldChoiceMembership,
+    FormFieldGroup,
+    ValidationType,
+)
+
+
+def bump_schema_version(forms):
+    """Invalidate the cached schema of every form in ``forms``."""
+    forms.update(schema_version=F("schema_version") + 1)
+
+
+@receiver(post_save, sender=FormField)
+@receiver(post_delete, sender=FormField)
+@receiver(post_save, sender=FormFieldGroup)
+@receiver(post_delete, sender=FormFieldGroup)
+def form_child_changed(sender, instance, **kwargs):
+    bump_schema_version(Form.objects.filter(pk=instance.form_id))
+
+
+@receiver(post_save, sender=FormFieldChoiceMembership)
+@receiver(post_delete, sender=FormFieldChoiceMembership)
+def choice_membership_changed(sender, instance, **kwargs):
+    bump_schema_version(Form.objects.filter(fields=instance.field_id))
+
+
+@receiver(m2m_changed, sender=FormField.choices.through)
+def field_choices_changed(sender, instance, action, reverse, pk_set, **kwargs):
+    if not action.startswith("post_"):
+        return
+    if reverse:
+        forms = Form.objects.filter(fields__choices=instance)
+    else:
+        forms = Form.objects.filter(pk=instance.form_id)
+    bump_schema_version(forms)
+
+
+def bump_choice_set_version(choice_sets):
+    """Invalidate the cached choices of ``choice_sets`` and the forms using them."""
+    pks = list(choice_sets.values_list("pk", flat=True))
+    ChoiceSet.objects.filter(pk__in=pks).update(version=F("version") + 1)
+    bump_schema_version(Form.objects.filter(fields__choice_set__in=pks))
+
+
+@receiver(post_save, sender=ChoiceSetMembership)
+@receiver(post_delete, sender=ChoiceSetMembership)
+def choice_set_membership_changed(sender, instance, **kwargs):
+    bump_choice_set_version(ChoiceSet.objects.filter(pk=instance.choice_set_id))
+
+
+@receiver(m2m_changed, sender=ChoiceSet.choices.through)
+def choice_set_choices_changed(sender, instance, action, reverse, pk_set, **kwargs):
+    if not action.startswith("post_"):
+        return
+    if reverse:
+        choice_sets = ChoiceSet.objects.filter(choices=instance)
+    else:
+        choice_sets = ChoiceSet.objects.filter(pk=instance.pk)
+    bump_choice_set_version(choice_sets)
+
+
+@receiver(post_save, sender=FieldChoice)
+def field_choice_changed(sender, instance, **kwargs):
+    bump_schema_version(Form.objects.filter(fields__choices=instance))
+    bump_choice_set_version(ChoiceSet.objects.filter(choices=instance))
+
+
+@receiver(post_save, sender=FieldType)
+def field_type_changed(sender, instance, **kwargs):
+    bump_schema_version(Form.objects.filter(fields__field_type=instance))
+
+
+@receiver(post_save, sender=ValidationType)
+@receiver(post_delete, sender=ValidationType)
+def validation_type_changed(sender, instance, **kwargs):
+    # Error messages are compiled into every form's validators.
+    bump_schema_version(Form.objects.all())
@@ -0,0 +1,221 @@
+"""
+Where a form's answers are stored.
+
+Forms keep their answers in one of two modes (``Form.response_storage``):
+
+``rows``
+    One ``FormFieldResponse`` row per answered field. Per-field queries
+    use the (field, created_at) index, but a submission writes as many rows
+    as it has answers and reading a response back is a join.
+``document``
+    One JSONB ``FormResponse.answers`` object keyed by field pk. A submission
+    is a single row and a response reads without a join. Hot fields get a
+    partial expression index from ``get_answer_index``.
+
+Submission, export and analytics call the functions here and never check the
+mode themselves. ``convert_response_storage`` moves a form's stored answers
+from one mode to the other.
+"""
+
+from django.contrib.postgres.indexes import GinIndex
+from django.db import connection, models, transaction
+from django.db.models import F, Func, Q, Value
+
+from .models import Form, FormField, FormFieldResponse, FormResponse, SubmissionKey
+
+# Document-mode answers in the shape of the FormFieldResponse table, for SQL
+# written against it. Needs a ``%(form)s`` parameter.
+DOCUMENT_ANSWERS_SQL = """(
+    SELECT fr.id AS response_id, a.key::bigint AS field_id, a.value
+    FROM {response} fr CROSS JOIN LATERAL jsonb_each(fr.answers) AS a(key, value)
+    WHERE fr.form_id = %(form)s
+)"""
+
+TO_DOCUMENT_SQL = """
+    UPDATE {response} fr
+    SET answers = COALESCE(fr.answers, '{{}}'::jsonb) || a.answers
+    FROM (
+        SELECT r.response_id, jsonb_object_agg(r.field_id::text, r.value) AS answers
+        FROM {field_response} r
+        JOIN {response} o ON o.id = r.response_id
+        WHERE o.form_id = %(form)s
+        GROUP BY r.response_id
+    ) a
+    WHERE fr.id = a.response_id
+"""
+
+DELETE_ROWS_SQL = """
+    DELETE FROM {field_response} r
+    USING {response} fr
+    WHERE r.response_id = fr.id AND fr.form_id = %(form)s
+"""
+
+# Answers to fields deleted since are dropped, as their rows would have been.
+TO_ROWS_SQL = """
+    INSERT INTO {field_response} (response_id, field_id, value, created_at)
+    SELECT fr.id, f.id, a.value, fr.created_at
+    FROM {response} fr
+    CROSS JOIN LATERAL jsonb_each(fr.answers) AS a(key, value)
+    JOIN {field} f ON f.id = a.key::bigint AND f.form_id = fr.form_id
+    WHERE fr.form_id = %(form)s
+    ON CONFLICT (response_id, field_id, created_at) DO NOTHING
+"""
+
+DELETE_SUBMISSION_KEYS_SQL = """
+    DELETE FROM {submission_key} WHERE form_id = %(form)s
+"""
+
+DELETE_RESPONSES_SQL = """
+    DELETE FROM {response} WHERE form_id = %(form)s
+"""
+
+DELETE_DOCUMENTS_SQL = """
+    UPDATE {response} SET answers = NULL
+    WHERE form_id = %(form)s AND answers IS NOT NULL
+"""
+
+TABLES = {
+    "response": FormResponse._meta.db_table,
+    "field_response": FormFieldResponse._meta.db_table,
+    "field": FormField._meta.db_table,
+    "submission_key": SubmissionKey._meta.db_table,
+}
+
+
+def is_document(form):
+    return form.response_storage == Form.DOCUMENT
+
+
+def create_responses(form, user, submissions, batch_size=None):
+    """
+    Store cleaned ``submissions`` (``{field_pk: value}`` dicts) as responses
+    of ``form`` by ``user``: one INSERT for the FormResponse rows plus, in
+    rows mode, one for their FormFieldResponse rows.
+    """
+    document = is_document(form)
+    responses = FormResponse.objects.bulk_create(
+        [
+            FormResponse(
+                form=form,
+                user=user,
+                answers={str(pk): value for pk, value in answers.items()}
+                if document
+                else None,
+            )
+            for answers in submissions
+        ],
+        batch_size=batch_size,
+    )
+    if not document:
+        FormFieldResponse.objects.bulk_create(
+            [
+                FormFieldResponse(
+                    response=response,
+                    field_id=field_pk,
+                    value=value,
+                    created_at=response.created_at,
+                )
+                for response, answers in zip(responses, submissions)
+                for field_pk, value in answers.items()
+            ],
+            batch_size=batch_size,
+        )
+    return responses
+
+
+def parse_answers(answers):
+    """A stored answers document keyed by integer field pk."""
+    return {int(pk): value for pk, value in (answers or {}).items()}
+
+
+def get_answers(response):
+    """The answers of ``response`` as ``{field_pk: value}``."""
+    if is_document(response.form):
+        return parse_answers(response.answers)
+    return dict(
+        FormFieldResponse.objects.filter(response=response).values_list(
+            "field_id", "value"
+        )
+    )
+
+
+def get_answers_sql(form):
+    """
+    A relation with the ``response_id``, ``field_id`` and ``value`` columns
+    of the FormFieldResponse table holding the answers of ``form``, for use
+    as ``FROM {relation} r``. Document mode needs a ``%(form)s`` parameter.
+    """
+    if is_document(form):
+        return DOCUMENT_ANSWERS_SQL.format(**TABLES)
+    return TABLES["field_response"]
+
+
+def Answer(field_pk):
+    """The JSON answer to one field in a document-mode response's ``answers``."""
+    # Not a KeyTransform: that reads integer-like keys as array indexes.
+    return Func(
+        F("answers"),
+        Value(str(field_pk)),
+        arg_joiner=" -> ",
+        template="(%(expressions)s)",
+        output_field=models.JSONField(),
+    )
+
+
+def filter_by_answer(responses, form, field_pk, value):
+    """The ``responses`` of ``form`` whose answer to ``field_pk`` is ``value``."""
+    if is_document(form):
+        return responses.alias(answer=Answer(field_pk)).filter(answer=value)
+    return responses.filter(
+        formfieldresponse__field=field_pk, formfieldresponse__value=value
+    )
+
+
+def get_answer_index(field):
+    """
+    A partial index on the answers to ``field`` in the responses of its form,
+    serving ``filter_by_answer`` for forms in document mode.
+    """
+    return models.Index(
+        Answer(field.pk),
+        name=f"forms_answer_{field.pk}_idx",
+        condition=Q(form=field.form_id),
+    )
+
+
+def get_value_index():
+    """
+    A GIN index on every row-mode answer, serving JSON containment filters
+    (``value__contains=...``). Optional, as it slows down every submission.
+    """
+    return GinIndex(
+        fields=["value"], opclasses=["jsonb_path_ops"], name="forms_fieldresp_value_gin"
+    )
+
+
+def delete_responses(form):
+    """
+    Delete every response of ``form``, its answers and submission keys in
+    three statements, without the ORM collecting them first.
+    """
+    statements = (DELETE_SUBMISSION_KEYS_SQL, DELETE_ROWS_SQL, DELETE_RESPONSES_SQL)
+    with transaction.atomic(), connection.cursor() as cursor:
+        for sql in statements:
+            cursor.execute(sql.format(**TABLES), {"form": form.pk})
+
+
+def convert_response_storage(form, storage):
+    """
+    Move the stored answers of ``form`` to ``storage`` in one transaction and
+    switch the form over. Converting to the current mode again picks up
+    answers submitted in the old mode while a conversion ran.
+    """
+    if storage == Form.DOCUMENT:
+        statements = (TO_DOCUMENT_SQL, DELETE_ROWS_SQL)
+    else:
+        statements = (TO_ROWS_SQL, DELETE_DOCUMENTS_SQL)
+    with transaction.atomic(), connection.cursor() as cursor:
+        for sql in statements:
+            cursor.execute(sql.format(**TABLES), {"form": form.pk})
+        Form.objects.filter(pk=form.pk).update(response_storage=storage)
+    form.response_storage = storage
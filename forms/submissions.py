@@ -0,0 +1,153 @@
+"""
+Submission ingestion: validates answer payloads against the cached form
+schema and writes responses with a fixed number of INSERTs per batch.
+Retried submissions are detected by ``forms.dedupe`` and answered with the
+response stored the first time. Upload fields are answered with the id of a
+finished ``forms.uploads`` upload.
+"""
+
+from django.core.exceptions import ValidationError
+from django.db import IntegrityError, transaction
+from django.utils import timezone
+
+from .dedupe import (
+    create_submission_keys,
+    find_submission_keys,
+    forget_submission_keys,
+    get_submission_keys,
+    remember_submission_keys,
+)
+from .logic import get_form_logic
+from .models import FormResponse, SubmissionKey
+from .schema import get_form_schema
+from .storage import create_responses
+from .tasks import enqueue_summary_update
+from .uploads import check_uploads
+from .validation import EMPTY_VALUES, get_form_validator
+
+DUPLICATE_CONTENT_MESSAGE = "These answers were already submitted."
+
+
+class SubmissionError(Exception):
+    """Raised with per-submission error dicts, keyed by index in the batch."""
+
+    def __init__(self, errors):
+        super().__init__(errors)
+        self.errors = errors
+
+
+def clean_answers(schema, answers):
+    """
+    Return ``answers`` keyed by integer field pk, dropping empty values.
+    Raises ValidationError with a message dict keyed by field pk.
+    """
+    if not isinstance(answers, dict):
+        raise ValidationError({"answers": ["Expected an object of answers."]})
+
+    cleaned, errors = {}, {}
+    for key, value in answers.items():
+        try:
+            field = schema.get_field(int(key))
+        except (KeyError, TypeError, ValueError):
+            errors[str(key)] = ["Unknown field."]
+            continue
+        if value not in EMPTY_VALUES:
+            cleaned[field.pk] = value
+
+    # Hidden fields are neither validated nor stored.
+    hidden = get_form_logic(schema).hidden_fields(cleaned)
+    for pk in hidden:
+        cleaned.pop(pk, None)
+
+    for pk, field_errors in get_form_validator(schema)(cleaned, hidden).items():
+        errors.setdefault(str(pk), []).extend(field_errors)
+
+    if errors:
+        raise ValidationError(errors)
+    return cleaned
+
+
+def clean_submissions(schema, submissions):
+    cleaned, errors = [], {}
+    for index, answers in enumerate(submissions):
+        try:
+            cleaned.append(clean_answers(schema, answers))
+        except ValidationError as e:
+            errors[index] = e.message_dict
+    if errors:
+        raise SubmissionError(errors)
+    return cleaned
+
+
+def save_submissions(form, user, submissions, batch_size=None, keys=None):
+    """
+    Persist already cleaned ``submissions`` in one transaction: one INSERT for
+    the FormResponse rows, one for their FormFieldResponse rows unless the
+    form stores answers as documents, and one upsert queueing the summary
+    roll-up (see ``forms.tasks``).
+
+    ``keys`` holds the ``(kind, key)`` pairs of each submission (see
+    ``forms.dedupe``). A submission whose ID was stored before is not saved
+    again: the response stored then takes its place in the returned list,
+    with ``duplicate`` set. Repeated content raises SubmissionError.
+    """
+    if keys is None:
+        keys = [[] for _ in submissions]
+    with transaction.atomic():
+        found = find_submission_keys(form, {pair for pairs in keys for pair in pairs})
+        originals = FormResponse.objects.in_bulk(set(found.values())) if found else {}
+        # Keys of responses deleted since this process stored them.
+        stale = [pair for pair, pk in found.items() if pk not in originals]
+        forget_submission_keys(form, stale)
+        for pair in stale:
+            del found[pair]
+
+        slots, pending, new, errors = [], {}, [], {}
+        for index, (answers, pairs) in enumerate(zip(submissions, keys)):
+            pairs = dict(pairs)
+            kinds = (SubmissionKey.SUBMISSION_ID, SubmissionKey.CONTENT)
+            submission_id, content = ((kind, pairs.get(kind)) for kind in kinds)
+            if submission_id in found:
+                slots.append(originals[found[submission_id]])
+            elif submission_id in pending:
+                slots.append(pending[submission_id])
+            elif content in found or content in pending:
+                errors[index] = {"__all__": [DUPLICATE_CONTENT_MESSAGE]}
+            else:
+                pending.update((pair, len(new)) for pair in pairs.items())
+                slots.append(len(new))
+                new.append(answers)
+        if errors:
+            raise SubmissionError(errors)
+
+        responses = create_responses(form, user, new, batch_size=batch_size)
+        created = {pair: responses[i].pk for pair, i in pending.items()}
+        create_submission_keys(form, created)
+        enqueue_summary_update(form, [response.pk for response in responses])
+        transaction.on_commit(lambda: remember_submission_keys(form, created))
+
+    for response in responses:
+        response.duplicate = False
+    for response in originals.values():
+        response.duplicate = True
+    return [responses[slot] if isinstance(slot, int) else slot for slot in slots]
+
+
+def ingest_submissions(form, user, submissions, batch_size=None):
+    """
+    Validate and store a batch of answer dicts for ``form``. Nothing is saved
+    unless every submission in the batch is valid.
+    """
+    if form.expiration_date <= timezone.now():
+        raise SubmissionError({"__all__": ["This form has expired."]})
+    schema = get_form_schema(form)
+    cleaned = clean_submissions(schema, submissions)
+    if errors := check_uploads(schema, user, cleaned):
+        raise SubmissionError(errors)
+    keys = [get_submission_keys(form, schema, user, answers) for answers in cleaned]
+    try:
+        return save_submissions(form, user, cleaned, batch_size=batch_size, keys=keys)
+    except IntegrityError:
+        # A concurrent retry stored one of the keys first. Its response is
+        # committed by now and is returned instead.
+        return save_submissions(form, user, cleaned, batch_size=batch_size, keys=keys)
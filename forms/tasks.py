@@ -0,0 +1,46 @@
+"""
+Background tasks of the forms app, run by the configured ``TASKS`` backend:
+``forms.queue.DatabaseBackend`` and ``manage.py run_tasks`` in production.
+"""
+
+from datetime import timedelta
+
+from django.conf import settings
+from django.tasks import task
+from django.utils import timezone
+
+from .analytics import update_field_summaries
+from .models import Form
+from .queue import enqueue_batched
+
+
+@task
+def update_form_summaries(form_pk, response_ids):
+    """Fold the answers of new responses of a form into its summaries."""
+    form = Form.objects.filter(pk=form_pk).first()
+    if form is None:
+        return 0
+    return update_field_summaries(form, response_ids)
+
+
+def enqueue_summary_update(form, response_ids):
+    """
+    Queue the summary roll-up of new responses of ``form``. It waits
+    ``FORMS_SUMMARY_BATCH_DELAY`` seconds so the responses submitted to the
+    form meanwhile are rolled up in the same task.
+    """
+    if not response_ids:
+        return None
+    summary_task = update_form_summaries
+    if summary_task.get_backend().supports_defer:
+        delay = getattr(settings, "FORMS_SUMMARY_BATCH_DELAY", 2)
+        summary_task = summary_task.using(
+            run_after=timezone.now() + timedelta(seconds=delay)
+        )
+    return enqueue_batched(
+        summary_task,
+        f"summaries:{form.pk}",
+        [form.pk],
+        {"response_ids": list(response_ids)},
+        extend="response_ids",
+    )
@@ -0,0 +1,32 @@
+from django import template
+from django.utils.safestring import mark_safe
+
+from ..choices import get_option_block, render_options
+from ..fragments import render_field_fragment
+from ..schema import GroupSchema
+
+register = template.Library()
+
+
+@register.simple_tag(takes_context=True)
+def render_item(context, schema, item):
+    """
+    Render a field of ``schema`` from the fragment cache, or a group with its
+    own template so its fields come back through here.
+    """
+    if isinstance(item, GroupSchema):
+        group_template = context.template.engine.get_template(item.get_template_name())
+        with context.push(object=item):
+            return group_template.render(context)
+    return mark_safe(render_field_fragment(schema, item))
+
+
+@register.simple_tag
+def field_options(field):
+    """
+    The ``<option>`` elements of ``field``: the cached block of its choice set
+    (only the first page for lazy sets), or its own choices.
+    """
+    if field.choice_set_ref is not None:
+        return get_option_block(field.choice_set_ref)
+    return render_options(field.get_choices() or ())
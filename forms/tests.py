@@ -1 +1,2041 @@
-# Create your tests here.
+import base64
+import csv
+import hashlib
+import io
+import json
+import tempfile
+import threading
+import time
+import uuid
+from datetime import timedelta
+from decimal import Decimal
+from unittest import mock
+
+from asgiref.sync import async_to_sync
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.core.exceptions import ValidationError
+from django.core.management import CommandError, call_command
+from django.db import IntegrityError, connection, transaction
+from django.tasks import TaskResultStatus, task, task_backends
+from django.test import SimpleTestCase, TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from django.utils import timezone, translation
+
+from .analytics import get_form_summary, get_percentiles, rebuild_field_summaries
+from .archive import archive_form
+from .choices import consolidate_choice_sets
+from .dedupe import find_submission_keys, seen_keys
+from .definitions import (
+    DEFINITION_FORMATS,
+    DefinitionError,
+    import_definitions,
+    iter_definition_records,
+)
+from .export import EXPORT_FORMATS, get_export_columns, iter_responses
+from .fragments import (
+    DYNAMIC_VALUE_PLACEHOLDER,
+    fragment_stats,
+    get_components_url,
+    get_fragment_cache_key,
+)
+from .instrumentation import metrics_registry
+from .layout import apply_layout, get_layout_class
+from .logic import get_form_logic
+from .management.commands.benchmark import load_fixtures
+from .management.commands.benchmark_storage import get_table_size
+from .management.commands.benchmark_validation import HOT_RULES
+from .models import (
+    ArchivedRowGroup,
+    ChoiceSet,
+    ChoiceSetMembership,
+    FieldChoice,
+    FieldType,
+    Form,
+    FormField,
+    FormFieldChoiceMembership,
+    FormFieldGroup,
+    FormFieldResponse,
+    FormFieldSummary,
+    FormResponse,
+    QueuedTask,
+    RequestProfile,
+    SubmissionKey,
+    Upload,
+)
+from .partitioning import create_partitions, drop_empty_partitions
+from .profiling import StackSampler, get_profile_token, parse_collapsed
+from .queue import (
+    claim_tasks,
+    get_queue_depth,
+    requeue_stalled_tasks,
+    run_task,
+    touch_task,
+)
+from .schema import FieldSchema, get_form_schema, get_schema_cache_key
+from .storage import (
+    convert_response_storage,
+    filter_by_answer,
+    get_answer_index,
+    get_answers,
+    get_value_index,
+)
+from .submissions import SubmissionError, ingest_submissions
+from .tasks import enqueue_summary_update
+from .uploads import (
+    SIGNATURE_SUFFIX,
+    UploadLimitMiddleware,
+    get_upload_path,
+    render_preview,
+)
+from .validation import check_rules, compile_field_validator
+
+
+def create_form(owner, field_count, choice_count=5):
+    char = FieldType.objects.get_or_create(
+        key="char", defaults={"description": "Char", "default_label": "Char"}
+    )[0]
+    select = FieldType.objects.get_or_create(
+        key="select",
+        defaults={
+            "description": "Select",
+            "default_label": "Select",
+            "supports_choices": True,
+        },
+    )[0]
+    form = Form.objects.create(
+        owner=owner,
+        title=f"{field_count} fields",
+        expiration_date=timezone.now() + timedelta(days=1),
+    )
+    group = FormFieldGroup.objects.create(form=form, key="group", label="Group")
+    choices = FieldChoice.objects.bulk_create(
+        FieldChoice(label=f"Choice {i}", value=str(i)) for i in range(choice_count)
+    )
+    for i in range(field_count):
+        field = FormField.objects.create(
+            form=form,
+            group=group if i % 2 else None,
+            field_type=select if i % 3 == 0 else char,
+        )
+        if field.field_type == select:
+            FormFieldChoiceMembership.objects.bulk_create(
+                FormFieldChoiceMembership(field=field, choice=c, order=choice_count - n)
+                for n, c in enumerate(choices)
+            )
+    form.refresh_from_db()
+    return form
+
+
+def run_queued_tasks():
+    """Run every queued task, due or not, as ``manage.py run_tasks`` would."""
+    backend = task_backends["default"]
+    queues = sorted(backend.queues)
+    later = timezone.now() + timedelta(days=1)
+    while rows := claim_tasks("test", queues, limit=100, now=later):
+        for row in rows:
+            run_task(row, backend)
+
+
+def read_stream(response):
+    """Read a streaming response's async content as the ASGI handler would."""
+
+    async def read():
+        return b"".join([chunk async for chunk in response.streaming_content])
+
+    return async_to_sync(read)()
+
+
+class FormTestCase(TestCase):
+    """Tests of a form of ``field_count`` fields (see ``create_form``)."""
+
+    field_count = 3
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.owner = get_user_model().objects.create_user("owner")
+        cls.form = create_form(cls.owner, cls.field_count)
+
+
+@task
+def failing_task(message):
+    raise ValueError(message)
+
+
+task_touched = threading.Event()
+
+
+@task
+def waiting_task():
+    """Run until the worker's heartbeat touches the task."""
+    return task_touched.wait(5)
+
+
+class RenderQueryBudgetTests(FormTestCase):
+    field_count = 4
+
+    @classmethod
+    def setUpTestData(cls):
+        super().setUpTestData()
+        cls.small_form = cls.form
+        cls.large_form = create_form(cls.owner, 40)
+
+    def setUp(self):
+        cache.clear()
+
+    def test_get_choices_follows_membership_order(self):
+        field = self.small_form.fields.filter(field_type__key="select").first()
+        expected = [("4", "Choice 4"), ("3", "Choice 3")]
+        self.assertEqual(field.get_choices()[:2], expected)
+        field = FormField.objects.with_render_data().get(pk=field.pk)
+        with self.assertNumQueries(0):
+            self.assertEqual(field.get_choices()[:2], expected)
+
+    def test_form_detail_query_budget(self):
+        for form in (self.small_form, self.large_form):
+            with self.subTest(fields=form.fields.count()):
+                cache.clear()
+                with self.assertNumQueries(4):
+                    self.client.get(form.get_absolute_url())
+                with self.assertNumQueries(1):
+                    self.client.get(form.get_absolute_url())
+
+    def test_form_detail_lazy_query_budget(self):
+        for form in (self.small_form, self.large_form):
+            with self.subTest(fields=form.fields.count()):
+                with self.assertNumQueries(3):
+                    self.client.get(form.get_absolute_url(), {"render": "lazy"})
+
+    def test_field_component_query_budget(self):
+        first, *rest = self.large_form.fields.all()[:3]
+        # The first field builds the form schema, the rest only load the field.
+        with self.assertNumQueries(4):
+            self.client.get(first.get_absolute_url())
+        for field in rest:
+            with self.subTest(field=field.pk):
+                with self.assertNumQueries(1):
+                    self.client.get(field.get_absolute_url())
+
+    def test_field_urls_query_budget(self):
+        form = Form.objects.with_render_data().get(pk=self.large_form.pk)
+        with self.assertNumQueries(0):
+            form.get_field_urls()
+            for group in form.field_groups.all():
+                group.get_field_urls()
+
+
+class SchemaVersionTests(FormTestCase):
+    def setUp(self):
+        # Versions repeat once each test's saves are rolled back.
+        cache.clear()
+
+    def assertBumped(self, version):
+        self.form.refresh_from_db()
+        self.assertGreater(self.form.schema_version, version)
+        return self.form.schema_version
+
+    def test_changes_bump_schema_version(self):
+        version = self.form.schema_version
+        field = self.form.fields.filter(field_type__key="select").first()
+        field.label = "Renamed"
+        field.save()
+        version = self.assertBumped(version)
+        FormFieldChoiceMembership.objects.filter(field=field).first().delete()
+        version = self.assertBumped(version)
+        field.choices.first().save()
+        version = self.assertBumped(version)
+        self.form.field_groups.first().save()
+        version = self.assertBumped(version)
+        self.form.save()
+        self.assertBumped(version)
+
+    def test_stale_form_save_does_not_roll_back_version(self):
+        stale = Form.objects.get(pk=self.form.pk)
+        self.form.fields.first().save()
+        self.form.refresh_from_db()
+        stale.save()
+        self.assertGreater(stale.schema_version, self.form.schema_version)
+
+    def test_schema_reflects_changes(self):
+        field = self.form.fields.filter(field_type__key="char").first()
+        self.assertEqual(get_form_schema(self.form).get_field(field.pk).label, "Char")
+        field.label = "Renamed"
+        field.save()
+        self.form.refresh_from_db()
+        schema = get_form_schema(self.form)
+        self.assertEqual(schema.get_field(field.pk).label, "Renamed")
+        self.assertEqual(
+            reverse("form_field_component", kwargs={"pk": field.pk}),
+            schema.get_field(field.pk).get_absolute_url(),
+        )
+
+    @override_settings(FORMS_SCHEMA_CACHE_TIMEOUT=30)
+    def test_schema_cache_entries_expire(self):
+        with mock.patch("forms.schema.get_schema_cache") as get_schema_cache:
+            schema_cache = get_schema_cache.return_value
+            schema_cache.get.return_value = None
+            schema = get_form_schema(self.form)
+        schema_cache.set.assert_called_once_with(
+            get_schema_cache_key(self.form.pk, self.form.schema_version), schema, 30
+        )
+
+    def test_schema_cached_per_version(self):
+        cache.clear()
+        schema = get_form_schema(self.form)
+        with self.assertNumQueries(0):
+            self.assertEqual(get_form_schema(self.form), schema)
+        self.form.save()
+        self.assertIsNot(get_form_schema(self.form), schema)
+
+
+class SubmissionTests(FormTestCase):
+    field_count = 6
+
+    @classmethod
+    def setUpTestData(cls):
+        super().setUpTestData()
+        cls.fields = list(cls.form.fields.order_by("pk"))
+        cls.url = reverse("form_submit", kwargs={"pk": cls.form.pk})
+
+    def setUp(self):
+        self.client.force_login(self.owner)
+
+    def submit(self, payload):
+        return self.client.post(self.url, payload, content_type="application/json")
+
+    def answers(self):
+        return {str(f.pk): "1" for f in self.fields}
+
+    def test_submit_single(self):
+        response = self.submit({"answers": self.answers()})
+        self.assertEqual(response.status_code, 201)
+        (pk,) = response.json()["responses"]
+        self.assertEqual(
+            FormFieldResponse.objects.filter(response=pk).count(), len(self.fields)
+        )
+
+    def test_batch_query_count_is_constant(self):
+        self.submit({"answers": self.answers()})
+        with CaptureQueriesContext(connection) as single:
+            self.submit({"submissions": [{"answers": self.answers()}]})
+        with CaptureQueriesContext(connection) as batch:
+            response = self.submit({"submissions": [{"answers": self.answers()}] * 50})
+        self.assertEqual(len(response.json()["responses"]), 50)
+        self.assertEqual(len(single), len(batch))
+
+    def test_invalid_batch_saves_nothing(self):
+        response = self.submit(
+            {"submissions": [{"answers": self.answers()}, {"answers": {"0": "x"}}]}
+        )
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(response.json()["errors"]["1"], {"0": ["Unknown field."]})
+        self.assertFalse(FormResponse.objects.exists())
+
+    def test_login_required(self):
+        self.client.logout()
+        self.assertEqual(self.submit({"answers": {}}).status_code, 403)
+
+
+class DedupeTests(FormTestCase):
+    field_count = 2
+
+    @classmethod
+    def setUpTestData(cls):
+        super().setUpTestData()
+        submission_id = FieldType.objects.create(
+            key="submission_id", description="ID", default_label="Submission ID"
+        )
+        cls.id_field = FormField.objects.create(
+            form=cls.form, field_type=submission_id, optional=True
+        )
+        cls.form.refresh_from_db()
+        cls.char_field = cls.form.fields.get(field_type__key="char")
+        cls.url = reverse("form_submit", kwargs={"pk": cls.form.pk})
+
+    def setUp(self):
+        seen_keys.clear()
+        self.client.force_login(self.owner)
+
+    def submit(self, *submissions):
+        payload = {"submissions": [{"answers": answers} for answers in submissions]}
+        with self.captureOnCommitCallbacks(execute=True):
+            return self.client.post(self.url, payload, content_type="application/json")
+
+    def answers(self, value="a", submission_id=None):
+        return {
+            str(self.char_field.pk): value,
+            str(self.id_field.pk): submission_id or str(uuid.uuid4()),
+        }
+
+    def test_retry_returns_original(self):
+        answers = self.answers()
+        first = self.submit(answers)
+        self.assertEqual(first.status_code, 201)
+        self.assertEqual(first.json()["duplicates"], [])
+
+        # The key is remembered in-process: no lookup in the key table.
+        with CaptureQueriesContext(connection) as queries:
+            retry = self.submit(answers)
+        self.assertEqual(retry.status_code, 200)
+        self.assertEqual(retry.json(), {**first.json(), "duplicates": [0]})
+        table = SubmissionKey._meta.db_table
+        self.assertFalse([q for q in queries if f'FROM "{table}"' in q["sql"]])
+
+        seen_keys.clear()
+        retry = self.submit(self.answers(), answers)
+        self.assertEqual(retry.status_code, 201)
+        self.assertEqual(retry.json()["responses"][1], first.json()["responses"][0])
+        self.assertEqual(retry.json()["duplicates"], [1])
+        self.assertEqual(FormResponse.objects.count(), 2)
+
+    def test_ids_are_per_user(self):
+        answers = self.answers()
+        (first,) = ingest_submissions(self.form, self.owner, [answers])
+        other = get_user_model().objects.create_user("other")
+        (response,) = ingest_submissions(self.form, other, [answers])
+        self.assertNotEqual(response, first)
+        self.assertFalse(response.duplicate)
+        self.assertEqual(response.user, other)
+        seen_keys.clear()
+        (retry,) = ingest_submissions(self.form, other, [answers])
+        self.assertEqual((retry, retry.duplicate), (response, True))
+
+    def test_repeated_id_in_batch(self):
+        answers = self.answers()
+        response = self.submit(answers, answers)
+        (pk,) = set(response.json()["responses"])
+        self.assertEqual(FormResponse.objects.get().pk, pk)
+
+    def test_concurrent_retry(self):
+        answers = self.answers()
+        original = ingest_submissions(self.form, self.owner, [answers])[0]
+        seen_keys.clear()
+        # The first lookup misses as if the other request hadn't committed yet.
+        lookups = [lambda form, keys: {}, find_submission_keys]
+        with mock.patch(
+            "forms.submissions.find_submission_keys",
+            side_effect=lambda *args: lookups.pop(0)(*args),
+        ):
+            (response,) = ingest_submissions(self.form, self.owner, [answers])
+        self.assertEqual(response, original)
+        self.assertTrue(response.duplicate)
+        self.assertEqual(FormResponse.objects.count(), 1)
+
+    def test_content_dedupe(self):
+        self.submit(self.answers("a"))
+        self.assertEqual(self.submit(self.answers("a")).status_code, 201)
+
+        self.form.dedupe_content = True
+        self.form.save()
+        self.submit(self.answers("b"))
+        with self.assertRaises(SubmissionError) as e:
+            ingest_submissions(self.form, self.owner, [self.answers("b")])
+        self.assertEqual(e.exception.errors, {0: {"__all__": [mock.ANY]}})
+        other = get_user_model().objects.create_user("other")
+        ingest_submissions(self.form, other, [self.answers("b")])
+        self.assertEqual(FormResponse.objects.count(), 4)
+
+
+class ValidationTests(SimpleTestCase):
+    def validate(self, validations, value, **kwargs):
+        field = FieldSchema(
+            pk=1,
+            group_pk=None,
+            key="char",
+            label="Field",
+            help_text="",
+            template_name="fields/char.html",
+            supports_choices=kwargs.pop("supports_choices", False),
+            choices=kwargs.pop("choices", ()),
+            validations=validations,
+            **kwargs,
+        )
+        return compile_field_validator(field)(value)
+
+    def test_required(self):
+        self.assertEqual(
+            self.validate({"required": True}, ""), ["This field is required."]
+        )
+        self.assertEqual(self.validate({"required": True}, "", optional=True), [])
+        self.assertEqual(self.validate({}, None), [])
+
+    def test_rules(self):
+        cases = [
+            ({"min_length": 3}, "ab", "abc"),
+            ({"max_length": 3}, "abcd", "abc"),
+            ({"regex": "^[A-Za-z]+$"}, "abc1", "abc"),
+            ({"choices": ["a", "b"]}, "c", "a"),
+            ({"choices": ["a", "b"]}, ["a", "c"], ["a", "b"]),
+            ({"min": 0, "max": 100}, 101, "100"),
+            ({"min": 0}, "not a number", 0),
+            ({"min": "1900-01-01", "max": "today"}, "1899-12-31", "1990-05-17"),
+            ({"allowed_domains": ["Example.com"]}, "a@other.com", "a@example.COM"),
+            ({"custom": {"operator": "$in", "value": ["A", "B"]}}, "C", "A"),
+            ({"custom": {"operator": "$regex", "value": "^x"}}, "yx", "xy"),
+            ({"custom": {"operator": "$gt", "value": 5}}, 5, 6),
+            ({"custom": {"operator": "$lt", "value": 5}}, 5, 4),
+        ]
+        for validations, invalid, valid in cases:
+            with self.subTest(validations=validations):
+                self.assertNotEqual(self.validate(validations, invalid), [])
+                self.assertEqual(self.validate(validations, valid), [])
+
+    def test_malformed_rules(self):
+        cases = [
+            {"regex": "[a-"},
+            {"min_length": "3"},
+            {"max": [1]},
+            {"custom": {"operator": "$in", "value": None}},
+            {"custom": {"operator": "$eq", "value": 1}},
+        ]
+        for validations in cases:
+            with self.subTest(validations=validations):
+                self.assertTrue(check_rules(validations))
+                with self.assertLogs("forms.validation", "WARNING"):
+                    self.assertEqual(self.validate(validations, "ab"), [])
+        self.assertEqual(check_rules({"min_length": 3, "regex": "^a"}), {})
+
+    def test_message_placeholders(self):
+        field = FieldSchema(
+            pk=1,
+            group_pk=None,
+            key="char",
+            label="Field",
+            help_text="",
+            template_name="fields/char.html",
+            supports_choices=False,
+            choices=(),
+            validations={"min_length": 3},
+        )
+        with self.assertLogs("forms.validation", "WARNING"):
+            validate = compile_field_validator(field, {"min_length": "At least {min}"})
+        self.assertEqual(validate("ab"), ["At least {min}"])
+
+    def test_field_choices(self):
+        choices = (("SG", "Singapore"), ("MY", "Malaysia"))
+        kwargs = {"supports_choices": True, "choices": choices}
+        self.assertEqual(self.validate({}, "SG", **kwargs), [])
+        self.assertNotEqual(self.validate({}, "XX", **kwargs), [])
+
+
+class ConditionalLogicTests(FormTestCase):
+    field_count = 3
+
+    @classmethod
+    def setUpTestData(cls):
+        super().setUpTestData()
+        cls.a, cls.b, cls.c = cls.form.fields.order_by("pk")
+        cls.b.conditional_logic = {
+            "rules": [{"field": cls.a.pk, "operator": "$eq", "value": "yes"}]
+        }
+        cls.b.validations = {"required": True}
+        cls.b.save()
+        cls.c.conditional_logic = {
+            "action": "hide",
+            "rules": [{"field": cls.b.pk, "operator": "$filled"}],
+        }
+        cls.c.save()
+        cls.form.refresh_from_db()
+
+    def logic(self):
+        return get_form_logic(get_form_schema(self.form))
+
+    def test_hidden_fields(self):
+        logic = self.logic()
+        self.assertEqual(logic.hidden_fields({}), {self.b.pk})
+        self.assertEqual(logic.hidden_fields({self.a.pk: "yes"}), set())
+        self.assertEqual(
+            logic.hidden_fields({self.a.pk: "yes", self.b.pk: "x"}), {self.c.pk}
+        )
+        # c ignores b's answer while b itself is hidden.
+        self.assertEqual(logic.hidden_fields({self.b.pk: "x"}), {self.b.pk})
+
+    def test_update_only_recomputes_downstream(self):
+        logic = self.logic()
+        self.assertEqual(logic.downstream(self.a.pk), (self.b.pk, self.c.pk))
+        self.assertEqual(logic.downstream(self.c.pk), ())
+        self.assertEqual(
+            logic.update({self.a.pk: "yes"}, self.a.pk),
+            {self.b.pk: True, self.c.pk: True},
+        )
+
+    def test_clean_rejects_cycles_and_unknown_fields(self):
+        self.a.conditional_logic = {"rules": [{"field": self.c.pk}]}
+        with self.assertRaises(ValidationError):
+            self.a.clean()
+        self.a.conditional_logic = {"rules": [{"field": 0}]}
+        with self.assertRaises(ValidationError):
+            self.a.clean()
+        self.c.conditional_logic = {"rules": [{"field": self.a.pk, "value": "x"}]}
+        self.c.clean()
+
+    def test_clean_rejects_non_numeric_bounds(self):
+        for operator in ("$gt", "$lt"):
+            with self.subTest(operator=operator):
+                self.c.conditional_logic = {
+                    "rules": [
+                        {"field": self.a.pk, "operator": operator, "value": "abc"}
+                    ]
+                }
+                with self.assertRaises(ValidationError) as cm:
+                    self.c.clean()
+                self.assertIn("numeric value", str(cm.exception))
+        self.c.conditional_logic = {
+            "rules": [{"field": self.a.pk, "operator": "$gt", "value": "2.5"}]
+        }
+        self.c.clean()
+
+    def test_clean_rejects_malformed_validations(self):
+        self.a.validations = {"regex": "[a-"}
+        with self.assertRaises(ValidationError) as cm:
+            self.a.clean()
+        self.assertIn("validations", cm.exception.message_dict)
+
+    def test_hidden_fields_skip_validation(self):
+        self.client.force_login(self.owner)
+        response = self.client.post(
+            reverse("form_submit", kwargs={"pk": self.form.pk}),
+            {"answers": {str(self.a.pk): "1", str(self.b.pk): "1"}},
+            content_type="application/json",
+        )
+        self.assertEqual(response.status_code, 201)
+        self.assertFalse(FormFieldResponse.objects.filter(field=self.b).exists())
+
+    def test_logic_view(self):
+        url = reverse("form_logic", kwargs={"pk": self.form.pk})
+        response = self.client.post(url, {"field": self.a.pk, "value": "yes"})
+        self.assertEqual(
+            json.loads(response["HX-Trigger"]),
+            {"forms:visibility": {str(self.b.pk): True, str(self.c.pk): True}},
+        )
+        response = self.client.post(url, {"field": self.b.pk, "value": "x"})
+        self.assertEqual(
+            json.loads(response["HX-Trigger"]),
+            {"forms:visibility": {str(self.c.pk): False}},
+        )
+        response = self.client.post(url, {"field": self.c.pk, "value": "x"})
+        self.assertNotIn("HX-Trigger", response)
+
+
+class AnalyticsTests(FormTestCase):
+    field_count = 0
+
+    @classmethod
+    def setUpTestData(cls):
+        super().setUpTestData()
+        cls.fields = {
+            key: FormField.objects.create(
+                form=cls.form,
+                field_type=FieldType.objects.get_or_create(
+                    key=key, defaults={"description": key, "default_label": key}
+                )[0],
+            )
+            for key in ("multi_select", "integer", "date", "char")
+        }
+        cls.form.refresh_from_db()
+
+    def submit(self, *submissions):
+        ingest_submissions(
+            self.form,
+            self.owner,
+            [{str(self.fields[k].pk): v for k, v in s.items()} for s in submissions],
+        )
+        run_queued_tasks()
+
+    def test_incremental_summaries(self):
+        self.check_incremental_summaries()
+
+    def test_document_storage(self):
+        convert_response_storage(self.form, Form.DOCUMENT)
+        self.check_incremental_summaries()
+        self.assertFalse(FormFieldResponse.objects.exists())
+
+    def check_incremental_summaries(self):
+        self.submit(
+            {"multi_select": ["a", "b"], "integer": 10, "date": "2026-01-05"},
+            {"multi_select": ["a"], "integer": "30", "date": "2026-02-01T10:00"},
+        )
+        self.submit({"multi_select": "c", "integer": "n/a", "char": "x"})
+        summary = get_form_summary(self.form)
+        self.assertEqual(
+            summary[self.fields["multi_select"].pk]["choices"],
+            {"a": 2, "b": 1, "c": 1},
+        )
+        numeric = summary[self.fields["integer"].pk]["numeric"]
+        self.assertEqual(
+            (numeric["count"], numeric["min"], numeric["max"], numeric["avg"]),
+            (2, 10, 30, 20),
+        )
+        self.assertEqual(
+            summary[self.fields["date"].pk]["dates"], {"2026-01": 1, "2026-02": 1}
+        )
+        self.assertNotIn(self.fields["char"].pk, summary)
+        self.assertEqual(get_percentiles(self.fields["integer"], (0.5,)), {0.5: 20})
+
+        rebuild_field_summaries(self.form)
+        self.assertEqual(get_form_summary(self.form), summary)
+
+    def test_values_past_the_summary_columns(self):
+        self.submit(
+            {"multi_select": ["x" * 300, "x" * 299 + "y"], "integer": "1" + "0" * 30},
+            {"integer": 6 * 10**23},
+        )
+        self.submit({"integer": 6 * 10**23}, {"integer": 6 * 10**23})
+        summary = get_form_summary(self.form)
+        buckets = summary[self.fields["multi_select"].pk]["choices"]
+        self.assertEqual(len(buckets), 2)
+        for bucket in buckets:
+            self.assertEqual(len(bucket), 200)
+            self.assertTrue(bucket.startswith("x" * 167 + "#"))
+        numeric = FormFieldSummary.objects.get(field=self.fields["integer"])
+        self.assertEqual((numeric.count, numeric.maximum), (3, 6 * 10**23))
+        self.assertEqual(numeric.total, Decimal("999999999999999999999999.999999"))
+        rebuild_field_summaries(self.form)
+        self.assertEqual(get_form_summary(self.form), summary)
+
+    def test_summary_view(self):
+        self.submit({"integer": 5})
+        url = reverse("form_summary", kwargs={"pk": self.form.pk})
+        self.client.force_login(self.owner)
+        response = self.client.get(url)
+        self.assertEqual(
+            response.json()["fields"][str(self.fields["integer"].pk)]["numeric"][
+                "count"
+            ],
+            1,
+        )
+        other = get_user_model().objects.create_user("other")
+        self.client.force_login(other)
+        self.assertEqual(self.client.get(url).status_code, 404)
+
+
+class ExportTests(FormTestCase):
+    field_count = 3
+
+    @classmethod
+    def setUpTestData(cls):
+        super().setUpTestData()
+        cls.fields = list(cls.form.fields.order_by("pk"))
+        ingest_submissions(
+            cls.form,
+            cls.owner,
+            [
+                {str(cls.fields[0].pk): "1", str(cls.fields[2].pk): "x, y"},
+                {str(cls.fields[0].pk): "2", str(cls.fields[1].pk): "z"},
+            ],
+        )
+        cls.url = reverse("form_export", kwargs={"pk": cls.form.pk})
+
+    def setUp(self):
+        self.client.force_login(self.owner)
+
+    def test_csv(self):
+        response = self.client.get(self.url)
+        rows = list(csv.reader(io.StringIO(read_stream(response).decode())))
+        schema = get_form_schema(self.form)
+        headers = [h for _, h in get_export_columns(schema)]
+        self.assertEqual(rows[0], ["response", "user", "created_at", *headers])
+        self.assertEqual(len(rows), 3)
+        answers = [
+            dict(zip((pk for pk, _ in get_export_columns(schema)), row[3:]))
+            for row in rows[1:]
+        ]
+        first, second, third = (f.pk for f in self.fields)
+        self.assertEqual(answers[0], {first: "1", second: "", third: "x, y"})
+        self.assertEqual(answers[1], {first: "2", second: "z", third: ""})
+
+    def test_ndjson(self):
+        response = self.client.get(self.url, {"format": "ndjson"})
+        rows = [json.loads(line) for line in read_stream(response).splitlines()]
+        self.assertEqual([row["user"] for row in rows], [self.owner.pk] * 2)
+
+    @mock.patch("forms.views.STREAM_BATCH_SIZE", 1)
+    async def test_streams_under_asgi(self):
+        events = []
+
+        def stream(form):
+            for i in range(3):
+                events.append(f"read {i}")
+                yield f"{i}\n"
+
+        await self.async_client.aforce_login(self.owner)
+        with mock.patch.dict(EXPORT_FORMATS, {"csv": (stream, "text/csv")}):
+            response = await self.async_client.get(self.url)
+            self.assertTrue(response.is_async)
+            async for chunk in response.streaming_content:
+                events.append(f"sent {chunk.decode().strip()}")
+        self.assertEqual(
+            events, ["read 0", "sent 0", "read 1", "sent 1", "read 2", "sent 2"]
+        )
+
+    def test_owner_only(self):
+        self.client.force_login(get_user_model().objects.create_user("other"))
+        self.assertEqual(self.client.get(self.url).status_code, 404)
+
+    def test_document_storage(self):
+        exports = {
+            export_format: read_stream(
+                self.client.get(self.url, {"format": export_format})
+            )
+            for export_format in EXPORT_FORMATS
+        }
+        convert_response_storage(self.form, Form.DOCUMENT)
+        self.assertFalse(FormFieldResponse.objects.exists())
+        for export_format, content in exports.items():
+            with self.subTest(format=export_format):
+                response = self.client.get(self.url, {"format": export_format})
+                self.assertEqual(read_stream(response), content)
+
+    def test_without_server_side_cursors(self):
+        expected = list(iter_responses(self.form))
+        with mock.patch.dict(
+            connection.settings_dict, {"DISABLE_SERVER_SIDE_CURSORS": True}
+        ):
+            # Two pages of one response each, then an empty page.
+            with self.assertNumQueries(5):
+                self.assertEqual(list(iter_responses(self.form, 1)), expected)
+
+
+class QueryPlanTests(FormTestCase):
+    """
+    Hot queries must be answerable from an index. Sequential scans are
+    priced out of the planner, so a plan that still contains one means no
+    usable index exists.
+    """
+
+    field_count = 4
+
+    @classmethod
+    def setUpTestData(cls):
+        super().setUpTestData()
+        cls.field = cls.form.fields.order_by("pk").first()
+        for _ in range(3):
+            form = create_form(cls.owner, 4)
+            field = form.fields.order_by("pk").first()
+            ingest_submissions(form, cls.owner, [{str(field.pk): "1"}] * 20)
+        ingest_submissions(cls.form, cls.owner, [{str(cls.field.pk): "1"}] * 20)
+        with connection.cursor() as cursor:
+            cursor.execute("ANALYZE")
+
+    def setUp(self):
+        with connection.cursor() as cursor:
+            cursor.execute("SET enable_seqscan = off")
+
+    def tearDown(self):
+        with connection.cursor() as cursor:
+            cursor.execute("RESET enable_seqscan")
+
+    def assertIndexed(self, queryset):
+        plan = queryset.explain()
+        self.assertNotIn("Seq Scan", plan)
+
+    def test_export(self):
+        self.assertIndexed(
+            FormResponse.objects.filter(form=self.form)
+            .order_by("pk")
+            .values_list(
+                "pk", "formfieldresponse__field_id", "formfieldresponse__value"
+            )
+        )
+
+    def test_responses_by_time(self):
+        since = timezone.now() - timedelta(days=7)
+        self.assertIndexed(
+            FormResponse.objects.filter(form=self.form, created_at__gte=since)
+        )
+
+    def test_user_responses(self):
+        self.assertIndexed(FormResponse.objects.filter(form=self.form, user=self.owner))
+
+    def test_field_answers(self):
+        since = timezone.now() - timedelta(days=7)
+        self.assertIndexed(
+            FormFieldResponse.objects.filter(field=self.field, created_at__gte=since)
+        )
+
+    def test_response_answers(self):
+        response = FormResponse.objects.filter(form=self.form).first()
+        self.assertIndexed(
+            FormFieldResponse.objects.filter(response=response, field=self.field)
+        )
+
+    def test_value_containment(self):
+        queryset = FormFieldResponse.objects.filter(value__contains="1")
+        self.assertIn("Seq Scan", queryset.explain())
+        # Opt-in, see `manage.py index_answers --containment`.
+        with connection.cursor() as cursor:
+            cursor.execute("SET CONSTRAINTS ALL IMMEDIATE")
+        with connection.schema_editor() as editor:
+            editor.add_index(FormFieldResponse, get_value_index())
+        self.assertIndexed(queryset)
+
+    def test_field_tree(self):
+        self.assertIndexed(FormField.objects.filter(form=self.form, group__isnull=True))
+
+
+class LayoutTests(FormTestCase):
+    field_count = 3
+
+    @classmethod
+    def setUpTestData(cls):
+        super().setUpTestData()
+        cls.fields = list(cls.form.fields.order_by("pk"))
+        cls.group = cls.form.field_groups.get()
+        cls.url = reverse("form_layout", kwargs={"pk": cls.form.pk})
+
+    def test_layout_class(self):
+        self.assertEqual(
+            get_layout_class({"sm": 6, "lg": 4}, {"xs": 2, "md": 3}),
+            "col-span-12 sm:col-span-6 lg:col-span-4 order-2 md:order-3",
+        )
+        self.assertEqual(get_layout_class(order={"sm": 2}), "col-span-full sm:order-2")
+
+    def test_save_syncs_position(self):
+        field = self.fields[0]
+        field.order = {**field.order, "xs": 5}
+        field.save(update_fields=["order"])
+        field.refresh_from_db()
+        self.assertEqual(field.position, 5)
+
+    def test_apply_layout(self):
+        first, second, _ = self.fields
+        version = self.form.schema_version
+        # A read and an UPDATE per model, one version bump, one refresh, plus
+        # the savepoint pair.
+        with self.assertNumQueries(8):
+            apply_layout(
+                self.form,
+                fields={
+                    str(first.pk): {"order": {"xs": 3}},
+                    str(second.pk): {"widths": {"md": 12}},
+                },
+                groups={str(self.group.pk): {"order": {"lg": 2}}},
+            )
+        self.assertEqual(self.form.schema_version, version + 1)
+        first.refresh_from_db()
+        second.refresh_from_db()
+        self.group.refresh_from_db()
+        self.assertEqual((first.position, first.order["sm"]), (3, 1))
+        self.assertEqual(second.widths["md"], 12)
+        self.assertEqual(self.group.order["lg"], 2)
+
+        schema = get_form_schema(self.form)
+        self.assertEqual(schema.fields[-1].pk, first.pk)
+        self.assertIn("md:col-span-12", schema.get_field(second.pk).layout_class)
+
+    def test_apply_layout_is_all_or_nothing(self):
+        first, second, _ = self.fields
+        with self.assertRaises(ValidationError) as cm:
+            apply_layout(
+                self.form,
+                fields={
+                    str(first.pk): {"order": {"xs": 3}},
+                    str(second.pk): {"widths": {"md": 13}},
+                },
+            )
+        self.assertIn("fields", cm.exception.message_dict)
+        first.refresh_from_db()
+        self.assertEqual(first.position, 1)
+
+    def test_view(self):
+        self.client.force_login(self.owner)
+        payload = {"fields": {str(self.fields[0].pk): {"widths": {"xl": 6}}}}
+        response = self.client.post(self.url, payload, content_type="application/json")
+        self.assertEqual(response.status_code, 200)
+        payload["fields"] = {"0": {"widths": {"xl": 6}}}
+        response = self.client.post(self.url, payload, content_type="application/json")
+        self.assertEqual(response.status_code, 400)
+
+        self.client.force_login(get_user_model().objects.create_user("other"))
+        response = self.client.post(self.url, {}, content_type="application/json")
+        self.assertEqual(response.status_code, 404)
+
+
+class FragmentCacheTests(FormTestCase):
+    field_count = 2
+
+    @classmethod
+    def setUpTestData(cls):
+        super().setUpTestData()
+        cls.field = cls.form.fields.first()
+        submission_id = FieldType.objects.create(
+            key="submission_id", description="ID", default_label="Submission ID"
+        )
+        cls.dynamic_field = FormField.objects.create(
+            form=cls.form, field_type=submission_id
+        )
+
+    def setUp(self):
+        cache.clear()
+        fragment_stats.reset()
+
+    def test_hits_and_misses(self):
+        url = self.field.get_absolute_url()
+        first = self.client.get(url).content
+        self.assertEqual(self.client.get(url).content, first)
+        self.assertEqual(fragment_stats.snapshot(), {"hits": 1, "misses": 1})
+
+        self.field.label = "Renamed"
+        self.field.save()
+        self.assertContains(self.client.get(url), "Renamed")
+        self.assertEqual(fragment_stats.snapshot(), {"hits": 1, "misses": 2})
+
+    def test_locale_in_key(self):
+        field = get_form_schema(self.form).get_field(self.field.pk)
+        with translation.override("en"):
+            en = get_fragment_cache_key(field, 1)
+        with translation.override("fr"):
+            self.assertNotEqual(get_fragment_cache_key(field, 1), en)
+
+    def test_dynamic_value_injected_into_shell(self):
+        url = self.dynamic_field.get_absolute_url()
+        first, second = (self.client.get(url).content.decode() for _ in range(2))
+        self.assertEqual(fragment_stats.snapshot(), {"hits": 1, "misses": 1})
+        self.assertNotIn(DYNAMIC_VALUE_PLACEHOLDER, first)
+        self.assertNotEqual(first, second)
+
+
+class ConditionalGetTests(FormTestCase):
+    field_count = 3
+
+    @classmethod
+    def setUpTestData(cls):
+        super().setUpTestData()
+        cls.field = cls.form.fields.first()
+        cls.group = cls.form.field_groups.get()
+
+    def assertNotModified(self, url, queries=1):
+        etag = self.client.get(url)["ETag"]
+        with self.assertNumQueries(queries):
+            response = self.client.get(url, headers={"if-none-match": etag})
+        self.assertEqual(response.status_code, 304)
+        return etag
+
+    def test_not_modified(self):
+        for url in (
+            self.form.get_absolute_url(),
+            self.field.get_absolute_url(),
+            self.group.get_absolute_url(),
+        ):
+            with self.subTest(url=url):
+                self.assertNotModified(url)
+
+    def test_version_bump_changes_etag(self):
+        url = self.field.get_absolute_url()
+        etag = self.assertNotModified(url)
+        self.field.label = "Renamed"
+        self.field.save()
+        response = self.client.get(url, headers={"if-none-match": etag})
+        self.assertEqual(response.status_code, 200)
+        self.assertNotEqual(response["ETag"], etag)
+
+    def test_cache_control(self):
+        response = self.client.get(self.field.get_absolute_url())
+        self.assertEqual(response["Cache-Control"], "public, max-age=60")
+        response = self.client.get(self.form.get_absolute_url())
+        self.assertEqual(response["Cache-Control"], "no-cache")
+
+    def test_dynamic_fields_are_not_conditional(self):
+        submission_id = FieldType.objects.create(
+            key="submission_id", description="ID", default_label="Submission ID"
+        )
+        field = FormField.objects.create(form=self.form, field_type=submission_id)
+        for url in (field.get_absolute_url(), self.form.get_absolute_url()):
+            with self.subTest(url=url):
+                self.assertFalse(self.client.get(url).has_header("ETag"))
+
+
+class ComponentBatchTests(FormTestCase):
+    field_count = 6
+
+    @classmethod
+    def setUpTestData(cls):
+        super().setUpTestData()
+        cls.group = cls.form.field_groups.get()
+        cls.fields = list(cls.form.fields.filter(group__isnull=True))
+
+    def test_renders_oob_swaps_in_one_query(self):
+        url = get_components_url(fields=self.fields, groups=[self.group])
+        self.client.get(url)
+        with self.assertNumQueries(1):
+            response = self.client.get(url)
+        content = response.content.decode()
+        for item in (*self.fields, self.group):
+            self.assertIn(f'id="{item.component_id}" hx-swap-oob="true"', content)
+        for field in self.group.get_fields():
+            self.assertIn(f'id="{field.component_id}"', content)
+        self.assertEqual(content.count("hx-swap-oob"), len(self.fields) + 1)
+        self.assertEqual(response["Cache-Control"], "public, max-age=60")
+
+    def test_lazy_detail_uses_batch(self):
+        response = self.client.get(self.form.get_absolute_url(), {"render": "lazy"})
+        self.assertContains(response, reverse("form_components"), count=1)
+        self.assertContains(response, f'id="{self.group.component_id}"')
+
+    def test_inline_detail_renders_field_tree(self):
+        for params in ({}, {"render": "unknown"}):
+            with self.subTest(params=params):
+                response = self.client.get(self.form.get_absolute_url(), params)
+                self.assertIs(response.context["inline"], True)
+                self.assertNotContains(response, reverse("form_components"))
+                self.assertNotContains(response, "hx-swap-oob")
+                self.assertContains(response, f'id="{self.group.component_id}"')
+                for field in (*self.fields, *self.group.get_fields()):
+                    self.assertContains(response, f'id="{field.component_id}"', count=1)
+                self.assertContains(response, "Choice 4")
+
+    def test_invalid_pks(self):
+        response = self.client.get(reverse("form_components"), {"fields": "1,x"})
+        self.assertEqual(response.status_code, 400)
+
+
+class AsyncViewTests(FormTestCase):
+    field_count = 3
+
+    async def test_async_views(self):
+        field = await self.form.fields.afirst()
+        for url in (
+            reverse("form_list"),
+            self.form.get_absolute_url(),
+            field.get_absolute_url(),
+            get_components_url(fields=[field]),
+        ):
+            with self.subTest(url=url):
+                response = await self.async_client.get(url)
+                self.assertEqual(response.status_code, 200)
+
+    async def test_async_submit(self):
+        url = reverse("form_submit", kwargs={"pk": self.form.pk})
+        response = await self.async_client.post(
+            url, {"answers": {}}, content_type="application/json"
+        )
+        self.assertEqual(response.status_code, 403)
+        await self.async_client.aforce_login(self.owner)
+        response = await self.async_client.post(
+            url, {"answers": {}}, content_type="application/json"
+        )
+        self.assertEqual(response.status_code, 201)
+
+
+class BenchmarkFixtureTests(TestCase):
+    def test_load_fixtures_upgrades_old_dumps(self):
+        counts = load_fixtures(settings.BASE_DIR)
+        self.assertEqual(counts["form_fields.json"], 70)
+        # Memberships of fields missing from form_fields.json are skipped.
+        self.assertEqual(
+            counts["field_choices_membership.json"],
+            FormFieldChoiceMembership.objects.count(),
+        )
+        self.assertLess(counts["field_choices_membership.json"], 893)
+        field = FormField.objects.get(pk=69)
+        self.assertEqual((field.order, field.position), ({"xs": 3}, 3))
+        self.assertTrue(field.field_type.supports_choices)
+        self.assertEqual(len(get_form_schema(field.form).get_field(69).choices), 255)
+        form = Form.objects.create(
+            owner=field.form.owner, expiration_date=field.form.expiration_date
+        )
+        self.assertGreater(form.pk, 2)
+
+    def test_benchmark_validation_checks_values(self):
+        rules = {"bad_regex": ({"regex": "^[0-9]+$"}, "Ada")}
+        with mock.patch.dict(HOT_RULES, rules, clear=True):
+            with self.assertRaisesMessage(CommandError, "bad_regex: 'Ada' is invalid"):
+                call_command("benchmark_validation", number=1, stdout=io.StringIO())
+
+
+class InstrumentationTests(FormTestCase):
+    field_count = 3
+
+    def setUp(self):
+        cache.clear()
+        metrics_registry.reset()
+
+    def test_server_timing(self):
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(self.form.get_absolute_url())
+        timing = response["Server-Timing"]
+        self.assertIn(f'desc="{len(queries)} queries"', timing)
+        self.assertIn("template;dur=", timing)
+        self.assertIn('cache;desc="1 hits, 4 misses"', timing)
+
+    async def test_server_timing_async(self):
+        field = await self.form.fields.afirst()
+        response = await self.async_client.get(get_components_url(fields=[field]))
+        self.assertIn("db;dur=", response["Server-Timing"])
+
+    def test_metrics(self):
+        self.client.get(self.form.get_absolute_url())
+        self.assertEqual(self.client.get(reverse("metrics")).status_code, 403)
+        with self.settings(FORMS_METRICS_TOKEN="secret"):
+            response = self.client.get(
+                reverse("metrics"), headers={"Authorization": "Bearer secret"}
+            )
+        self.assertEqual(response.status_code, 200)
+        body = response.content.decode()
+        self.assertIn(
+            'formi_requests_total{view="form_detail",method="GET",status="200"} 1',
+            body,
+        )
+        self.assertIn(
+            'formi_request_duration_seconds_count{view="form_detail"} 1', body
+        )
+        self.assertIn(
+            'formi_cache_requests_total{view="form_detail",cache="fragment",'
+            'result="miss"} 3',
+            body,
+        )
+
+    def test_slow_request_log(self):
+        with self.settings(FORMS_SLOW_REQUEST_MS=0):
+            with self.assertLogs("forms.instrumentation", "WARNING") as logs:
+                self.client.get(self.form.get_absolute_url())
+        self.assertIn("(form_detail)", logs.output[0])
+        self.assertIn('FROM "forms_formfield"', logs.output[0])
+
+
+class ProfilingTests(FormTestCase):
+    field_count = 3
+
+    def test_sampler_collapses_stacks(self):
+        def busy_profiled_work():
+            end = time.perf_counter() + 0.05
+            while time.perf_counter() < end:
+                pass
+
+        sampler = StackSampler(threading.get_ident(), interval=0.001)
+        sampler.start()
+        busy_profiled_work()
+        sampler.stop()
+        stacks = list(parse_collapsed(sampler.collapse()))
+        self.assertEqual(sum(c for _, c in stacks), sum(sampler.stacks.values()))
+        self.assertTrue(any("busy_profiled_work" in s[-1] for s, _ in stacks))
+
+    def test_triggers(self):
+        url = self.form.get_absolute_url()
+        self.client.get(url)
+        self.client.get(url, headers={"X-Formi-Profile": "forged"})
+        self.client.get(
+            reverse("home"), headers={"X-Formi-Profile": get_profile_token()}
+        )
+        self.assertFalse(RequestProfile.objects.exists())
+
+        self.client.get(url, headers={"X-Formi-Profile": get_profile_token()})
+        with self.settings(FORMS_PROFILE_SAMPLE_RATE=1):
+            self.client.get(url)
+        profiles = RequestProfile.objects.order_by("pk")
+        self.assertEqual(
+            [(p.view_name, p.trigger, p.status_code) for p in profiles],
+            [("form_detail", "header", 200), ("form_detail", "sample", 200)],
+        )
+
+    @override_settings(FORMS_PROFILE_SAMPLE_RATE=1)
+    def test_other_views_are_not_sampled(self):
+        with mock.patch("forms.profiling.StackSampler") as sampler:
+            self.client.get(reverse("home"))
+            self.client.get(reverse("metrics"))
+            self.client.get(reverse("admin:index"))
+            self.client.get("/missing/")
+        sampler.assert_not_called()
+        self.assertFalse(RequestProfile.objects.exists())
+
+    def test_admin(self):
+        admin = get_user_model().objects.create_superuser("admin")
+        self.client.force_login(admin)
+        changelist = reverse("admin:forms_requestprofile_changelist")
+        self.assertContains(self.client.get(changelist), "Profile my requests")
+        self.client.post(reverse("admin:forms_requestprofile_toggle"))
+        self.assertContains(self.client.get(changelist), "Stop profiling")
+
+        self.client.get(self.form.get_absolute_url())
+        profile = RequestProfile.objects.get()
+        self.assertEqual(profile.trigger, "cookie")
+        response = self.client.get(
+            reverse("admin:forms_requestprofile_speedscope", args=[profile.pk])
+        )
+        document = json.loads(response.content)
+        self.assertEqual(document["profiles"][0]["type"], "sampled")
+        self.assertEqual(
+            len(document["profiles"][0]["samples"]), len(profile.stacks.splitlines())
+        )
+        response = self.client.get(
+            reverse("admin:forms_requestprofile_change", args=[profile.pk])
+        )
+        self.assertEqual(response.status_code, 200)
+
+    @override_settings(FORMS_PROFILE_RETENTION_DAYS=7)
+    def test_purge_profiles(self):
+        with self.settings(FORMS_PROFILE_SAMPLE_RATE=1):
+            self.client.get(self.form.get_absolute_url())
+            self.client.get(self.form.get_absolute_url())
+        old, new = RequestProfile.objects.order_by("pk")
+        RequestProfile.objects.filter(pk=old.pk).update(
+            created_at=timezone.now() - timedelta(days=8)
+        )
+        out = io.StringIO()
+        call_command("purge_profiles", stdout=out)
+        self.assertEqual(out.getvalue(), "Purged 1 profiles\n")
+        self.assertQuerySetEqual(RequestProfile.objects.all(), [new])
+
+
+class TrickleStream(io.BytesIO):
+    """Returns at most a few bytes per read, like a slow upload."""
+
+    def read(self, size=-1):
+        return super().read(5)
+
+
+class DefinitionTests(FormTestCase):
+    field_count = 6
+
+    @classmethod
+    def setUpTestData(cls):
+        super().setUpTestData()
+        source, target = cls.form.fields.order_by("pk")[:2]
+        target.conditional_logic = {"rules": [{"field": source.pk, "value": "0"}]}
+        target.save()
+        FieldChoice.objects.filter(value="0").update(label="Café")
+
+    def export(self, export_format="ndjson"):
+        write, _ = DEFINITION_FORMATS[export_format]
+        records = iter_definition_records(Form.objects.filter(pk=self.form.pk))
+        return "".join(write(records)).encode()
+
+    def assertImported(self, pk):
+        form = Form.objects.get(pk=pk)
+        get_fields = lambda f: [  # noqa: E731
+            (x.field_type.key, x.group and x.group.key, x.get_choices(), x.order)
+            for x in f.fields.order_by("pk")
+        ]
+        self.assertEqual(get_fields(form), get_fields(self.form))
+        source, target = form.fields.order_by("pk")[:2]
+        self.assertEqual(target.conditional_logic["rules"][0]["field"], source.pk)
+        self.assertEqual(get_form_schema(form).get_field(target.pk).label, "Char")
+
+    def test_round_trip(self):
+        choices = FieldChoice.objects.count()
+        for export_format in DEFINITION_FORMATS:
+            with self.subTest(format=export_format):
+                document = self.export(export_format)
+                [pk] = import_definitions(TrickleStream(document), self.owner)
+                self.assertImported(pk)
+        # Choices are matched by (label, value) rather than duplicated.
+        self.assertEqual(FieldChoice.objects.count(), choices)
+
+    def test_import_queries_do_not_grow_with_forms(self):
+        header, *records = self.export().decode().splitlines(keepends=True)
+        for count in (1, 10):
+            document = (header + "".join(records[:-1]) + records[-1] * count).encode()
+            with self.subTest(forms=count), self.assertNumQueries(9):
+                import_definitions(io.BytesIO(document), self.owner)
+
+    def test_invalid_document_imports_nothing(self):
+        document = self.export().replace(
+            b'"field_type": "select"', b'"field_type": "x"'
+        )
+        forms = Form.objects.count()
+        for document, message in (
+            (document, "Unknown field types: x"),
+            (b'{"type": "form"}', "Expected a formi.definitions header"),
+            (b'[{"type": "formi.definitions", "version": 1}, {', "Invalid JSON"),
+            (
+                self.export().replace(b'"field": 1,', b'"field": 99,'),
+                "refers to an unknown ref 99",
+            ),
+            (
+                self.export().replace(b'"value": "0"}', b'"operator": "$x"}'),
+                "Unknown conditional logic operator",
+            ),
+            (
+                self.export().replace(
+                    b'"validations": {}', b'"validations": {"min_length": "3"}', 1
+                ),
+                "Invalid validations of field 1",
+            ),
+        ):
+            with self.subTest(message=message):
+                with self.assertRaisesMessage(DefinitionError, message):
+                    import_definitions(io.BytesIO(document), self.owner)
+        self.assertEqual(Form.objects.count(), forms)
+
+    def test_view(self):
+        url = reverse("form_definitions")
+        self.assertEqual(self.client.get(url).status_code, 403)
+        self.client.force_login(self.owner)
+        response = self.client.get(url, {"format": "json"})
+        self.assertTrue(response.is_async)
+        document = read_stream(response)
+        self.assertEqual(json.loads(document)[-1]["title"], self.form.title)
+        response = self.client.post(url, document, content_type="application/json")
+        self.assertEqual(response.status_code, 201)
+        self.assertImported(response.json()["forms"][0])
+        response = self.client.post(url, b"[", content_type="application/json")
+        self.assertEqual(response.status_code, 400)
+
+    def test_only_staff_update_field_types(self):
+        url = reverse("form_definitions")
+        header = {"type": "formi.definitions", "version": 1}
+        field_type = {"type": "field_type", "key": "char", "default_label": "Text"}
+        document = "\n".join(map(json.dumps, [header, field_type]))
+        self.client.force_login(self.owner)
+        response = self.client.post(url, document, content_type="application/x-ndjson")
+        self.assertEqual(response.status_code, 201)
+        self.assertEqual(FieldType.objects.get(key="char").default_label, "Char")
+
+        new_type = {**field_type, "key": "new"}
+        document = "\n".join(map(json.dumps, [header, new_type]))
+        response = self.client.post(url, document, content_type="application/x-ndjson")
+        self.assertEqual(response.status_code, 400)
+        self.assertFalse(FieldType.objects.filter(key="new").exists())
+
+        self.owner.is_staff = True
+        self.owner.save()
+        document = "\n".join(map(json.dumps, [header, field_type]))
+        self.client.post(url, document, content_type="application/x-ndjson")
+        self.assertEqual(FieldType.objects.get(key="char").default_label, "Text")
+
+
+class ChoiceSetTests(FormTestCase):
+    field_count = 6
+
+    @classmethod
+    def setUpTestData(cls):
+        super().setUpTestData()
+        cls.choice_set = ChoiceSet.objects.create(key="countries", label="Countries")
+        ChoiceSetMembership.objects.bulk_create(
+            ChoiceSetMembership(
+                choice_set=cls.choice_set,
+                choice=FieldChoice.objects.create(label=f"Country {i}", value=f"c{i}"),
+                order=i,
+            )
+            for i in range(30)
+        )
+        cls.fields = list(cls.form.fields.filter(field_type__key="select"))
+        for field in cls.fields:
+            field.choice_set = cls.choice_set
+            field.save()
+
+    def setUp(self):
+        cache.clear()
+
+    def test_fields_share_the_set(self):
+        response = self.client.get(self.form.get_absolute_url())
+        self.assertContains(response, '<option value="c29">Country 29</option>', 2)
+        self.assertNotContains(response, "type to search")
+        validator = compile_field_validator(
+            get_form_schema(self.form).get_field(self.fields[0].pk)
+        )
+        self.assertEqual(validator("c3"), [])
+        self.assertTrue(validator("0"))
+
+    @override_settings(FORMS_CHOICE_SET_INLINE_LIMIT=10, FORMS_CHOICE_SET_PAGE_SIZE=5)
+    def test_lazy_typeahead(self):
+        response = self.client.get(self.form.get_absolute_url())
+        self.assertContains(response, "25 more, type to search", 2)
+        self.assertNotContains(response, "Country 5<")
+        url = reverse("choice_set_options", kwargs={"pk": self.choice_set.pk})
+        self.assertContains(response, f'hx-get="{url}?v=1"')
+
+        response = self.client.get(url, {"q": "country 1", "v": 1})
+        self.assertContains(response, "<option", 5)
+        self.assertIn("public", response["Cache-Control"])
+        response = self.client.get(url, {"q": "country 1", "page": 2, "format": "json"})
+        self.assertEqual(
+            response.json(),
+            {
+                "results": [[f"c1{i}", f"Country 1{i}"] for i in range(4, 9)],
+                "page": 2,
+                "has_next": True,
+            },
+        )
+        self.assertIn("no-cache", response["Cache-Control"])
+
+    def test_membership_change_bumps_versions(self):
+        schema_version = Form.objects.get(pk=self.form.pk).schema_version
+        get_form_schema(self.form)
+        ChoiceSetMembership.objects.create(
+            choice_set=self.choice_set,
+            choice=FieldChoice.objects.create(label="Atlantis", value="at"),
+            order=30,
+        )
+        self.choice_set.refresh_from_db()
+        self.assertEqual(self.choice_set.version, 2)
+        form = Form.objects.get(pk=self.form.pk)
+        self.assertEqual(form.schema_version, schema_version + 1)
+        field = get_form_schema(form).get_field(self.fields[0].pk)
+        self.assertEqual(field.get_choices()[-1], ("at", "Atlantis"))
+
+    def test_consolidate(self):
+        other = create_form(self.owner, 6)
+        fields = list(other.fields.filter(field_type__key="select"))
+        choices = fields[0].get_choices()
+        FormField.objects.filter(pk__in=[f.pk for f in self.fields]).update(
+            choice_set=None
+        )
+        [choice_set] = consolidate_choice_sets(min_fields=2, min_size=5)
+        self.assertEqual(choice_set.fields.count(), 4)
+        self.assertFalse(FormFieldChoiceMembership.objects.exists())
+        # The other form's copies of the same five choices were deleted.
+        self.assertEqual(FieldChoice.objects.count(), 35)
+        for field in FormField.objects.filter(pk__in=[f.pk for f in fields]):
+            self.assertEqual(field.get_choices(), choices)
+
+    def test_definitions_round_trip(self):
+        write, _ = DEFINITION_FORMATS["ndjson"]
+        document = "".join(
+            write(iter_definition_records(Form.objects.filter(pk=self.form.pk)))
+        )
+        self.assertIn('"type": "choice_set", "key": "countries"', document)
+        [pk] = import_definitions(
+            io.BytesIO(document.encode()), self.owner, update_shared=True
+        )
+        self.assertEqual(
+            Form.objects.get(pk=pk).fields.filter(choice_set=self.choice_set).count(),
+            len(self.fields),
+        )
+        self.choice_set.refresh_from_db()
+        self.assertEqual(self.choice_set.version, 1)
+
+
+class ResponseStorageTests(FormTestCase):
+    field_count = 4
+
+    @classmethod
+    def setUpTestData(cls):
+        super().setUpTestData()
+        cls.fields = list(cls.form.fields.order_by("pk"))
+        ingest_submissions(
+            cls.form,
+            cls.owner,
+            [{str(f.pk): str(n) for f in cls.fields[: n + 1]} for n in range(3)],
+        )
+
+    def test_convert(self):
+        expected = list(iter_responses(self.form))
+        response = FormResponse.objects.select_related("form").last()
+        answers = get_answers(response)
+        self.assertEqual(len(answers), 3)
+
+        convert_response_storage(self.form, Form.DOCUMENT)
+        self.assertFalse(FormFieldResponse.objects.exists())
+        self.assertEqual(list(iter_responses(self.form)), expected)
+        response = FormResponse.objects.select_related("form").get(pk=response.pk)
+        with self.assertNumQueries(0):
+            self.assertEqual(get_answers(response), answers)
+
+        convert_response_storage(self.form, Form.ROWS)
+        self.assertEqual(FormFieldResponse.objects.count(), 6)
+        self.assertFalse(FormResponse.objects.filter(answers__isnull=False).exists())
+        self.assertEqual(list(iter_responses(self.form)), expected)
+
+    def test_document_submission_is_one_insert(self):
+        convert_response_storage(self.form, Form.DOCUMENT)
+        with CaptureQueriesContext(connection) as queries:
+            ingest_submissions(self.form, self.owner, [{str(self.fields[1].pk): "9"}])
+        inserts = [q for q in queries if q["sql"].lstrip().startswith("INSERT")]
+        self.assertEqual(len(inserts), 1 + 1)  # The response and its roll-up.
+
+    def test_filter_by_answer(self):
+        field = self.fields[1]
+        responses = FormResponse.objects.filter(form=self.form)
+        expected = list(filter_by_answer(responses, self.form, field.pk, "1"))
+        self.assertEqual(len(expected), 1)
+        convert_response_storage(self.form, Form.DOCUMENT)
+        queryset = filter_by_answer(responses, self.form, field.pk, "1")
+        self.assertEqual(list(queryset), expected)
+
+        with connection.cursor() as cursor:
+            cursor.execute("SET CONSTRAINTS ALL IMMEDIATE")
+            cursor.execute("SET LOCAL enable_seqscan = off")
+        with connection.schema_editor() as editor:
+            editor.add_index(FormResponse, get_answer_index(field))
+        plan = queryset.explain()
+        self.assertIn(f"Index Cond: ((answers -> '{field.pk}'::text)", plan)
+        self.assertNotIn("Seq Scan", plan)
+
+
+class PartitionTests(FormTestCase):
+    field_count = 1
+
+    def get_partition(self, response):
+        with connection.cursor() as cursor:
+            cursor.execute(
+                "SELECT tableoid::regclass::text FROM forms_formresponse WHERE id = %s",
+                [response.pk],
+            )
+            return cursor.fetchone()[0]
+
+    def test_create_and_drop_partitions(self):
+        month = timezone.now().replace(year=2040, month=1, day=15)
+        response = FormResponse.objects.create(form=self.form, user=self.owner)
+        FormResponse.objects.filter(pk=response.pk).update(created_at=month)
+        self.assertEqual(self.get_partition(response), "forms_formresponse_default")
+
+        with connection.cursor() as cursor:
+            cursor.execute("SET CONSTRAINTS ALL IMMEDIATE")
+        created = create_partitions([FormResponse], months_ahead=1, now=month)
+        self.assertEqual(
+            created, ["forms_formresponse_p204001", "forms_formresponse_p204002"]
+        )
+        self.assertEqual(self.get_partition(response), "forms_formresponse_p204001")
+        self.assertEqual(create_partitions([FormResponse], 1, now=month), [])
+
+        end = month.replace(month=3, day=1)
+        self.assertNotIn(
+            "forms_formresponse_p204001", drop_empty_partitions([FormResponse], end)
+        )
+        response.delete()
+        self.assertIn(
+            "forms_formresponse_p204001", drop_empty_partitions([FormResponse], end)
+        )
+
+    def test_answers_share_their_response_partition(self):
+        response = FormResponse.objects.create(form=self.form, user=self.owner)
+        response.created_at -= timedelta(days=40)
+        FormResponse.objects.filter(pk=response.pk).update(
+            created_at=response.created_at
+        )
+        field = self.form.fields.get()
+        answer = FormFieldResponse.objects.create(
+            response=response, field=field, value="1"
+        )
+        self.assertEqual(answer.created_at, response.created_at)
+        with self.assertRaises(IntegrityError), transaction.atomic():
+            FormFieldResponse.objects.create(response=response, field=field, value="2")
+        # Bulk inserts skip save(), so they must name it.
+        with self.assertRaises(IntegrityError), transaction.atomic():
+            FormFieldResponse.objects.bulk_create(
+                [FormFieldResponse(response=response, field=field, value="3")]
+            )
+
+    def test_table_size_counts_partitions(self):
+        with connection.cursor() as cursor:
+            cursor.execute("SELECT pg_total_relation_size('forms_formresponse')")
+            self.assertEqual(cursor.fetchone()[0], 0)
+        before = get_table_size()
+        self.assertGreater(before, 0)
+        FormResponse.objects.bulk_create(
+            FormResponse(form=self.form, user=self.owner) for _ in range(500)
+        )
+        self.assertGreater(get_table_size(), before)
+
+
+class ArchiveTests(FormTestCase):
+    field_count = 3
+
+    @classmethod
+    def setUpTestData(cls):
+        super().setUpTestData()
+        cls.form.expiration_date = timezone.now() - timedelta(days=30)
+        cls.form.save()
+        fields = list(cls.form.fields.order_by("pk"))
+        FormResponse.objects.bulk_create(
+            FormResponse(form=cls.form, user=cls.owner) for _ in range(5)
+        )
+        FormFieldResponse.objects.bulk_create(
+            FormFieldResponse(
+                response=response,
+                field=field,
+                value=[n, "x"] if n % 2 else str(n),
+                created_at=response.created_at,
+            )
+            for n, response in enumerate(FormResponse.objects.order_by("pk"))
+            for field in fields[: n % 3 + 1]
+        )
+        rebuild_field_summaries(cls.form)
+
+    @override_settings(FORMS_ARCHIVE_ROW_GROUP_SIZE=2)
+    def test_export_reads_archive(self):
+        expected = list(iter_responses(self.form))
+        summary = get_form_summary(self.form)
+        self.assertEqual(archive_form(self.form), 5)
+        self.form.refresh_from_db()
+        self.assertIsNotNone(self.form.archived_at)
+        self.assertFalse(FormResponse.objects.filter(form=self.form).exists())
+        self.assertFalse(FormFieldResponse.objects.exists())
+        self.assertEqual(list(iter_responses(self.form)), expected)
+        groups = ArchivedRowGroup.objects.filter(form=self.form).order_by("index")
+        self.assertEqual([g.response_count for g in groups], [2, 2, 1])
+        rebuild_field_summaries(self.form)
+        self.assertEqual(get_form_summary(self.form), summary)
+        self.assertEqual(archive_form(self.form), 0)
+
+    def test_command(self):
+        out = io.StringIO()
+        call_command("archive_responses", retention_days=60, stdout=out)
+        self.assertEqual(out.getvalue(), "")
+        call_command("archive_responses", retention_days=7, dry_run=True, stdout=out)
+        self.assertIn("Would archive", out.getvalue())
+        self.assertFalse(ArchivedRowGroup.objects.exists())
+        with connection.cursor() as cursor:
+            cursor.execute("SET CONSTRAINTS ALL IMMEDIATE")
+        call_command("archive_responses", retention_days=7, stdout=out)
+        self.assertIn("Archived 5 responses", out.getvalue())
+        self.assertTrue(ArchivedRowGroup.objects.filter(form=self.form).exists())
+
+
+class TaskQueueTests(FormTestCase):
+    field_count = 1
+
+    @classmethod
+    def setUpTestData(cls):
+        super().setUpTestData()
+        # The metrics view is staff only.
+        cls.owner.is_staff = True
+        cls.owner.save()
+        cls.field = cls.form.fields.get()
+
+    def submit(self, value):
+        return ingest_submissions(self.form, self.owner, [{str(self.field.pk): value}])
+
+    def test_summary_rollups_are_batched(self):
+        (first,) = self.submit("1")
+        (second,) = self.submit("2")
+        task = QueuedTask.objects.get()
+        self.assertEqual(task.kwargs, {"response_ids": [first.pk, second.pk]})
+        self.assertFalse(get_form_summary(self.form))
+
+        run_queued_tasks()
+        summary = get_form_summary(self.form)[self.field.pk]
+        self.assertEqual(summary["choices"], {"1": 1, "2": 1})
+        task.refresh_from_db()
+        self.assertEqual(task.status, TaskResultStatus.SUCCESSFUL)
+        self.assertEqual(task.return_value, 2)
+
+        # The roll-up is no longer waiting: the next one is a task of its own.
+        self.submit("3")
+        self.assertEqual(QueuedTask.objects.count(), 2)
+
+    def test_summary_rollups_count_responses_once(self):
+        (response,) = self.submit("1")
+        run_queued_tasks()
+        summary = get_form_summary(self.form)
+        self.assertEqual(summary[self.field.pk]["choices"], {"1": 1})
+
+        # As if the worker died after the roll-up committed, before the task
+        # was marked finished.
+        task = QueuedTask.objects.get()
+        task.status = TaskResultStatus.READY
+        task.save()
+        run_queued_tasks()
+        task.refresh_from_db()
+        self.assertEqual(task.return_value, 0)
+        self.assertEqual(get_form_summary(self.form), summary)
+
+        # A roll-up still queued when the summaries are rebuilt.
+        enqueue_summary_update(self.form, [response.pk])
+        rebuild_field_summaries(self.form)
+        run_queued_tasks()
+        self.assertEqual(get_form_summary(self.form), summary)
+
+    @override_settings(FORMS_TASK_MAX_ATTEMPTS=2, FORMS_TASK_RETRY_DELAY=10)
+    def test_retry_with_backoff(self):
+        result = failing_task.enqueue("boom")
+        (row,) = claim_tasks("worker", ["default"])
+        start = timezone.now()
+        with self.assertLogs("forms.queue", "WARNING"):
+            run_task(row, task_backends["default"])
+        result.refresh()
+        self.assertEqual(result.status, TaskResultStatus.READY)
+        self.assertEqual(result.errors[0].exception_class, ValueError)
+        row.refresh_from_db()
+        self.assertGreaterEqual(row.run_after, start + timedelta(seconds=10))
+        self.assertEqual(claim_tasks("worker", ["default"]), [])
+
+        run_queued_tasks()
+        result.refresh()
+        self.assertEqual(result.status, TaskResultStatus.FAILED)
+        self.assertEqual(result.attempts, 2)
+
+    @override_settings(FORMS_TASK_TIMEOUT=0.03)
+    def test_running_tasks_are_touched(self):
+        task_touched.clear()
+        result = waiting_task.enqueue()
+        (row,) = claim_tasks("worker", ["default"])
+        # The heartbeat's own connection can't see the test's uncommitted rows.
+        with mock.patch(
+            "forms.queue.touch_task", side_effect=lambda pk: task_touched.set()
+        ) as touch:
+            run_task(row, task_backends["default"])
+        touch.assert_called_with(row.pk)
+        result.refresh()
+        self.assertIs(result.return_value, True)
+
+        # A touched task isn't taken for one its worker left behind.
+        failing_task.enqueue("boom")
+        (row,) = claim_tasks("worker", ["default"])
+        QueuedTask.objects.filter(pk=row.pk).update(
+            last_attempted_at=timezone.now() - timedelta(hours=1)
+        )
+        touch_task(row.pk)
+        self.assertEqual(requeue_stalled_tasks(timeout=600), 0)
+        QueuedTask.objects.filter(pk=row.pk).update(
+            last_attempted_at=timezone.now() - timedelta(hours=1)
+        )
+        self.assertEqual(requeue_stalled_tasks(timeout=600), 1)
+
+    def test_queue_depth_metric(self):
+        self.submit("1")
+        failing_task.enqueue("boom")
+        self.assertEqual(get_queue_depth()["default", "READY"][0], 2)
+        self.client.force_login(self.owner)
+        response = self.client.get(reverse("metrics"))
+        self.assertIn(
+            'formi_task_queue_depth{queue="default",status="READY"} 2',
+            response.content.decode(),
+        )
+
+    def test_run_tasks_command(self):
+        result = failing_task.using(priority=1).enqueue("boom")
+        self.submit("1")
+        QueuedTask.objects.update(run_after=timezone.now())
+        out = io.StringIO()
+        # The test's connection holds its transaction open.
+        with (
+            mock.patch("forms.management.commands.run_tasks.close_old_connections"),
+            mock.patch(
+                "forms.management.commands.run_tasks.create_partitions",
+                return_value=["forms_formresponse_p204001"],
+            ) as partitions,
+        ):
+            call_command("run_tasks", once=True, stdout=out)
+        lines = out.getvalue().splitlines()[1:]
+        self.assertEqual(
+            lines,
+            [
+                "Created forms_formresponse_p204001",
+                f"forms.tests.failing_task {result.id}: READY",
+                f"forms.tasks.update_form_summaries {int(result.id) + 1}: SUCCESSFUL",
+            ],
+        )
+        partitions.assert_called_once_with((FormResponse, FormFieldResponse))
+
+
+@override_settings(FORMS_UPLOAD_CHUNK_SIZE=8)
+class UploadTests(FormTestCase):
+    field_count = 1
+    png = b"\x89PNG\r\n\x1a\n" + bytes(range(12))
+
+    @classmethod
+    def setUpTestData(cls):
+        super().setUpTestData()
+        cls.fields = {
+            key: FormField.objects.create(
+                form=cls.form,
+                field_type=FieldType.objects.create(
+                    key=key, description=key, default_label=key
+                ),
+                validations={"max_size": 100} if key == "image" else {},
+            )
+            for key in ("image", "signature")
+        }
+        cls.form.refresh_from_db()
+
+    def setUp(self):
+        upload_dir = tempfile.TemporaryDirectory()
+        self.addCleanup(upload_dir.cleanup)
+        settings_override = override_settings(FORMS_UPLOAD_DIR=upload_dir.name)
+        settings_override.enable()
+        self.addCleanup(settings_override.disable)
+        # Previews render in the test's thread, which can see its rows.
+        schedule = mock.patch(
+            "forms.uploads.schedule_preview", side_effect=render_preview
+        )
+        self.schedule_preview = schedule.start()
+        self.addCleanup(schedule.stop)
+        view_schedule = mock.patch(
+            "forms.views.schedule_preview", self.schedule_preview
+        )
+        view_schedule.start()
+        self.addCleanup(view_schedule.stop)
+        self.client.force_login(self.owner)
+
+    def create(self, key, **meta):
+        url = reverse("field_upload_create", kwargs={"pk": self.fields[key].pk})
+        return self.client.post(url, meta, content_type="application/json")
+
+    def send(self, url, offset, chunk, checksum=None):
+        headers = {"Upload-Offset": str(offset)}
+        if checksum:
+            headers["Upload-Checksum"] = f"sha256 {checksum}"
+        with self.captureOnCommitCallbacks(execute=True):
+            return self.client.patch(
+                url,
+                chunk,
+                content_type="application/offset+octet-stream",
+                headers=headers,
+            )
+
+    def upload(self, key, data, content_type):
+        meta = {"filename": "f", "size": len(data), "content_type": content_type}
+        url = self.create(key, **meta).json()["url"]
+        for offset in range(0, len(data), 8):
+            self.send(url, offset, data[offset : offset + 8])
+        return Upload.objects.get(pk=url.rsplit("/", 1)[1])
+
+    @mock.patch("forms.uploads.Image", None)
+    def test_resumable_upload(self):
+        response = self.create(
+            "image",
+            filename="photo.png",
+            size=len(self.png),
+            content_type="image/png",
+            sha256=hashlib.sha256(self.png).hexdigest(),
+        )
+        self.assertEqual(response.status_code, 201)
+        url = response.json()["url"]
+        self.assertEqual(self.send(url, 0, self.png[:8]).status_code, 200)
+        # A chunk sent twice, or out of order, is refused.
+        self.assertEqual(self.send(url, 0, self.png[:8]).status_code, 409)
+        self.assertEqual(self.client.get(url)["Upload-Offset"], "8")
+
+        digest = base64.b64encode(hashlib.sha256(b"corrupt!").digest()).decode()
+        response = self.send(url, 8, self.png[8:16], checksum=digest)
+        self.assertEqual(response.status_code, 460)
+        self.assertEqual(response["Upload-Offset"], "8")
+
+        digest = base64.b64encode(hashlib.sha256(self.png[8:16]).digest()).decode()
+        self.send(url, 8, self.png[8:16], checksum=digest)
+        response = self.send(url, 16, self.png[16:])
+        self.assertEqual(response.json()["state"], "processing")
+        self.assertEqual(self.client.get(url).json()["state"], "processed")
+        upload = Upload.objects.get()
+        self.assertEqual(get_upload_path(upload).read_bytes(), self.png)
+        self.assertEqual(self.send(url, 20, b"x").status_code, 409)
+
+        field_pk = str(self.fields["image"].pk)
+        with self.assertRaises(SubmissionError) as cm:
+            ingest_submissions(self.form, self.owner, [{field_pk: str(uuid.uuid4())}])
+        self.assertEqual(
+            cm.exception.errors, {0: {field_pk: ["Upload the file first."]}}
+        )
+        ingest_submissions(self.form, self.owner, [{field_pk: str(upload.pk)}])
+
+    def test_checksum_mismatch_fails_upload(self):
+        meta = {"filename": "f.png", "size": 8, "content_type": "image/png"}
+        url = self.create("image", **meta, sha256="0" * 64).json()["url"]
+        self.assertEqual(self.send(url, 0, self.png[:8]).json()["state"], "failed")
+        upload = Upload.objects.get()
+        self.assertFalse(get_upload_path(upload).exists())
+        field_pk = str(self.fields["image"].pk)
+        with self.assertRaises(SubmissionError):
+            ingest_submissions(self.form, self.owner, [{field_pk: str(upload.pk)}])
+
+    def test_requests_are_routed_to_the_machine_holding_the_file(self):
+        meta = {"filename": "f.png", "size": 20, "content_type": "image/png"}
+        with override_settings(FORMS_MACHINE_ID="a"):
+            response = self.create("image", **meta)
+        self.assertEqual(response.json()["instance"], "a")
+        url = response.json()["url"]
+        with override_settings(FORMS_MACHINE_ID="b"):
+            response = self.send(url, 0, self.png[:8])
+        self.assertEqual(response.status_code, 421)
+        self.assertEqual(response["fly-replay"], "instance=a")
+        self.assertEqual(Upload.objects.get().offset, 0)
+
+    def test_chunk_limit_checked_before_body(self):
+        async def app(scope, receive, send):
+            await send({"type": "http.response.start", "status": 200})
+
+        async def receive():
+            raise AssertionError("The body was read.")
+
+        def call(path, headers):
+            sent = []
+
+            async def send(message):
+                sent.append(message)
+
+            scope = {
+                "type": "http",
+                "method": "PATCH",
+                "path": path,
+                "headers": headers,
+            }
+            async_to_sync(UploadLimitMiddleware(app))(scope, receive, send)
+            return sent[0]["status"]
+
+        url = reverse("upload", kwargs={"pk": uuid.uuid4()})
+        self.assertEqual(call(url, [(b"content-length", b"9")]), 413)
+        self.assertEqual(call(url, []), 411)
+        self.assertEqual(call(url, [(b"content-length", b"8")]), 200)
+        self.assertEqual(call(reverse("form_definitions"), []), 200)
+
+    def test_limits(self):
+        meta = {"filename": "photo.png", "size": 20, "content_type": "image/png"}
+        self.assertEqual(self.create("image", **{**meta, "size": 101}).status_code, 413)
+        response = self.create("image", **{**meta, "content_type": "text/html"})
+        self.assertEqual(response.status_code, 415)
+        url = self.create("image", **meta).json()["url"]
+        self.assertEqual(self.send(url, 0, b"GIF89a..").status_code, 415)
+        self.assertEqual(self.send(url, 0, self.png[:9]).status_code, 413)
+        self.assertFalse(get_upload_path(Upload.objects.get()).read_bytes())
+
+        select = self.form.fields.get(field_type__key="select")
+        url = reverse("field_upload_create", kwargs={"pk": select.pk})
+        response = self.client.post(url, meta, content_type="application/json")
+        self.assertEqual(response.status_code, 400)
+
+        self.client.logout()
+        self.assertEqual(self.create("image", **meta).status_code, 403)
+
+    def test_signature_preview(self):
+        strokes = {"width": 40, "height": 20, "strokes": [[[2, 2], [30, 15]]]}
+        upload = self.upload(
+            "signature", json.dumps(strokes).encode(), "application/json"
+        )
+        self.assertEqual(upload.state, Upload.PROCESSED)
+        png = get_upload_path(upload, SIGNATURE_SUFFIX).read_bytes()
+        self.assertEqual(png[:8], self.png[:8])
+        self.assertEqual(png[16:24], (40).to_bytes(4) + (20).to_bytes(4))
+
+        broken = self.upload("signature", b'{"strokes": 1}', "application/json")
+        self.assertEqual(broken.state, Upload.FAILED)
+        self.assertFalse(get_upload_path(broken).exists())
+
+    def test_previews_render_after_the_last_chunk(self):
+        # As if the process holding the file restarted before rendering it.
+        self.schedule_preview.side_effect = None
+        strokes = {"width": 4, "height": 4, "strokes": [[[1, 1]]]}
+        upload = self.upload(
+            "signature", json.dumps(strokes).encode(), "application/json"
+        )
+        self.assertEqual(upload.state, Upload.PROCESSING)
+        self.schedule_preview.assert_called_once_with(upload.pk)
+        self.assertFalse(get_upload_path(upload, SIGNATURE_SUFFIX).exists())
+        field_pk = str(self.fields["signature"].pk)
+        with self.assertRaises(SubmissionError):
+            ingest_submissions(self.form, self.owner, [{field_pk: str(upload.pk)}])
+
+        # Polling the upload schedules it again.
+        self.schedule_preview.side_effect = render_preview
+        self.client.get(upload.get_absolute_url())
+        self.assertEqual(self.schedule_preview.call_count, 2)
+        upload.refresh_from_db()
+        self.assertEqual(upload.state, Upload.PROCESSED)
+        ingest_submissions(self.form, self.owner, [{field_pk: str(upload.pk)}])
+
+    def test_signature_limits(self):
+        meta = {"filename": "f", "size": 2**20, "content_type": "application/json"}
+        self.assertEqual(self.create("signature", **meta).status_code, 413)
+        strokes = {"width": 40, "height": 20, "strokes": [[[2, 2], [30, 15], [9, 9]]]}
+        with self.settings(FORMS_SIGNATURE_MAX_POINTS=2):
+            upload = self.upload(
+                "signature", json.dumps(strokes).encode(), "application/json"
+            )
+        self.assertEqual(upload.state, Upload.FAILED)
+        self.assertEqual(upload.error, "Signatures are limited to 2 points.")
+
+    def test_purge_command(self):
+        meta = {"filename": "photo.png", "size": 20, "content_type": "image/png"}
+        self.send(self.create("image", **meta).json()["url"], 0, self.png[:8])
+        stale = Upload.objects.get()
+        Upload.objects.filter(pk=stale.pk).update(
+            created_at=timezone.now() - timedelta(days=2)
+        )
+        out = io.StringIO()
+        call_command("purge_uploads", stdout=out)
+        self.assertIn("Purged 1 uploads", out.getvalue())
+        self.assertFalse(Upload.objects.exists())
+        self.assertFalse(get_upload_path(stale).exists())
@@ -0,0 +1,531 @@
+"""
+Chunked, resumable uploads for file, image and signature fields.
+
+A client creates an ``Upload`` with the file's name, size, content type and
+optionally its SHA-256, then sends the bytes in order as chunks of at most
+``FORMS_UPLOAD_CHUNK_SIZE``, each saying where it starts and optionally
+carrying its own checksum (the tus ``Upload-Offset`` and ``Upload-Checksum``
+headers). After an interruption the client asks for the offset and resumes
+there. Size and type limits from the field's validations (``max_size``,
+``allowed_types``) are checked when the upload is created, and the first
+chunk of an image must start with its type's signature.
+
+Django's ASGI handler spools a request body to a temporary file before any
+view runs, so ``UploadLimitMiddleware`` wraps the ASGI application and
+answers chunks whose ``Content-Length`` is missing or over the chunk size
+before their body is received; the server's HTTP parser won't deliver more
+than that length.
+
+Files live on the volume of the app machine that created the upload
+(``FORMS_UPLOAD_DIR``, ``FORMS_MACHINE_ID``): clients send each chunk with
+the ``fly-force-instance-id`` header the upload names, and a request that
+lands elsewhere is replayed to that machine. Chunks are streamed to disk
+``FORMS_UPLOAD_READ_SIZE`` bytes at a time, so memory stays bounded whatever
+the file size. The last chunk's request checks the whole file against its
+declared SHA-256. Previews, a thumbnail of images (with Pillow installed) or
+a PNG of signatures, which are uploaded as strokes of at most
+``FORMS_SIGNATURE_MAX_SIZE`` bytes and ``FORMS_SIGNATURE_MAX_POINTS`` points,
+are rendered once that commits, by a background thread of the machine
+holding the file. Only then is the upload processed and usable as an answer;
+clients poll its state meanwhile, which also reschedules a preview lost to a
+restart.
+"""
+
+import base64
+import hashlib
+import json
+import logging
+import os
+import struct
+import threading
+import zlib
+from concurrent.futures import ThreadPoolExecutor
+from fnmatch import fnmatch
+from itertools import pairwise
+from pathlib import Path
+
+from django.conf import settings
+from django.db import connection, transaction
+from django.db.utils import OperationalError
+from django.urls import Resolver404, resolve
+from django.utils import timezone
+
+from .models import Upload
+
+try:
+    from PIL import Image
+except ImportError:  # Optional: without Pillow, images get no thumbnail.
+    Image = None
+
+logger = logging.getLogger(__name__)
+
+UPLOAD_FIELD_TYPES = frozenset({"file", "image", "signature"})
+# Field types whose uploads get a preview rendered in the background.
+PREVIEW_FIELD_TYPES = frozenset({"image", "signature"})
+
+# Allowed content types of field types, unless the field sets allowed_types.
+DEFAULT_ALLOWED_TYPES = {
+    "image": ["image/png", "image/jpeg", "image/gif", "image/webp"],
+    "signature": ["application/json"],
+}
+
+# Leading bytes of the image types, checked on the first chunk.
+SIGNATURES = {
+    "image/png": (b"\x89PNG\r\n\x1a\n",),
+    "image/jpeg": (b"\xff\xd8\xff",),
+    "image/gif": (b"GIF87a", b"GIF89a"),
+    "image/webp": (b"RIFF",),
+}
+
+THUMBNAIL_SUFFIX = ".thumb.png"
+SIGNATURE_SUFFIX = ".png"
+
+
+class UploadError(Exception):
+    """Raised with the HTTP status and message for a rejected upload request."""
+
+    def __init__(self, message, status=400):
+        super().__init__(message)
+        self.message = message
+        self.status = status
+
+
+def get_upload_path(upload, suffix=""):
+    upload_dir = getattr(settings, "FORMS_UPLOAD_DIR", settings.BASE_DIR / "uploads")
+    name = upload.pk.hex
+    return Path(upload_dir) / name[:2] / f"{name}{suffix}"
+
+
+def get_chunk_size():
+    return getattr(settings, "FORMS_UPLOAD_CHUNK_SIZE", 8 * 2**20)
+
+
+def get_machine_id():
+    return getattr(settings, "FORMS_MACHINE_ID", "")
+
+
+def get_owner_machine(upload):
+    """The machine holding the file of ``upload``, if it isn't this one."""
+    if upload.machine_id and upload.machine_id != get_machine_id():
+        return upload.machine_id
+    return None
+
+
+def get_max_size(field):
+    """The largest upload ``field`` (a ``FieldSchema``) accepts, in bytes."""
+    default = getattr(settings, "FORMS_UPLOAD_MAX_SIZE", 100 * 2**20)
+    if field.key == "signature":
+        # Strokes are parsed and drawn whole, so they're kept small.
+        default = getattr(settings, "FORMS_SIGNATURE_MAX_SIZE", 256 * 2**10)
+    return min(field.validations.get("max_size") or default, default)
+
+
+def is_allowed_type(field, filename, content_type):
+    """
+    Whether ``allowed_types`` of ``field`` holds the content type, matching
+    patterns like ``image/*``, or the filename's extension, like ``pdf``.
+    """
+    allowed = field.validations.get("allowed_types") or DEFAULT_ALLOWED_TYPES.get(
+        field.key
+    )
+    extension = os.path.splitext(filename)[1].lstrip(".").lower()
+    return not allowed or any(
+        fnmatch(content_type, pattern) if "/" in pattern else pattern == extension
+        for pattern in allowed
+    )
+
+
+def create_upload(field, user, filename, size, content_type, sha256=""):
+    """
+    Start an upload of ``size`` bytes for ``field`` (a ``FieldSchema``),
+    raising UploadError if the field takes no uploads or the file breaks its
+    limits.
+    """
+    if field.key not in UPLOAD_FIELD_TYPES:
+        raise UploadError("This field doesn't take uploads.")
+    if not isinstance(filename, str) or not filename.strip():
+        raise UploadError("Expected a filename.")
+    if not isinstance(size, int) or isinstance(size, bool) or size < 1:
+        raise UploadError("Expected a positive size in bytes.")
+    if size > get_max_size(field):
+        raise UploadError(
+            f"Files are limited to {get_max_size(field)} bytes.", status=413
+        )
+    if not isinstance(content_type, str) or not is_allowed_type(
+        field, filename, content_type
+    ):
+        raise UploadError("This type of file isn't allowed.", status=415)
+    sha256 = sha256 or ""
+    if not isinstance(sha256, str) or (
+        sha256 and (len(sha256) != 64 or not set(sha256) <= set("0123456789abcdef"))
+    ):
+        raise UploadError("Expected sha256 as 64 lowercase hex digits.")
+    return Upload.objects.create(
+        field_id=field.pk,
+        user=user,
+        filename=os.path.basename(filename)[:255],
+        size=size,
+        content_type=content_type[:100],
+        sha256=sha256,
+        machine_id=get_machine_id(),
+    )
+
+
+def parse_checksum(header):
+    """The digest of a tus ``Upload-Checksum: sha256 <base64>`` header."""
+    if not header:
+        return None
+    algorithm, _, digest = header.partition(" ")
+    if algorithm != "sha256":
+        raise UploadError("Only sha256 chunk checksums are supported.")
+    try:
+        return base64.b64decode(digest, validate=True)
+    except ValueError:
+        raise UploadError("Invalid Upload-Checksum.") from None
+
+
+def check_signature(upload, head):
+    signatures = SIGNATURES.get(upload.content_type)
+    if signatures and not head.startswith(signatures):
+        raise UploadError(f"This isn't a {upload.content_type} file.", status=415)
+
+
+def write_chunk(upload, offset, length, stream, checksum=None):
+    """
+    Append ``length`` bytes read from ``stream`` at ``offset`` of ``upload``
+    and return it updated. The row stays locked while the chunk streams to
+    disk, so concurrent writers of an upload get a 409 instead of
+    interleaving. A short or corrupt chunk is cut off the file again.
+    """
+    if length is None:
+        raise UploadError("Chunks need a Content-Length.", status=411)
+    if length > get_chunk_size():
+        raise UploadError(f"Chunks are limited to {get_chunk_size()} bytes.", 413)
+    expected = parse_checksum(checksum)
+    with transaction.atomic():
+        try:
+            upload = (
+                Upload.objects.select_for_update(nowait=True, of=("self",))
+                .select_related("field__field_type")
+                .get(pk=upload.pk)
+            )
+        except OperationalError:
+            raise UploadError(
+                "Another chunk of this upload is being written.", 409
+            ) from None
+        if upload.state != Upload.UPLOADING:
+            raise UploadError("This upload is already complete.", status=409)
+        if offset != upload.offset:
+            raise UploadError(f"Expected the chunk at offset {upload.offset}.", 409)
+        if offset + length > upload.size:
+            raise UploadError("The chunk runs past the declared size.", status=413)
+
+        path = get_upload_path(upload)
+        path.parent.mkdir(parents=True, exist_ok=True)
+        digest = hashlib.sha256()
+        read_size = getattr(settings, "FORMS_UPLOAD_READ_SIZE", 64 * 2**10)
+        with open(path, "r+b" if offset else "wb") as file:
+            file.seek(offset)
+            file.truncate()
+            try:
+                received = 0
+                while received < length:
+                    data = stream.read(min(read_size, length - received))
+                    if not data:
+                        raise UploadError("The chunk ended early.")
+                    if offset == 0 and received == 0:
+                        check_signature(upload, data)
+                    digest.update(data)
+                    file.write(data)
+                    received += len(data)
+                if expected is not None and digest.digest() != expected:
+                    raise UploadError("The chunk's checksum doesn't match.", 460)
+            except BaseException:
+                file.truncate(offset)
+                raise
+
+        upload.offset += length
+        fields = ["offset"]
+        if upload.offset == upload.size:
+            upload.completed_at = timezone.now()
+            check_upload_file(upload)
+            fields += ["state", "error", "completed_at"]
+            if upload.state == Upload.PROCESSING:
+                transaction.on_commit(lambda: schedule_preview(upload.pk))
+        upload.save(update_fields=fields)
+    return upload
+
+
+def check_uploads(schema, user, submissions):
+    """
+    Error dicts, keyed by submission index, for answers to upload fields that
+    aren't processed uploads of the same field by ``user``.
+    """
+    fields = {f.pk for f in schema.fields if f.key in UPLOAD_FIELD_TYPES}
+    answers = [
+        (index, pk, str(value))
+        for index, submission in enumerate(submissions)
+        for pk, value in submission.items()
+        if pk in fields
+    ]
+    if not answers:
+        return {}
+    ids = set()
+    for _, _, value in answers:
+        try:
+            ids.add(Upload._meta.pk.to_python(value))
+        except Exception:
+            pass
+    uploads = set(
+        Upload.objects.filter(
+            pk__in=ids,
+            user=user,
+            state=Upload.PROCESSED,
+        ).values_list("pk", "field_id")
+    )
+    errors = {}
+    for index, pk, value in answers:
+        try:
+            upload_id = Upload._meta.pk.to_python(value)
+        except Exception:
+            upload_id = None
+        if (upload_id, pk) not in uploads:
+            errors.setdefault(index, {})[str(pk)] = ["Upload the file first."]
+    return errors
+
+
+def get_file_sha256(path):
+    digest = hashlib.sha256()
+    with open(path, "rb") as file:
+        while block := file.read(2**20):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+def make_thumbnail(source, target, size):
+    """Write a PNG thumbnail of the image at ``source``; False without Pillow."""
+    if Image is None:
+        return False
+    max_pixels = getattr(settings, "FORMS_UPLOAD_MAX_IMAGE_PIXELS", 40_000_000)
+    with Image.open(source) as image:
+        if image.width * image.height > max_pixels:
+            raise ValueError(f"Images are limited to {max_pixels} pixels.")
+        # Decodes JPEGs at a reduced scale, keeping memory bounded.
+        image.draft("RGB", size)
+        image.thumbnail(size)
+        image.save(target, "PNG")
+    return True
+
+
+def encode_png(width, height, pixels):
+    """A grayscale PNG of ``pixels``, one byte per pixel, row by row."""
+
+    def chunk(kind, data):
+        body = kind + data
+        return struct.pack(">I", len(data)) + body + struct.pack(">I", zlib.crc32(body))
+
+    rows = b"".join(
+        b"\x00" + pixels[y * width : (y + 1) * width] for y in range(height)
+    )
+    return b"".join(
+        [
+            b"\x89PNG\r\n\x1a\n",
+            chunk(b"IHDR", struct.pack(">IIBBBBB", width, height, 8, 0, 0, 0, 0)),
+            chunk(b"IDAT", zlib.compress(rows, 9)),
+            chunk(b"IEND", b""),
+        ]
+    )
+
+
+def rasterize_signature(data, max_size=2000, max_points=None):
+    """
+    Draw a signature given as ``{"width": w, "height": h, "strokes": [[[x, y],
+    ...], ...]}`` into a PNG, black on white, lines 3 pixels wide.
+    """
+    if max_points is None:
+        max_points = getattr(settings, "FORMS_SIGNATURE_MAX_POINTS", 10_000)
+    width, height = int(data["width"]), int(data["height"])
+    if not (0 < width <= max_size and 0 < height <= max_size):
+        raise ValueError(f"Signatures are limited to {max_size}x{max_size}.")
+    if sum(map(len, data["strokes"])) > max_points:
+        raise ValueError(f"Signatures are limited to {max_points} points.")
+    pixels = bytearray(b"\xff" * (width * height))
+
+    def dot(x, y):
+        for py in range(max(y - 1, 0), min(y + 2, height)):
+            for px in range(max(x - 1, 0), min(x + 2, width)):
+                pixels[py * width + px] = 0
+
+    for stroke in data["strokes"]:
+        points = [(round(float(x)), round(float(y))) for x, y in stroke]
+        for (x0, y0), (x1, y1) in pairwise(points[:1] + points):
+            # Bresenham's line.
+            dx, dy = abs(x1 - x0), -abs(y1 - y0)
+            sx, sy = (1 if x0 < x1 else -1), (1 if y0 < y1 else -1)
+            error = dx + dy
+            while True:
+                dot(x0, y0)
+                if x0 == x1 and y0 == y1:
+                    break
+                if 2 * error >= dy:
+                    error += dy
+                    x0 += sx
+                if 2 * error <= dx:
+                    error += dx
+                    y0 += sy
+    return encode_png(width, height, bytes(pixels))
+
+
+def fail_upload(upload, error):
+    upload.state = Upload.FAILED
+    upload.error = str(error)[:200]
+    get_upload_path(upload).unlink(missing_ok=True)
+
+
+def check_upload_file(upload):
+    """
+    Check a complete upload against its declared SHA-256, marking it failed
+    with the file removed, processing when a preview is still to be rendered,
+    or processed. The caller saves ``upload``.
+    """
+    try:
+        if upload.sha256 and get_file_sha256(get_upload_path(upload)) != upload.sha256:
+            raise ValueError("The file doesn't match its SHA-256.")
+    except (OSError, ValueError) as e:
+        fail_upload(upload, e)
+    else:
+        if upload.field.field_type.key in PREVIEW_FIELD_TYPES:
+            upload.state = Upload.PROCESSING
+        else:
+            upload.state = Upload.PROCESSED
+    return upload.state
+
+
+def render_preview(upload_id):
+    """
+    Render the preview of the processing upload ``upload_id`` held by this
+    machine, marking it processed, or failed with the file removed. Returns
+    its state, or None when there was nothing to render.
+    """
+    upload = (
+        Upload.objects.select_related("field__field_type")
+        .filter(pk=upload_id, state=Upload.PROCESSING, machine_id=get_machine_id())
+        .first()
+    )
+    if upload is None:
+        return None
+    path = get_upload_path(upload)
+    try:
+        key = upload.field.field_type.key
+        if key == "image":
+            size = getattr(settings, "FORMS_UPLOAD_THUMBNAIL_SIZE", 320)
+            target = get_upload_path(upload, THUMBNAIL_SUFFIX)
+            if make_thumbnail(path, target, (size, size)):
+                upload.preview = THUMBNAIL_SUFFIX
+        elif key == "signature":
+            with open(path, "rb") as file:
+                png = rasterize_signature(json.load(file))
+            get_upload_path(upload, SIGNATURE_SUFFIX).write_bytes(png)
+            upload.preview = SIGNATURE_SUFFIX
+    except (OSError, ValueError, KeyError, TypeError) as e:
+        fail_upload(upload, e)
+    else:
+        upload.state = Upload.PROCESSED
+    Upload.objects.filter(pk=upload.pk, state=Upload.PROCESSING).update(
+        state=upload.state, preview=upload.preview, error=upload.error
+    )
+    return upload.state
+
+
+# One thread per process renders previews, so they can't take every core.
+preview_executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="preview")
+scheduled_previews = set()
+scheduled_previews_lock = threading.Lock()
+
+
+def run_scheduled_preview(upload_id):
+    try:
+        render_preview(upload_id)
+    except Exception:
+        logger.exception("Rendering the preview of upload %s failed", upload_id)
+    finally:
+        connection.close()
+        with scheduled_previews_lock:
+            scheduled_previews.discard(upload_id)
+
+
+def schedule_preview(upload_id):
+    """Render the preview of ``upload_id`` in the background, once at a time."""
+    with scheduled_previews_lock:
+        if upload_id in scheduled_previews:
+            return
+        scheduled_previews.add(upload_id)
+    preview_executor.submit(run_scheduled_preview, upload_id)
+
+
+def delete_upload_files(upload):
+    for suffix in ("", THUMBNAIL_SUFFIX, SIGNATURE_SUFFIX):
+        get_upload_path(upload, suffix).unlink(missing_ok=True)
+
+
+def purge_uploads(before):
+    """
+    Delete the uploads on this machine left unfinished, or that failed,
+    before ``before`` along with their files, and return how many were
+    deleted.
+    """
+    uploads = Upload.objects.filter(
+        state__in=[Upload.UPLOADING, Upload.FAILED],
+        created_at__lt=before,
+        machine_id=get_machine_id(),
+    )
+    count = 0
+    for upload in uploads.iterator():
+        delete_upload_files(upload)
+        upload.delete()
+        count += 1
+    return count
+
+
+def is_chunk_request(scope):
+    if scope["type"] != "http" or scope["method"] != "PATCH":
+        return False
+    try:
+        return resolve(scope["path"]).url_name == "upload"
+    except Resolver404:
+        return False
+
+
+class UploadLimitMiddleware:
+    """
+    ASGI middleware answering upload chunks without a ``Content-Length``, or
+    with one over ``FORMS_UPLOAD_CHUNK_SIZE``, before their body is received.
+    """
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if is_chunk_request(scope):
+            length = dict(scope["headers"]).get(b"content-length", b"")
+            if not length.isdigit():
+                return await self.reject(send, 411, "Chunks need a Content-Length.")
+            if int(length) > get_chunk_size():
+                message = f"Chunks are limited to {get_chunk_size()} bytes."
+                return await self.reject(send, 413, message)
+        return await self.app(scope, receive, send)
+
+    async def reject(self, send, status, message):
+        body = json.dumps({"errors": {"__all__": [message]}}).encode()
+        await send(
+            {
+                "type": "http.response.start",
+                "status": status,
+                "headers": [
+                    (b"content-type", b"application/json"),
+                    (b"content-length", str(len(body)).encode()),
+                    (b"connection", b"close"),
+                ],
+            }
+        )
+        await send({"type": "http.response.body", "body": body})
@@ -1,14 +1,24 @@
 from django.urls import path
 
 from .views import (
+    ChoiceSetOptionsView,
+    FormComponentsView,
     FormCreatePresetView,
     FormCreateView,
+    FormDefinitionsView,
     FormDetailView,
+    FormExportView,
     FormFieldComponentView,
     FormFieldGroupTemplateView,
     FormFieldTemplateView,
+    FormLayoutView,
     FormListView,
+    FormLogicView,
+    FormSubmitView,
+    FormSummaryView,
     FormUpdateView,
+    UploadCreateView,
+    UploadView,
 )
 
 urlpatterns = [
@@ -19,13 +29,31 @@ urlpatterns = [
         name="form_create_preset",
     ),
     path("create", FormCreateView.as_view(), name="form_create"),
+    path(
+        "choice-sets/<int:pk>/options",
+        ChoiceSetOptionsView.as_view(),
+        name="choice_set_options",
+    ),
+    path("definitions", FormDefinitionsView.as_view(), name="form_definitions"),
     path("<int:pk>/update", FormUpdateView.as_view(), name="form_update"),
     path("<int:pk>", FormDetailView.as_view(), name="form_detail"),
+    path("<int:pk>/submit", FormSubmitView.as_view(), name="form_submit"),
+    path("<int:pk>/logic", FormLogicView.as_view(), name="form_logic"),
+    path("<int:pk>/summary", FormSummaryView.as_view(), name="form_summary"),
+    path("<int:pk>/export", FormExportView.as_view(), name="form_export"),
+    path("<int:pk>/layout", FormLayoutView.as_view(), name="form_layout"),
+    path(
+        "fields/<int:pk>/uploads",
+        UploadCreateView.as_view(),
+        name="field_upload_create",
+    ),
+    path("uploads/<uuid:pk>", UploadView.as_view(), name="upload"),
     path(
         "components/fields/input",
         FormFieldComponentView.as_view(),
         name="form_field_input_component",
     ),
+    path("components", FormComponentsView.as_view(), name="form_components"),
     path(
         "components/fields/<int:pk>",
         FormFieldTemplateView.as_view(),
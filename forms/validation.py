@@ -0,0 +1,302 @@
+"""
+Compiled validators for ``FormField.validations`` merged over
+``FieldType.default_validations``.
+
+Each field's rule set is compiled once into a closure with its regexes
+pre-compiled and its choice sets frozen, and the per-field closures for a
+form are cached in-process per schema version. See the sample rule set next
+to ``ValidationType`` in ``forms.models``. ``check_rules`` describes the
+malformed rules of a set: ``FormField.clean`` rejects them, and a validator
+compiled from a rule set saved without ``clean`` skips them with a warning
+rather than failing every submission to the form.
+"""
+
+import logging
+import re
+from datetime import date
+from operator import ge, gt, le, lt
+
+from django.utils import timezone
+
+from .models import ValidationType
+from .schema import CompiledSchemaCache
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_ERROR_MESSAGES = {
+    "required": "This field is required.",
+    "min_length": "Ensure this value has at least {0} characters.",
+    "max_length": "Ensure this value has at most {0} characters.",
+    "regex": "Enter a valid value.",
+    "choices": "Select a valid choice.",
+    "min": "Ensure this value is greater than or equal to {0}.",
+    "max": "Ensure this value is less than or equal to {0}.",
+    "number": "Enter a number.",
+    "date": "Enter a valid date.",
+    "allowed_domains": "Enter an email address from an allowed domain.",
+    "custom": "Enter a valid value.",
+}
+
+EMPTY_VALUES = (None, "", [], {})
+
+CUSTOM_OPERATORS = ("$in", "$regex", "$gt", "$lt")
+
+
+def _is_int(value):
+    return isinstance(value, int) and not isinstance(value, bool)
+
+
+def _is_number(value):
+    return isinstance(value, (int, float)) and not isinstance(value, bool)
+
+
+def _is_string_list(value):
+    return isinstance(value, list) and all(isinstance(v, str) for v in value)
+
+
+def _check_regex(pattern):
+    if not isinstance(pattern, str):
+        return "Expected a regular expression."
+    try:
+        re.compile(pattern)
+    except re.error as e:
+        return f"Invalid regular expression: {e}"
+
+
+def _check_bound(bound):
+    if _is_number(bound) or bound == "today":
+        return None
+    if isinstance(bound, str):
+        try:
+            date.fromisoformat(bound)
+            return None
+        except ValueError:
+            pass
+    return 'Expected a number, an ISO date or "today".'
+
+
+def _check_custom(rule):
+    if not isinstance(rule, dict) or rule.get("operator") not in CUSTOM_OPERATORS:
+        return f"Expected an operator of {', '.join(CUSTOM_OPERATORS)}."
+    operator, operand = rule["operator"], rule.get("value")
+    if operator == "$in":
+        if not isinstance(operand, list):
+            return "Expected a list of values."
+        return None
+    if operator == "$regex":
+        return _check_regex(operand)
+    return _check_bound(operand)
+
+
+def check_rules(rules):
+    """
+    ``{rule: message}`` for the malformed rules of a validations dict, empty
+    when every rule can be compiled. Unknown rules are ignored.
+    """
+    if not isinstance(rules, dict):
+        return {"__all__": "Expected an object of rules."}
+    errors = {}
+    for key in ("min_length", "max_length", "max_size"):
+        if rules.get(key) is not None and not (_is_int(rules[key]) and rules[key] >= 0):
+            errors[key] = "Expected a non-negative integer."
+    if rules.get("regex") and (error := _check_regex(rules["regex"])):
+        errors["regex"] = error
+    if rules.get("choices") and not isinstance(rules["choices"], list):
+        errors["choices"] = "Expected a list of values."
+    for key in ("min", "max"):
+        if rules.get(key) is not None and (error := _check_bound(rules[key])):
+            errors[key] = error
+    for key in ("allowed_domains", "allowed_types"):
+        if rules.get(key) and not _is_string_list(rules[key]):
+            errors[key] = "Expected a list of strings."
+    if rules.get("custom") and (error := _check_custom(rules["custom"])):
+        errors["custom"] = error
+    return errors
+
+
+def _format(message, value):
+    """``message`` with ``{0}`` filled in, or as is if it has other fields."""
+    try:
+        return message.format(value)
+    except (IndexError, KeyError, ValueError):
+        logger.warning("Invalid validation error message %r", message)
+        return message
+
+
+def _as_number(value):
+    if isinstance(value, bool):
+        raise ValueError(value)
+    return float(value)
+
+
+def _values(value):
+    return value if isinstance(value, list) else [value]
+
+
+def _length_check(limit, compare, message):
+    def check(value):
+        if isinstance(value, (str, list)) and not compare(len(value), limit):
+            return message
+
+    return check
+
+
+def _regex_check(pattern, message):
+    search = re.compile(pattern).search
+
+    def check(value):
+        if not all(search(str(v)) for v in _values(value)):
+            return message
+
+    return check
+
+
+def _choices_check(choices, message):
+    choices = frozenset(str(c) for c in choices)
+
+    def check(value):
+        if not all(str(v) in choices for v in _values(value)):
+            return message
+
+    return check
+
+
+def _bound_check(bound, compare, messages, message):
+    if isinstance(bound, str):
+        # Date bounds such as "1900-01-01" or "today" (see date_of_birth).
+        try:
+            fixed_bound = None if bound == "today" else date.fromisoformat(bound)
+        except ValueError:
+            return None
+
+        def check(value):
+            try:
+                value = date.fromisoformat(str(value)[:10])
+            except ValueError:
+                return messages["date"]
+            if not compare(value, fixed_bound or timezone.localdate()):
+                return message
+
+        return check
+
+    def check(value):
+        try:
+            value = _as_number(value)
+        except (TypeError, ValueError):
+            return messages["number"]
+        if not compare(value, bound):
+            return message
+
+    return check
+
+
+def _domains_check(domains, message):
+    domains = frozenset(d.lower() for d in domains)
+
+    def check(value):
+        if str(value).rpartition("@")[2].lower() not in domains:
+            return message
+
+    return check
+
+
+def _custom_check(rule, messages):
+    operator, operand = rule.get("operator"), rule.get("value")
+    message = messages["custom"]
+    if operator == "$in":
+        return _choices_check(operand, message)
+    if operator == "$regex":
+        return _regex_check(operand, message)
+    if operator == "$gt":
+        return _bound_check(operand, gt, messages, message)
+    if operator == "$lt":
+        return _bound_check(operand, lt, messages, message)
+    return None
+
+
+def compile_field_validator(field, messages=None):
+    """
+    Compile ``field`` (a ``forms.schema.FieldSchema``) into a function that
+    takes a value and returns a list of error messages, empty when valid.
+    """
+    messages = {**DEFAULT_ERROR_MESSAGES, **(messages or {})}
+    rules = field.validations if isinstance(field.validations, dict) else {}
+    if invalid := check_rules(rules):
+        logger.warning(
+            "Skipping invalid validations of field %s: %s", field.pk, invalid
+        )
+        rules = {key: value for key, value in rules.items() if key not in invalid}
+    checks = []
+
+    if "min_length" in rules:
+        message = _format(messages["min_length"], rules["min_length"])
+        checks.append(_length_check(rules["min_length"], ge, message))
+    if "max_length" in rules:
+        message = _format(messages["max_length"], rules["max_length"])
+        checks.append(_length_check(rules["max_length"], le, message))
+    if rules.get("regex"):
+        checks.append(_regex_check(rules["regex"], messages["regex"]))
+    if rules.get("choices"):
+        checks.append(_choices_check(rules["choices"], messages["choices"]))
+    choices = field.get_choices()
+    if choices:
+        checks.append(_choices_check((v for v, _ in choices), messages["choices"]))
+    if rules.get("min") is not None:
+        message = _format(messages["min"], rules["min"])
+        checks.append(_bound_check(rules["min"], ge, messages, message))
+    if rules.get("max") is not None:
+        message = _format(messages["max"], rules["max"])
+        checks.append(_bound_check(rules["max"], le, messages, message))
+    if rules.get("allowed_domains"):
+        checks.append(
+            _domains_check(rules["allowed_domains"], messages["allowed_domains"])
+        )
+    if rules.get("custom"):
+        checks.append(_custom_check(rules["custom"], messages))
+
+    checks = tuple(check for check in checks if check is not None)
+    required = field.required
+    required_errors = [messages["required"]]
+
+    def validate(value):
+        if value in EMPTY_VALUES:
+            return required_errors if required else []
+        return [e for e in (check(value) for check in checks) if e is not None]
+
+    return validate
+
+
+def compile_form_validator(schema, messages=None):
+    """
+    Compile every field in ``schema`` and return a function taking answers
+    keyed by field pk and returning error lists keyed by field pk.
+    """
+    validators = tuple(
+        (field.pk, compile_field_validator(field, messages)) for field in schema.fields
+    )
+
+    def validate(answers, skip=()):
+        errors = {}
+        for pk, validator in validators:
+            if pk in skip:
+                continue
+            field_errors = validator(answers.get(pk))
+            if field_errors:
+                errors[pk] = field_errors
+        return errors
+
+    return validate
+
+
+def get_error_messages():
+    return dict(ValidationType.objects.values_list("key", "default_error_message"))
+
+
+form_validators = CompiledSchemaCache(
+    lambda schema: compile_form_validator(schema, get_error_messages())
+)
+
+
+def get_form_validator(schema):
+    """Return the compiled validator for ``schema``, compiling it on a miss."""
+    return form_validators.get(schema)
@@ -1,6 +1,20 @@
-from django.http import HttpResponse
+import json
+from itertools import islice
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.contrib.auth.mixins import LoginRequiredMixin
+from django.core.exceptions import PermissionDenied, ValidationError
+from django.db.models import Q
+from django.http import Http404, HttpResponse, JsonResponse, StreamingHttpResponse
+from django.middleware.csrf import get_token
+from django.shortcuts import aget_object_or_404
 from django.urls import reverse_lazy
+from django.utils import timezone
+from django.utils.cache import get_conditional_response, patch_cache_control
+from django.utils.crypto import constant_time_compare
 from django.utils.decorators import method_decorator
+from django.utils.translation import get_language
 from django.views.decorators.csrf import csrf_exempt
 from django.views.generic import (
     CreateView,
@@ -9,10 +23,58 @@ from django.views.generic import (
     RedirectView,
     TemplateView,
     UpdateView,
+    View,
 )
+from django.views.generic.detail import SingleObjectMixin
 
+from .analytics import get_form_summary
+from .choices import get_choice_set_choices, render_options, search_choices
+from .definitions import (
+    DEFINITION_FORMATS,
+    DefinitionError,
+    import_definitions,
+    iter_definition_records,
+)
+from .export import EXPORT_FORMATS
 from .forms import FormForm
-from .models import Form, FormField, FormFieldGroup
+from .fragments import (
+    DYNAMIC_FIELD_TYPES,
+    as_oob_swap,
+    get_components_url,
+    render_field_fragment,
+    render_group_fragment,
+)
+from .instrumentation import metrics_registry
+from .layout import apply_layout
+from .logic import get_form_logic
+from .models import ChoiceSet, Form, FormField, FormFieldGroup, Upload
+from .queue import render_queue_metrics
+from .schema import get_form_schema
+from .submissions import SubmissionError, ingest_submissions
+from .uploads import (
+    UploadError,
+    create_upload,
+    get_chunk_size,
+    get_owner_machine,
+    schedule_preview,
+    write_chunk,
+)
+
+# Items a streamed sync iterator yields per hop to the sync thread.
+STREAM_BATCH_SIZE = 100
+
+
+async def iterate_sync(iterable):
+    """
+    Iterate ``iterable`` in the sync thread ``STREAM_BATCH_SIZE`` items at a
+    time. ASGI serves a StreamingHttpResponse of a sync iterator by reading
+    all of it into a list first; this keeps exports streaming.
+    """
+    iterator = iter(iterable)
+    next_batch = sync_to_async(lambda: list(islice(iterator, STREAM_BATCH_SIZE)))
+    while batch := await next_batch():
+        for item in batch:
+            yield item
 
 
 # Create your views here.
@@ -20,6 +82,11 @@ class FormListView(ListView):
     model = Form
     template_name = "form_list.html"
 
+    async def get(self, request, *args, **kwargs):
+        self.object_list = [form async for form in self.get_queryset()]
+        context = self.get_context_data()
+        return self.render_to_response(context)
+
 
 class FormCreateView(CreateView):
     form_class = FormForm
@@ -32,9 +99,101 @@ class FormUpdateView(UpdateView):
     template_name = "form_update.html"
 
 
-class FormDetailView(DetailView):
+class SchemaConditionalMixin:
+    """
+    Strong ETags for views whose output is fixed by a form's schema version.
+    ``get_etag()`` must only use what ``get_object()`` loaded, so a matching
+    ``If-None-Match`` returns 304 before any rendering or field queries.
+    """
+
+    cache_control = {"no_cache": True}
+
+    def get_etag_parts(self):
+        """Values the ETag is built from, or None to skip conditional GET."""
+        return None
+
+    def get_etag(self):
+        parts = self.get_etag_parts()
+        if parts is None:
+            return None
+        return '"{}"'.format("-".join(map(str, (*parts, get_language()))))
+
+    async def get(self, request, *args, **kwargs):
+        self.object = await aget_object_or_404(
+            self.get_queryset(), pk=kwargs[self.pk_url_kwarg]
+        )
+        # Schema builds and rendering stay sync; a warm cache never queries.
+        etag = await sync_to_async(self.get_etag)()
+        response = etag and get_conditional_response(request, etag=etag)
+        if not response:
+            response = await sync_to_async(self.render_object)()
+            if etag:
+                response["ETag"] = etag
+        patch_cache_control(response, **self.get_cache_control(etag))
+        return response
+
+    def render_object(self):
+        context = self.get_context_data(object=self.object)
+        return self.render_to_response(context)
+
+    def get_cache_control(self, etag):
+        # Without an ETag the body carries per-request values; never share it.
+        return self.cache_control if etag else {"no_store": True}
+
+
+class FormDetailView(SchemaConditionalMixin, DetailView):
+    """
+    Renders the whole field tree from the cached form schema in a single
+    response by default. Pass ``?render=lazy`` to fall back to one HTMX
+    request per field and group.
+    """
+
     model = Form
     template_name = "form_detail.html"
+    render_mode = "inline"
+    render_modes = ("inline", "lazy")
+
+    def get_render_mode(self):
+        render_mode = self.request.GET.get("render", self.render_mode)
+        if render_mode not in self.render_modes:
+            return self.render_mode
+        return render_mode
+
+    def get_etag_parts(self):
+        render_mode = self.get_render_mode()
+        if render_mode == "inline":
+            # Per-request values are baked into the inline page.
+            schema = get_form_schema(self.object)
+            if any(f.key in DYNAMIC_FIELD_TYPES for f in schema.fields):
+                return None
+        return ("form", self.object.pk, self.object.schema_version, render_mode)
+
+    async def get(self, request, *args, **kwargs):
+        response = await super().get(request, *args, **kwargs)
+        if self.get_render_mode() == "inline":
+            # A fresh page starts a fresh partial answer set for FormLogicView.
+            await FormLogicView.aclear_answers(request, self.object)
+        # Upload widgets send the CSRF cookie's token with their requests.
+        get_token(request)
+        return response
+
+    def get_context_data(self, **kwargs):
+        context = super().get_context_data(**kwargs)
+        context["inline"] = self.get_render_mode() == "inline"
+        if context["inline"]:
+            schema = get_form_schema(self.object)
+            logic = get_form_logic(schema)
+            context["schema"] = schema
+            context["field_tree"] = schema.get_field_tree()
+            context["logic_sources"] = logic.sources
+        else:
+            field_tree = self.object.get_field_tree()
+            context["field_tree"] = field_tree
+            context["components_url"] = get_components_url(
+                fields=[i for i in field_tree if isinstance(i, FormField)],
+                groups=[i for i in field_tree if isinstance(i, FormFieldGroup)],
+            )
+        return context
 
 
 @method_decorator(csrf_exempt, name="dispatch")
@@ -50,17 +209,516 @@ class FormCreatePresetView(RedirectView):
 
 
 @method_decorator(csrf_exempt, name="dispatch")
-class FormFieldTemplateView(DetailView):
-    model = FormField
+class FormFieldTemplateView(SchemaConditionalMixin, DetailView):
+    """Serves one field from the fragment cache of its form's schema."""
 
-    def get_template_names(self):
-        return [self.object.get_template_name()]
+    queryset = FormField.objects.select_related("form", "field_type")
+    cache_control = {"public": True, "max_age": 60}
 
-    def get_context_data(self, **kwargs):
-        return super().get_context_data(**kwargs)
+    def get_etag_parts(self):
+        if self.object.field_type.key in DYNAMIC_FIELD_TYPES:
+            return None
+        return ("field", self.object.pk, self.object.form.schema_version)
+
+    def render_to_response(self, context, **response_kwargs):
+        schema = get_form_schema(self.object.form)
+        field = schema.get_field(self.object.pk)
+        return HttpResponse(render_field_fragment(schema, field))
 
 
 @method_decorator(csrf_exempt, name="dispatch")
-class FormFieldGroupTemplateView(DetailView):
-    model = FormFieldGroup
+class FormFieldGroupTemplateView(SchemaConditionalMixin, DetailView):
+    queryset = FormFieldGroup.objects.select_related("form")
     template_name = "form_field_group.html"
+    cache_control = {"public": True, "max_age": 60}
+
+    def get_etag_parts(self):
+        return ("group", self.object.pk, self.object.form.schema_version)
+
+    def get_context_data(self, **kwargs):
+        context = super().get_context_data(**kwargs)
+        context["fields"] = list(self.object.get_fields())
+        context["components_url"] = get_components_url(fields=context["fields"])
+        return context
+
+
+@method_decorator(csrf_exempt, name="dispatch")
+class FormComponentsView(View):
+    """
+    Renders several fields and groups in one request, as HTMX out-of-band
+    swaps onto the placeholders with their ids. Pass comma separated pks as
+    ``?fields=1,2&groups=3``.
+    """
+
+    http_method_names = ["get"]
+    max_batch_size = 200
+    cache_control = {"public": True, "max_age": 60}
+
+    def get_pks(self, name):
+        return [
+            int(pk)
+            for value in self.request.GET.getlist(name)
+            for pk in value.split(",")
+            if pk.strip()
+        ]
+
+    async def get(self, request, *args, **kwargs):
+        try:
+            field_pks, group_pks = self.get_pks("fields"), self.get_pks("groups")
+        except ValueError:
+            return HttpResponse("Expected comma separated pks.", status=400)
+        if len(field_pks) + len(group_pks) > self.max_batch_size:
+            return HttpResponse(
+                f"At most {self.max_batch_size} components per request.", status=400
+            )
+
+        forms = Form.objects.filter(
+            Q(pk__in=FormField.objects.filter(pk__in=field_pks).values("form"))
+            | Q(pk__in=FormFieldGroup.objects.filter(pk__in=group_pks).values("form"))
+        )
+        forms = [form async for form in forms]
+        html, dynamic = await sync_to_async(self.render_components)(
+            forms, field_pks, group_pks
+        )
+        response = HttpResponse(html)
+        patch_cache_control(
+            response, **({"no_store": True} if dynamic else self.cache_control)
+        )
+        return response
+
+    def render_components(self, forms, field_pks, group_pks):
+        """Return the joined out-of-band swaps and whether any is per request."""
+        fields, groups = {}, {}
+        for form in forms:
+            schema = get_form_schema(form)
+            fields.update((f.pk, (schema, f)) for f in schema.fields)
+            groups.update((g.pk, (schema, g)) for g in schema.groups)
+
+        html, dynamic = [], False
+        for pk in field_pks:
+            if pk in fields:
+                schema, field = fields[pk]
+                dynamic = dynamic or field.key in DYNAMIC_FIELD_TYPES
+                html.append(
+                    as_oob_swap(
+                        render_field_fragment(schema, field), field.component_id
+                    )
+                )
+        for pk in group_pks:
+            if pk in groups:
+                schema, group = groups[pk]
+                dynamic = dynamic or any(
+                    f.key in DYNAMIC_FIELD_TYPES for f in group.fields
+                )
+                html.append(
+                    as_oob_swap(
+                        render_group_fragment(schema, group), group.component_id
+                    )
+                )
+        return "\n".join(html), dynamic
+
+
+@method_decorator(csrf_exempt, name="dispatch")
+class FormLogicView(SingleObjectMixin, View):
+    """
+    Incremental conditional logic for HTMX: records one changed answer in the
+    session and answers with an ``HX-Trigger`` event mapping the pks of the
+    fields downstream of it to their new visibility.
+    """
+
+    model = Form
+    http_method_names = ["post"]
+
+    @staticmethod
+    def get_session_key(form):
+        return f"forms:{form.pk}:answers"
+
+    @classmethod
+    def clear_answers(cls, request, form):
+        if cls.get_session_key(form) in request.session:
+            del request.session[cls.get_session_key(form)]
+
+    @classmethod
+    async def aclear_answers(cls, request, form):
+        await request.session.apop(cls.get_session_key(form), None)
+
+    def post(self, request, *args, **kwargs):
+        self.object = self.get_object()
+        schema = get_form_schema(self.object)
+        try:
+            changed = schema.get_field(int(request.POST.get("field"))).pk
+        except (KeyError, TypeError, ValueError):
+            return HttpResponse("Unknown field.", status=400)
+
+        logic = get_form_logic(schema)
+        if changed not in logic.sources:
+            return HttpResponse("")
+
+        session_key = self.get_session_key(self.object)
+        answers = request.session.get(session_key, {})
+        answers[str(changed)] = request.POST.get("value")
+        request.session[session_key] = answers
+
+        visibility = logic.update({int(k): v for k, v in answers.items()}, changed)
+        response = HttpResponse("")
+        response["HX-Trigger"] = json.dumps({"forms:visibility": visibility})
+        return response
+
+
+class FormSubmitView(SingleObjectMixin, View):
+    """
+    Accepts a JSON body of ``{"answers": {field_pk: value}}`` or, for clients
+    syncing offline work, ``{"submissions": [{"answers": {...}}, ...]}``.
+    Signed-in users only. Submissions repeating a stored submission ID get
+    the original response back, listed by index under ``duplicates``, with a
+    200 when nothing new was stored.
+    """
+
+    model = Form
+    http_method_names = ["post"]
+
+    def get_submissions(self, payload):
+        if not isinstance(payload, dict):
+            raise SubmissionError({"__all__": ["Expected a JSON object."]})
+        if "submissions" not in payload:
+            return [payload.get("answers")]
+        submissions = payload["submissions"]
+        if not isinstance(submissions, list):
+            raise SubmissionError({"__all__": ["Expected a list of submissions."]})
+        max_batch_size = getattr(settings, "FORMS_SUBMISSION_MAX_BATCH_SIZE", 1000)
+        if len(submissions) > max_batch_size:
+            raise SubmissionError(
+                {"__all__": [f"At most {max_batch_size} submissions per request."]}
+            )
+        return [s.get("answers") if isinstance(s, dict) else None for s in submissions]
+
+    async def post(self, request, *args, **kwargs):
+        user = await request.auser()
+        if not user.is_authenticated:
+            raise PermissionDenied
+        self.object = await aget_object_or_404(
+            self.get_queryset(), pk=kwargs[self.pk_url_kwarg]
+        )
+        try:
+            payload = json.loads(request.body)
+        except ValueError:
+            return JsonResponse({"errors": {"__all__": ["Invalid JSON."]}}, status=400)
+
+        try:
+            responses = await sync_to_async(ingest_submissions)(
+                self.object, user, self.get_submissions(payload)
+            )
+        except SubmissionError as e:
+            return JsonResponse({"errors": e.errors}, status=400)
+        duplicates = [i for i, r in enumerate(responses) if r.duplicate]
+        return JsonResponse(
+            {"responses": [r.pk for r in responses], "duplicates": duplicates},
+            status=200 if len(duplicates) == len(responses) else 201,
+        )
+
+
+class UploadCreateView(LoginRequiredMixin, SingleObjectMixin, View):
+    """
+    Starts a chunked upload for a file, image or signature field from a JSON
+    body of ``{"filename", "size", "content_type", "sha256"}``, the checksum
+    being optional. Answers with the upload's URL, to send chunks to, and
+    the machine holding it, to name in the ``fly-force-instance-id`` header.
+    """
+
+    model = FormField
+    raise_exception = True
+    http_method_names = ["post"]
+
+    def post(self, request, *args, **kwargs):
+        self.object = self.get_object()
+        form = self.object.form
+        if form.expiration_date <= timezone.now():
+            return JsonResponse(
+                {"errors": {"__all__": ["This form has expired."]}}, status=400
+            )
+        try:
+            payload = json.loads(request.body)
+        except ValueError:
+            return JsonResponse({"errors": {"__all__": ["Invalid JSON."]}}, status=400)
+        if not isinstance(payload, dict):
+            return JsonResponse(
+                {"errors": {"__all__": ["Expected a JSON object."]}}, status=400
+            )
+
+        try:
+            upload = create_upload(
+                get_form_schema(form).get_field(self.object.pk),
+                request.user,
+                payload.get("filename"),
+                payload.get("size"),
+                payload.get("content_type"),
+                payload.get("sha256"),
+            )
+        except UploadError as e:
+            return JsonResponse({"errors": {"__all__": [e.message]}}, status=e.status)
+        response = JsonResponse(
+            {
+                "id": str(upload.pk),
+                "url": upload.get_absolute_url(),
+                "offset": 0,
+                "chunk_size": get_chunk_size(),
+                "instance": upload.machine_id,
+            },
+            status=201,
+        )
+        response["Location"] = upload.get_absolute_url()
+        return response
+
+
+class UploadView(LoginRequiredMixin, SingleObjectMixin, View):
+    """
+    An upload of the signed-in user. ``GET`` returns its state and the offset
+    to resume from, also sent as the ``Upload-Offset`` header. ``PATCH`` sends
+    the next chunk as the raw body, with the ``Upload-Offset`` it starts at
+    and optionally an ``Upload-Checksum: sha256 <base64 digest>`` of it.
+    Requests reaching a machine other than the one holding the file are
+    replayed to it by the Fly proxy.
+    """
+
+    model = Upload
+    raise_exception = True
+    http_method_names = ["get", "head", "patch"]
+
+    def get_queryset(self):
+        return super().get_queryset().filter(user=self.request.user)
+
+    def render_upload(self, upload, status=200):
+        response = JsonResponse(
+            {
+                "id": str(upload.pk),
+                "state": upload.state,
+                "offset": upload.offset,
+                "size": upload.size,
+                "error": upload.error,
+            },
+            status=status,
+        )
+        response["Upload-Offset"] = upload.offset
+        response["Upload-Length"] = upload.size
+        response["Cache-Control"] = "no-store"
+        return response
+
+    def render_misdirected(self, machine_id):
+        response = JsonResponse(
+            {"errors": {"__all__": ["This upload is held by another machine."]}},
+            status=421,
+        )
+        response["fly-replay"] = f"instance={machine_id}"
+        return response
+
+    def get(self, request, *args, **kwargs):
+        upload = self.get_object()
+        if machine_id := get_owner_machine(upload):
+            return self.render_misdirected(machine_id)
+        if upload.state == Upload.PROCESSING:
+            # Picks up a preview lost to a restart; no-op if still scheduled.
+            schedule_preview(upload.pk)
+        return self.render_upload(upload)
+
+    def patch(self, request, *args, **kwargs):
+        self.object = self.get_object()
+        if machine_id := get_owner_machine(self.object):
+            return self.render_misdirected(machine_id)
+        try:
+            offset = int(request.headers["Upload-Offset"])
+            length = request.headers.get("Content-Length")
+            length = int(length) if length else None
+        except (KeyError, ValueError):
+            return JsonResponse(
+                {"errors": {"__all__": ["Expected an Upload-Offset."]}}, status=400
+            )
+        try:
+            upload = write_chunk(
+                self.object,
+                offset,
+                length,
+                request,
+                request.headers.get("Upload-Checksum"),
+            )
+        except UploadError as e:
+            response = JsonResponse(
+                {"errors": {"__all__": [e.message]}}, status=e.status
+            )
+            self.object.refresh_from_db()
+            response["Upload-Offset"] = self.object.offset
+            return response
+        return self.render_upload(upload)
+
+
+class FormLayoutView(LoginRequiredMixin, SingleObjectMixin, View):
+    """
+    Saves a reorder/resize from the builder in one go. Accepts a JSON body of
+    ``{"fields": {pk: {"order": {...}, "widths": {...}}}, "groups": {...}}``
+    holding only the breakpoints that changed.
+    """
+
+    model = Form
+    raise_exception = True
+    http_method_names = ["post"]
+
+    def get_queryset(self):
+        return super().get_queryset().filter(owner=self.request.user)
+
+    def post(self, request, *args, **kwargs):
+        self.object = self.get_object()
+        try:
+            payload = json.loads(request.body)
+        except ValueError:
+            return JsonResponse({"errors": {"__all__": ["Invalid JSON."]}}, status=400)
+        if not isinstance(payload, dict):
+            return JsonResponse(
+                {"errors": {"__all__": ["Expected a JSON object."]}}, status=400
+            )
+
+        try:
+            apply_layout(self.object, payload.get("fields"), payload.get("groups"))
+        except ValidationError as e:
+            return JsonResponse({"errors": e.message_dict}, status=400)
+        return JsonResponse({"schema_version": self.object.schema_version})
+
+
+class FormSummaryView(LoginRequiredMixin, DetailView):
+    """Per-field response aggregates for the form's owner, as JSON."""
+
+    model = Form
+    raise_exception = True
+
+    def get_queryset(self):
+        return super().get_queryset().filter(owner=self.request.user)
+
+    def render_to_response(self, context, **response_kwargs):
+        return JsonResponse({"fields": get_form_summary(self.object)})
+
+
+class FormExportView(LoginRequiredMixin, DetailView):
+    """Streams the form's responses to its owner as ``?format=csv|ndjson``."""
+
+    model = Form
+    raise_exception = True
+
+    def get_queryset(self):
+        return super().get_queryset().filter(owner=self.request.user)
+
+    def render_to_response(self, context, **response_kwargs):
+        export_format = self.request.GET.get("format", "csv")
+        try:
+            stream, content_type = EXPORT_FORMATS[export_format]
+        except KeyError:
+            raise Http404(f"Unknown export format {export_format!r}")
+        response = StreamingHttpResponse(
+            iterate_sync(stream(self.object)), content_type=content_type
+        )
+        response["Content-Disposition"] = (
+            f'attachment; filename="form-{self.object.pk}.{export_format}"'
+        )
+        return response
+
+
+class ChoiceSetOptionsView(View):
+    """
+    One page of a choice set's options matching ``?q=``, as ``<option>``
+    elements for the typeahead of lazy select fields or, with
+    ``?format=json``, as ``{"results": [[value, label], ...], "has_next"}``.
+    Responses for the current ``?v=`` version are cacheable by browsers and
+    proxies since a new version changes the URL.
+    """
+
+    http_method_names = ["get"]
+
+    async def get(self, request, *args, **kwargs):
+        choice_set = await aget_object_or_404(
+            ChoiceSet.objects.only("version"), pk=kwargs["pk"]
+        )
+        try:
+            page = max(int(request.GET.get("page", 1)), 1)
+        except ValueError:
+            page = 1
+        choices = await sync_to_async(get_choice_set_choices)(
+            choice_set.pk, choice_set.version
+        )
+        matches, has_next = search_choices(choices, request.GET.get("q", ""), page)
+        if request.GET.get("format") == "json":
+            response = JsonResponse(
+                {"results": matches, "page": page, "has_next": has_next}
+            )
+        else:
+            response = HttpResponse(render_options(matches))
+        if request.GET.get("v") == str(choice_set.version):
+            patch_cache_control(
+                response,
+                public=True,
+                max_age=getattr(settings, "FORMS_CHOICE_SET_MAX_AGE", 86400),
+            )
+        else:
+            patch_cache_control(response, no_cache=True)
+        return response
+
+
+class FormDefinitionsView(LoginRequiredMixin, View):
+    """
+    Bulk form definitions of the signed-in user: GET streams them as
+    ``?format=ndjson|json`` (optionally ``?forms=1,2``), POST imports a JSON
+    array or NDJSON document as new forms in one transaction. Only staff
+    imports update the shared field types and choice sets.
+    """
+
+    raise_exception = True
+    http_method_names = ["get", "post"]
+
+    def get(self, request, *args, **kwargs):
+        export_format = request.GET.get("format", "ndjson")
+        try:
+            write, content_type = DEFINITION_FORMATS[export_format]
+        except KeyError:
+            raise Http404(f"Unknown definitions format {export_format!r}")
+        forms = Form.objects.filter(owner=request.user)
+        if request.GET.get("forms"):
+            try:
+                pks = [int(pk) for pk in request.GET["forms"].split(",") if pk]
+            except ValueError:
+                raise Http404("Invalid form pks")
+            forms = forms.filter(pk__in=pks)
+        response = StreamingHttpResponse(
+            iterate_sync(write(iter_definition_records(forms))),
+            content_type=content_type,
+        )
+        response["Content-Disposition"] = (
+            f'attachment; filename="forms.{export_format}"'
+        )
+        return response
+
+    def post(self, request, *args, **kwargs):
+        try:
+            pks = import_definitions(
+                request, request.user, update_shared=request.user.is_staff
+            )
+        except DefinitionError as e:
+            return JsonResponse({"errors": {"__all__": [str(e)]}}, status=400)
+        return JsonResponse({"forms": pks}, status=201)
+
+
+class MetricsView(View):
+    """
+    The request metrics of this process and the task queue depth in Prometheus
+    text format, for staff or scrapers sending ``Authorization: Bearer
+    <FORMS_METRICS_TOKEN>``.
+    """
+
+    http_method_names = ["get"]
+
+    def get(self, request, *args, **kwargs):
+        token = getattr(settings, "FORMS_METRICS_TOKEN", "")
+        authorization = request.headers.get("Authorization", "")
+        if not request.user.is_staff and not (
+            token and constant_time_compare(authorization, f"Bearer {token}")
+        ):
+            raise PermissionDenied
+        return HttpResponse(
+            metrics_registry.render() + render_queue_metrics(),
+            content_type="text/plain; version=0.0.4; charset=utf-8",
+        )